@@ -0,0 +1,87 @@
+# api/batching.py
+"""
+Micro-batching request coalescer for concurrent /predict traffic.
+
+Concurrent requests park their feature rows here for up to `window_ms`
+(or until `max_batch` rows are waiting). The batch is then scored with one
+vectorized predict call on a worker thread and each caller's future is
+resolved with its own raw prediction. Rows are queued per predict function,
+so requests for different models never share a batch.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class PredictionCoalescer:
+    def __init__(self, window_ms=2.0, max_batch=64, workers=1):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coalescer")
+        self._pending = {}   # predict_fn -> [(row, future), ...]
+        self._timers = {}    # predict_fn -> TimerHandle
+        self._tasks = set()
+
+        # Counters for monitoring
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, row, predict_fn):
+        """
+        Queue one 1d feature row for predict_fn and wait for its raw
+        prediction. The row must not be reused by the caller until this returns.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(predict_fn, [])
+        pending.append((row, future))
+
+        if len(pending) >= self.max_batch:
+            self._flush(predict_fn)
+        elif predict_fn not in self._timers:
+            self._timers[predict_fn] = loop.call_later(self.window, self._flush, predict_fn)
+
+        return await future
+
+    def _flush(self, predict_fn):
+        timer = self._timers.pop(predict_fn, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(predict_fn, None)
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._score(predict_fn, batch))
+        # Hold a reference until done so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, predict_fn, batch):
+        loop = asyncio.get_running_loop()
+        X = np.stack([row for row, _ in batch])
+        try:
+            predictions = await loop.run_in_executor(self._executor, predict_fn, X)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(float(prediction))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
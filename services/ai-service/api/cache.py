@@ -0,0 +1,95 @@
+# api/cache.py
+"""
+Bounded in-process cache for raw model predictions.
+
+Entries are keyed by a hash of the aligned feature row bytes, scoped to a
+model version. Post-processing rules still run on every request, so only
+the tree-ensemble evaluation is skipped on a hit.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    TTL + LRU cache with hit/miss counters.
+
+    Keys are scoped by model version, and invalidate(version) drops a
+    version's entries when the registry swaps that model out, so a replaced
+    artifact never serves predictions from the old one.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(row):
+        """Digest of the aligned feature row (any contiguous NumPy array)"""
+        return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+    def get(self, key, version):
+        scoped = (version, key)
+        with self._lock:
+            entry = self._data.get(scoped)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= self.clock():
+                del self._data[scoped]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(scoped)
+            self.hits += 1
+            return value
+
+    def put(self, key, version, value):
+        scoped = (version, key)
+        with self._lock:
+            self._data[scoped] = (value, self.clock() + self.ttl)
+            self._data.move_to_end(scoped)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version):
+        """Drop every entry computed by the given model version"""
+        with self._lock:
+            stale = [scoped for scoped in self._data if scoped[0] == version]
+            for scoped in stale:
+                del self._data[scoped]
+            if stale:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "versions": len({scoped[0] for scoped in self._data}),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
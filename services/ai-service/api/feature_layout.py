@@ -0,0 +1,91 @@
+# api/feature_layout.py
+"""
+Precompiled feature layout for the single-row inference path.
+
+Built once from feature_columns_final.pkl and the label encoders, it turns a
+request dict straight into a NumPy row in the model's training dtype
+(bundle ModelBundle.feature_dtype) and training column order,
+without going through pd.DataFrame / LabelEncoder.transform / reindex.
+"""
+import threading
+
+import numpy as np
+
+from bundle import missing_row
+
+
+class FeatureLayout:
+    """
+    Column -> index map, encoder lookup dicts and a reusable row buffer.
+
+    Semantics match the pandas path in api/main.py:
+    - fields that are not training features are ignored
+    - missing features, explicit nulls and non-numeric strings get the
+      training median (bundle fill_values), as training filled its NaNs
+    - a known category overwrites <col>_encoded, an unseen one leaves it alone
+    """
+
+    def __init__(self, feature_columns, label_encoders, dtype=np.float32, fill_values=None):
+        self.feature_columns = list(feature_columns)
+        self.dtype = dtype
+        self.width = len(self.feature_columns)
+        self.index = {col: i for i, col in enumerate(self.feature_columns)}
+        self.missing = missing_row(self.feature_columns, fill_values, dtype)
+
+        self.encoders = []
+        for col, le in label_encoders.items():
+            target = self.index.get(col + '_encoded')
+            if target is None:
+                continue
+            lookup = {cls: float(code) for code, cls in enumerate(le.classes_)}
+            self.encoders.append((col, target, lookup))
+
+        # One buffer per worker thread: sync endpoints run in a threadpool
+        self._local = threading.local()
+
+    def buffer(self):
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = np.zeros((1, self.width), dtype=self.dtype)
+            self._local.row = row
+        return row
+
+    def fill_row(self, input_data, out=None):
+        """
+        Write input_data into a (1, width) row and return it.
+        Uses this thread's reusable buffer unless `out` is given, so copy the
+        result if it has to outlive the next call on the same thread.
+        """
+        row = self.align_row(input_data, out)
+        return self.encode_row(input_data, row)
+
+    def align_row(self, input_data, out=None):
+        """Reset the row to the fill values and write the known numeric fields at their training index"""
+        row = self.buffer() if out is None else out
+        flat = row.reshape(-1)
+        flat[:] = self.missing
+
+        index = self.index
+        for key, value in input_data.items():
+            i = index.get(key)
+            if i is not None and value is not None and not isinstance(value, str) and value == value:
+                flat[i] = value
+        return row
+
+    def fill_missing(self, X):
+        """Replace the NaNs of an aligned (n, width) matrix with the fill values, in place"""
+        rows, cols = np.nonzero(np.isnan(X))
+        X[rows, cols] = self.missing[cols]
+        return X
+
+    def encode_row(self, input_data, row):
+        """Overwrite <col>_encoded in an aligned row for known categories"""
+        flat = row.reshape(-1)
+        for col, target, lookup in self.encoders:
+            value = input_data.get(col)
+            if value is not None:
+                code = lookup.get(str(value))
+                if code is not None:
+                    flat[target] = code
+        return row
+
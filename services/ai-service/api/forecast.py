@@ -0,0 +1,78 @@
+# api/forecast.py
+"""
+Multi-horizon recursive forecasting.
+
+Rolls the model forward one day at a time on a copy of a temple's
+TempleFeatureState. Each step's post-processed prediction becomes the next
+day's visitors_today, so lag, rolling and EWM features are updated
+incrementally (O(1) per step) instead of being recomputed over the history.
+"""
+from datetime import timedelta
+
+MAX_HORIZON = 30
+
+# Recomputed from each simulated date instead of being carried forward
+CALENDAR_FIELDS = ('date', 'day_of_week', 'month', 'is_weekend', 'week_of_year')
+
+# Derived by derive_row_features on every observe
+DERIVED_FIELDS = (
+    'day_of_month', 'quarter', 'is_month_start', 'is_month_end',
+    'month_sin', 'month_cos', 'day_sin', 'day_cos', 'week_sin', 'week_cos',
+    'temp_humidity_interaction', 'rainfall_temp', 'extreme_weather',
+    'weekend_festival', 'holiday_weekend', 'weekend_vacation', 'peak_weekend',
+    'occupancy_booking_ratio', 'demand_pressure',
+    'festival_within_3days', 'festival_within_week',
+)
+
+
+def next_observation(template, day, visitors, overrides=None):
+    """
+    Raw observation for a simulated day: exogenous fields carried forward
+    from the template, calendar fields from the date, visitors from the
+    previous step's prediction, then any caller-supplied overrides.
+    """
+    obs = {
+        k: v for k, v in template.items()
+        if k not in CALENDAR_FIELDS and k not in DERIVED_FIELDS
+    }
+    obs['date'] = day.isoformat()
+    obs['visitors_today'] = visitors
+    if overrides:
+        obs.update(overrides)
+    return obs
+
+
+def recursive_forecast(state, horizon, score_fn, future=None):
+    """
+    Forecast `horizon` days past the state's latest observation.
+
+    state    : TempleFeatureState with a pending observation (not modified)
+    score_fn : feature row dict -> /predict-style result dict
+    future   : optional list of per-day overrides (weather, bookings, ...)
+               for the 2nd, 3rd, ... simulated days
+    """
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+    if state.today is None:
+        raise ValueError("No observation recorded yet")
+
+    sim = state.copy()
+    template = sim.today
+    future = future or []
+
+    steps = []
+    for step in range(horizon):
+        result = score_fn(sim.feature_row())
+        target_day = sim.today_date + timedelta(days=1)
+        steps.append({
+            "date": target_day.isoformat(),
+            **{k: v for k, v in result.items() if k != "status"},
+        })
+
+        if step + 1 < horizon:
+            overrides = future[step] if step < len(future) else None
+            obs = next_observation(template, target_day, result["predicted_visitors"], overrides)
+            sim.observe(obs)
+            template = sim.today
+
+    return steps
@@ -1,91 +1,250 @@
 # api/main.py
+import os
+import sys
+import time
 import pandas as pd
 import uvicorn
 import numpy as np
-from fastapi import FastAPI
-import joblib
-from sklearn.preprocessing import LabelEncoder
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+
+# Make sibling modules importable for both `python api/main.py` and `uvicorn api.main:app`,
+# plus the training-side modules in src/ that serving shares
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(API_DIR), "src"))
+sys.path.insert(0, API_DIR)
+
+from batching import PredictionCoalescer
+from cache import PredictionCache
+from feature_state import FeatureStateStore
+from forecast import recursive_forecast
+from metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, request_age
+from registry import DEFAULT_TEMPLE, ModelRegistry
+from rules import apply_rules, apply_rules_one, rule_names
+
+# ==========================
+# Settings
+# ==========================
+MODELS_DIR = os.getenv("TRINETRA_MODELS_DIR", "./models")
+# Resident model cap and how often (seconds) to look for new artifacts on disk
+MAX_RESIDENT_MODELS = int(os.getenv("TRINETRA_MAX_RESIDENT_MODELS", "8"))
+RELOAD_CHECK_SECONDS = float(os.getenv("TRINETRA_RELOAD_CHECK_SECONDS", "5"))
+
+# Opt-in micro-batching of concurrent /predict calls
+COALESCE_ENABLED = os.getenv("TRINETRA_COALESCE", "0") == "1"
+COALESCE_WINDOW_MS = float(os.getenv("TRINETRA_COALESCE_WINDOW_MS", "2"))
+COALESCE_MAX_BATCH = int(os.getenv("TRINETRA_COALESCE_MAX_BATCH", "64"))
+
+# Raw prediction cache; size 0 turns it off
+CACHE_SIZE = int(os.getenv("TRINETRA_CACHE_SIZE", "4096"))
+CACHE_TTL_SECONDS = float(os.getenv("TRINETRA_CACHE_TTL", "300"))
+
+# Temples whose rolling history is kept for /predict/observed and /forecast
+MAX_TEMPLE_STATES = int(os.getenv("TRINETRA_MAX_TEMPLE_STATES", "1024"))
 
 # ==========================
 # Load artifacts
 # ==========================
-try:
-    model = joblib.load("./models/model_visitor_prediction_final.pkl")
-    print("✓ Model loaded successfully")
-except Exception as e:
-    print(f"✗ Error loading model: {e}")
-    raise e
+prediction_cache = None
+if CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL_SECONDS)
 
-try:
-    feature_columns = joblib.load("./models/feature_columns_final.pkl")
-    print("✓ Feature columns loaded successfully")
-except Exception as e:
-    print(f"✗ Error loading feature columns: {e}")
-    raise e
+def retire_model(loaded):
+    # Swapped-out or evicted model: its cached predictions are stale
+    if prediction_cache is not None:
+        prediction_cache.invalidate(loaded.version)
 
+registry = ModelRegistry(
+    MODELS_DIR,
+    max_resident=MAX_RESIDENT_MODELS,
+    check_interval=RELOAD_CHECK_SECONDS,
+    on_retire=retire_model,
+)
+
+# Other temples load lazily; the shared default is loaded now to fail fast
 try:
-    label_encoders = joblib.load("./models/label_encoders_final.pkl")
-    print("✓ Label encoders loaded successfully")
+    default_model = registry.get(DEFAULT_TEMPLE)
+    print(f"✓ Model loaded successfully (version {default_model.version})")
+    print(f"✓ Feature columns loaded successfully ({len(default_model.feature_columns)} features)")
 except Exception as e:
-    print(f"✗ Error loading label encoders: {e}")
-    # fallback to empty dict if not needed
-    label_encoders = {}
+    print(f"✗ Error loading default model: {e}")
+
+# Per-temple rolling history for /predict/observed
+feature_states = FeatureStateStore(max_temples=MAX_TEMPLE_STATES)
+
+def temple_state(temple_id, create=False):
+    """
+    Feature state of a temple. Observations (/predict/observed, seeding)
+    create it for any temple /predict would serve, falling back to the
+    default model like /predict does; reads never create it.
+    """
+    state = feature_states.lookup(temple_id)
+    if state is None:
+        if not create:
+            raise LookupError(f"No state for temple {temple_id!r}")
+        # Raises for names the registry rejects, as /predict does
+        registry.resolve(temple_id)
+        state = feature_states.get(temple_id)
+    return state
+
+coalescer = None
+if COALESCE_ENABLED:
+    coalescer = PredictionCoalescer(window_ms=COALESCE_WINDOW_MS, max_batch=COALESCE_MAX_BATCH)
+    print(f"✓ Request coalescing on ({COALESCE_WINDOW_MS} ms / {COALESCE_MAX_BATCH} rows)")
+
+# ==========================
+# Metrics
+# ==========================
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter(
+    "trinetra_requests_total", "HTTP requests by route, method and status code",
+    ("route", "method", "code"),
+)
+REQUEST_LATENCY = metrics.histogram(
+    "trinetra_request_duration_seconds", "End-to-end request latency", ("route",),
+)
+# Handlers answer failures with HTTP 200 + status "error", so count them here
+ERRORS = metrics.counter(
+    "trinetra_errors_total", "Failed requests by endpoint and exception type",
+    ("endpoint", "type"),
+)
+# path is "single" (/predict and friends) or "batch"; predict includes the
+# coalescing window when TRINETRA_COALESCE=1
+STAGE_LATENCY = metrics.histogram(
+    "trinetra_stage_duration_seconds",
+    "Prediction latency by stage (parse, encode, align, predict, rules)",
+    ("path", "stage"),
+)
+
+def collect_service_metrics():
+    """Gauges and counters that already live on the cache, registry and coalescer"""
+    families = []
+    if prediction_cache is not None:
+        stats = prediction_cache.stats()
+        families += [
+            ("trinetra_cache_hits_total", "counter", "Raw prediction cache hits", [({}, stats["hits"])]),
+            ("trinetra_cache_misses_total", "counter", "Raw prediction cache misses", [({}, stats["misses"])]),
+            ("trinetra_cache_hit_ratio", "gauge", "Cache hits / lookups since start", [({}, float(stats["hit_ratio"]))]),
+            ("trinetra_cache_entries", "gauge", "Entries in the raw prediction cache", [({}, stats["size"])]),
+        ]
+
+    resident = registry.resident()
+    families += [
+        ("trinetra_model_info", "gauge", "Resident models by directory and version (always 1)", [
+            ({"directory": m["directory"], "version": m["version"], "source": m["source"],
+              "model_type": m["model_type"]}, 1)
+            for m in resident
+        ]),
+        ("trinetra_model_loaded_timestamp_seconds", "gauge", "When each resident model was loaded", [
+            ({"directory": m["directory"], "version": m["version"]}, float(m["loaded_at"]))
+            for m in resident
+        ]),
+        ("trinetra_model_registry_events_total", "counter", "Model loads, hot reloads and LRU evictions", [
+            ({"event": "load"}, registry.loads),
+            ({"event": "reload"}, registry.reloads),
+            ({"event": "eviction"}, registry.evictions),
+        ]),
+    ]
+
+    if coalescer is not None:
+        families += [
+            ("trinetra_coalescer_batches_total", "counter", "Coalesced predict calls", [({}, coalescer.batches)]),
+            ("trinetra_coalescer_rows_total", "counter", "Rows scored through the coalescer", [({}, coalescer.rows)]),
+        ]
+    return families
+
+metrics.add_collector(collect_service_metrics)
+
+def error_response(endpoint, e, message):
+    ERRORS.inc((endpoint, type(e).__name__))
+    return {
+        "status": "error",
+        "error": str(e),
+        "message": message
+    }
+
+def get_model(input_data):
+    """Resolve the LoadedModel for a request's templeId / modelVersion"""
+    return registry.get(input_data.get("templeId"), input_data.get("modelVersion"))
 
 # ==========================
 # Post-processing rules
 # ==========================
-def apply_post_processing_rules(prediction, metadata):
+# Cumulative mode: every matching rule applies (see src/rules.py)
+def apply_post_processing_rules(prediction, metadata, params=None):
     """
     Apply intelligent rules based on temple status and conditions
     """
-    processed = prediction
-    rules_applied = []
-    
-    yatra_season = metadata.get('yatra_season', 1)
-    temple_status = metadata.get('temple_open_status', 'Open')
-    road_condition = metadata.get('road_condition', 'Good')
-    weather = metadata.get('weather_condition', 'Clear')
-    month = metadata.get('month', 6)
-    extreme_weather = metadata.get('extreme_weather', 0)
-    
-    # Rule 1: Temple completely closed
-    if yatra_season == 0:
-        if month in [12, 1, 2]:  # Deep winter
-            processed = min(processed, 150)
-            rules_applied.append("Winter closure cap")
-        else:
-            processed = min(processed, 300)
-            rules_applied.append("Regular closure cap")
-    
-    # Rule 2: Temple open but road closed
-    if road_condition == 'Closed':
-        processed = min(processed, 500)
-        rules_applied.append("Road closure cap")
-    
-    # Rule 3: Extreme weather
-    if extreme_weather == 1:
-        processed = processed * 0.7
-        rules_applied.append("Extreme weather reduction")
-    
-    # Rule 4: Heavy snow/rain
-    if weather in ['Snowy', 'Heavy Rain']:
-        processed = processed * 0.6
-        rules_applied.append("Severe weather reduction")
-    
-    # Rule 5: Temple open - enforce minimum
-    if yatra_season == 1:
-        processed = max(processed, 100)
-        rules_applied.append("Minimum visitors floor")
-    
-    # Rule 6: General floor
-    processed = max(processed, 50)
-    
-    return int(processed), rules_applied
+    processed, bitmask = apply_rules_one(prediction, metadata, params)
+    return int(processed), rule_names(bitmask)
+
+def apply_post_processing_rules_batch(predictions, metadata_df, params=None):
+    """
+    Vectorized version of apply_post_processing_rules for N predictions.
+    """
+    processed, bitmasks = apply_rules(predictions, metadata_df, params)
+    return processed.astype(int), [rule_names(mask) for mask in bitmasks]
+
+# ==========================
+# Feature preparation
+# ==========================
+def encode_columns(df, loaded):
+    """
+    Label-encode categorical columns in place.
+    Unseen categories fall back to any *_encoded value the caller sent, else
+    stay NaN (missing, filled by the layout like any other feature).
+    """
+    for col, lookup in loaded.encoder_lookup.items():
+        if col in df.columns:
+            encoded = df[col].astype(str).map(lookup)
+            encoded_col = col + '_encoded'
+            if encoded_col in df.columns:
+                encoded = encoded.fillna(df[encoded_col])
+            df[encoded_col] = encoded
+    return df
+
+def align_columns(df, loaded):
+    """
+    Reorder to the training feature order as a float matrix. Missing
+    features, nulls and non-numeric strings become NaN, then take the
+    training fill values, as in the single-row layout.
+    """
+    X = df.reindex(columns=loaded.feature_columns)
+    for col in X.columns[X.dtypes == object]:
+        X[col] = pd.to_numeric(X[col], errors="coerce")
+    return loaded.layout.fill_missing(X.to_numpy(dtype=loaded.layout.dtype))
+
+def encode_and_align(df, loaded):
+    return align_columns(encode_columns(df, loaded), loaded)
+
+def get_crowd_level(visitors):
+    if visitors < 2000:
+        return "Low"
+    elif visitors < 5000:
+        return "Medium"
+    elif visitors < 8000:
+        return "High"
+    return "Very High"
+
+def format_prediction(processed_prediction, raw_prediction, rules_applied):
+    return {
+        "status": "success",
+        "predicted_visitors": int(processed_prediction),
+        "raw_prediction": int(raw_prediction),
+        "confidence_interval": {
+            "lower": int(processed_prediction * 0.85),
+            "upper": int(processed_prediction * 1.15)
+        },
+        "crowd_level": get_crowd_level(processed_prediction),
+        "rules_applied": rules_applied
+    }
 
 # ==========================
 # FastAPI app
 # ==========================
 app = FastAPI(title="Trinetra - Kedarnath Crowd Prediction API")
+app.add_middleware(MetricsMiddleware, requests=REQUESTS, latency=REQUEST_LATENCY)
 
 @app.get("/")
 def root():
@@ -95,67 +254,217 @@ def root():
         "model": "Production Model with Post-Processing Rules"
     }
 
+def prepare_row(input_data, loaded, out=None):
+    """Fill the precompiled feature row (align, then encode), timing both stages"""
+    start = time.perf_counter()
+    row = loaded.layout.align_row(input_data, out)
+    aligned = time.perf_counter()
+    loaded.layout.encode_row(input_data, row)
+    STAGE_LATENCY.observe(("single", "align"), aligned - start)
+    STAGE_LATENCY.observe(("single", "encode"), time.perf_counter() - aligned)
+    return row
+
+def finish_prediction(raw_prediction, input_data, loaded):
+    start = time.perf_counter()
+    processed_prediction, rules_applied = apply_post_processing_rules(
+        raw_prediction,
+        input_data,
+        loaded.rule_params
+    )
+    STAGE_LATENCY.observe(("single", "rules"), time.perf_counter() - start)
+    return format_prediction(processed_prediction, raw_prediction, rules_applied)
+
+def cached_raw_prediction(row, loaded):
+    """Return (cache_key, raw_prediction or None) for an aligned feature row"""
+    if prediction_cache is None:
+        return None, None
+    key = PredictionCache.make_key(row)
+    return key, prediction_cache.get(key, loaded.version)
+
+def store_raw_prediction(key, loaded, raw_prediction):
+    if key is not None:
+        prediction_cache.put(key, loaded.version, raw_prediction)
+
+def predict_one(input_data):
+    loaded = get_model(input_data)
+    # Fill the precompiled feature row and predict in place
+    row = prepare_row(input_data, loaded)
+    key, raw_prediction = cached_raw_prediction(row, loaded)
+    if raw_prediction is None:
+        start = time.perf_counter()
+        raw_prediction = float(loaded.predict_fn(row)[0])
+        STAGE_LATENCY.observe(("single", "predict"), time.perf_counter() - start)
+        store_raw_prediction(key, loaded, raw_prediction)
+    return finish_prediction(raw_prediction, input_data, loaded)
+
 @app.post("/predict")
-def predict(input_data: dict):
+async def predict(input_data: dict, request: Request):
     """
     Expects input_data as JSON with required features
     """
+    # Arrival -> here: body read, JSON decode and validation
+    STAGE_LATENCY.observe(("single", "parse"), request_age(request.scope))
     try:
-        # Create DataFrame from input
-        df = pd.DataFrame([input_data])
-        
-        # Apply label encoders
-        for col, le in label_encoders.items():
-            if col in df.columns:
-                try:
-                    df[col + '_encoded'] = le.transform(df[col].astype(str))
-                except Exception:
-                    pass
-
-        # Align columns with training features
-        df = df.reindex(columns=feature_columns, fill_value=0)
-        
-        # Get raw prediction
-        raw_prediction = float(model.predict(df)[0])
-        
-        # Apply post-processing rules
-        processed_prediction, rules_applied = apply_post_processing_rules(
-            raw_prediction,
-            input_data
-        )
-        
-        # Calculate confidence interval
-        lower_bound = int(processed_prediction * 0.85)
-        upper_bound = int(processed_prediction * 1.15)
-        
-        # Determine crowd level
-        if processed_prediction < 2000:
-            crowd_level = "Low"
-        elif processed_prediction < 5000:
-            crowd_level = "Medium"
-        elif processed_prediction < 8000:
-            crowd_level = "High"
-        else:
-            crowd_level = "Very High"
-        
-        return {
-            "status": "success",
-            "predicted_visitors": processed_prediction,
-            "raw_prediction": int(raw_prediction),
-            "confidence_interval": {
-                "lower": lower_bound,
-                "upper": upper_bound
-            },
-            "crowd_level": crowd_level,
-            "rules_applied": rules_applied
-        }
+        if coalescer is None:
+            return await run_in_threadpool(predict_one, input_data)
+
+        loaded = get_model(input_data)
+        # Own row per request: it waits in the coalescer past this call
+        row = prepare_row(input_data, loaded, out=np.empty((1, loaded.layout.width), dtype=loaded.layout.dtype))
+        key, raw_prediction = cached_raw_prediction(row, loaded)
+        if raw_prediction is None:
+            start = time.perf_counter()
+            raw_prediction = await coalescer.submit(row[0], loaded.predict_fn)
+            STAGE_LATENCY.observe(("single", "predict"), time.perf_counter() - start)
+            store_raw_prediction(key, loaded, raw_prediction)
+        return finish_prediction(raw_prediction, input_data, loaded)
         
     except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "message": "Prediction failed"
-        }
+        return error_response("predict", e, "Prediction failed")
+
+@app.post("/predict/batch")
+def predict_batch(payload: dict, request: Request):
+    """
+    Expects {"records": [...]} where each record has the same fields as /predict.
+    A top-level templeId / modelVersion applies to records that do not set their own.
+    Encodes, aligns, predicts and applies the rules for all records of a model at once.
+    """
+    try:
+        records = payload.get("records", [])
+        if not records:
+            return {"status": "success", "count": 0, "predictions": []}
+
+        df = pd.DataFrame(records)
+        for field in ("templeId", "modelVersion"):
+            default = payload.get(field)
+            if field not in df.columns:
+                df[field] = default
+            elif default is not None:
+                df[field] = df[field].fillna(default)
+        STAGE_LATENCY.observe(("batch", "parse"), request_age(request.scope))
+
+        predictions = [None] * len(df)
+        groups = df.groupby([df["templeId"].astype(str), df["modelVersion"].astype(str)], sort=False)
+        for _, group in groups:
+            first = group.iloc[0]
+            loaded = registry.get(
+                None if pd.isna(first["templeId"]) else first["templeId"],
+                None if pd.isna(first["modelVersion"]) else first["modelVersion"],
+            )
+
+            start = time.perf_counter()
+            encoded = encode_columns(group.copy(), loaded)
+            encoded_at = time.perf_counter()
+            X = align_columns(encoded, loaded)
+            aligned_at = time.perf_counter()
+            raw_predictions = loaded.predict_fn(X).astype(float)
+            predicted_at = time.perf_counter()
+            processed, rules_applied = apply_post_processing_rules_batch(
+                raw_predictions, group, loaded.rule_params
+            )
+            STAGE_LATENCY.observe(("batch", "encode"), encoded_at - start)
+            STAGE_LATENCY.observe(("batch", "align"), aligned_at - encoded_at)
+            STAGE_LATENCY.observe(("batch", "predict"), predicted_at - aligned_at)
+            STAGE_LATENCY.observe(("batch", "rules"), time.perf_counter() - predicted_at)
+
+            for pos, p, r, rules in zip(group.index, processed, raw_predictions, rules_applied):
+                predictions[pos] = format_prediction(p, r, rules)
+
+        return {"status": "success", "count": len(predictions), "predictions": predictions}
+
+    except Exception as e:
+        return error_response("batch", e, "Batch prediction failed")
+
+@app.post("/predict/observed")
+def predict_observed(input_data: dict):
+    """
+    Expects today's raw observation only (templeId, date, visitors_today,
+    weather, bookings, ...). Lag, rolling, EWM and expanding features are
+    built from the temple's server-side history.
+    """
+    try:
+        if "date" not in input_data:
+            raise ValueError("date is required")
+
+        state = temple_state(input_data.get("templeId") or DEFAULT_TEMPLE, create=True)
+        with state.lock:
+            state.observe(input_data)
+            row = state.feature_row()
+
+        result = predict_one(row)
+        result["date"] = str(state.today_date)
+        return result
+
+    except Exception as e:
+        return error_response("observed", e, "Prediction failed")
+
+@app.post("/forecast")
+def forecast(input_data: dict, horizon: int = 7):
+    """
+    Expects today's raw observation as for /predict/observed, or just a
+    templeId to forecast from its latest recorded observation. An optional
+    "future" list overrides exogenous fields (weather, bookings, ...) for
+    the following simulated days. Returns one prediction per day. The
+    temple must already have history (seeded or observed).
+    """
+    try:
+        temple_id = input_data.get("templeId") or DEFAULT_TEMPLE
+        state = temple_state(temple_id)
+        with state.lock:
+            if "date" in input_data:
+                state.observe({k: v for k, v in input_data.items() if k != "future"})
+            snapshot = state.copy()
+
+        steps = recursive_forecast(snapshot, horizon, predict_one, input_data.get("future"))
+        return {"status": "success", "templeId": temple_id, "horizon": horizon, "forecast": steps}
+
+    except Exception as e:
+        return error_response("forecast", e, "Forecast failed")
+
+@app.post("/state/{temple_id}/seed")
+def seed_state(temple_id: str, payload: dict):
+    """
+    Expects {"records": [...]}: past daily observations in date order.
+    Replays them into the temple's history so /predict/observed has context.
+    """
+    try:
+        state = temple_state(temple_id, create=True)
+        with state.lock:
+            for record in payload.get("records", []):
+                state.observe(record)
+            return {"status": "success", "templeId": temple_id, **state.summary()}
+
+    except Exception as e:
+        return error_response("seed_state", e, "Seeding feature state failed")
+
+@app.get("/state")
+def state_summary():
+    return feature_states.summary()
+
+@app.get("/models")
+def models():
+    return registry.stats()
+
+@app.get("/cache/stats")
+def cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.get("/predict/coalescer")
+def coalescer_stats():
+    if coalescer is None:
+        return {"enabled": False}
+    return {"enabled": True, **coalescer.stats()}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.on_event("shutdown")
+def shutdown():
+    if coalescer is not None:
+        coalescer.shutdown()
 
 # ==========================
 # Run with uvicorn
@@ -0,0 +1,219 @@
+# api/metrics.py
+"""
+Prometheus-style metrics for the prediction API, without a client library.
+
+Counters and histograms write into per-thread shards: the first time a
+thread records a value it gets its own dict of plain lists, so the hot path
+is a thread-local lookup, a bisect and two list updates with no lock taken.
+Shards are only summed when /metrics is scraped. A scrape racing a writer can
+miss that one in-flight update, which is fine for monitoring.
+
+Values are per process: with several uvicorn workers, scrape each worker or
+aggregate in Prometheus.
+"""
+import bisect
+import math
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; single-row stages run in microseconds, batches in milliseconds
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(int(value))
+
+
+class _Sharded:
+    """Per-thread dicts of label values -> accumulated state"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()   # only taken when a new thread first records
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self):
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() runs without releasing the GIL, so a writer cannot resize it mid-copy
+        return [shard.copy() for shard in shards]
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        totals = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        shard = self._shard()
+        cell = shard.get(labels)
+        if cell is None:
+            # Per-bucket (non-cumulative) counts, the +Inf bucket, then the sum
+            cell = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def values(self):
+        totals = {}
+        for shard in self._snapshots():
+            for labels, cell in shard.items():
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = list(cell)
+                else:
+                    for i, v in enumerate(cell):
+                        total[i] += v
+        return totals
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = [_format_value(float(b)) for b in self.buckets] + ["+Inf"]
+        for labels, cell in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, cell):
+                cumulative += count
+                label_str = _format_labels(self.labelnames, labels, (("le", bound),))
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {repr(float(cell[-1]))}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Owns the counters/histograms and any collector callbacks. A collector
+    returns [(name, kind, help, [(labels dict, value), ...]), ...] computed
+    at scrape time, for values that already live elsewhere (cache, registry).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    label_str = _format_labels(labels.keys(), labels.values())
+                    lines.append(f"{name}{label_str} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no BaseHTTPMiddleware task overhead) that counts
+    requests by route template, method and status code, times them, and
+    stamps scope["state"]["request_start"] so handlers can time body parsing.
+    """
+
+    def __init__(self, app, requests, latency):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        scope.setdefault("state", {})["request_start"] = start
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route template, not the raw path, to keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.requests.inc((route, scope["method"], str(status)))
+            self.latency.observe((route,), time.perf_counter() - start)
+
+
+def request_age(scope):
+    """Seconds since MetricsMiddleware saw the request (0 if it did not)"""
+    start = scope.get("state", {}).get("request_start")
+    return 0.0 if start is None else time.perf_counter() - start
@@ -0,0 +1,305 @@
+# api/registry.py
+"""
+Model registry keyed by temple ID and model version.
+
+Artifacts live under the models directory:
+
+    models/                               shared default artifacts
+    models/<templeId>/                    temple-specific artifacts
+    models/<templeId>/<version>/          versioned artifacts (latest = highest version)
+
+Each directory holds either a model bundle (model_bundle_final.trnb, see
+src/bundle.py) or the three training pickles; the bundle wins when both exist.
+Versions compare run by run, digit runs as numbers: v9 < v10 < v10.1 and
+20240105 < 20241231 (dates and timestamps should be written year first).
+A temple without its own directory falls back to the shared artifacts.
+Temple IDs and versions are single directory names (letters, digits, "_",
+"." and "-"); anything else, or a path that leaves the models directory
+(e.g. through a symlink), is rejected as an unknown temple.
+Models are loaded on first use, at most `max_resident` stay in memory (LRU),
+and a changed artifact on disk is loaded and swapped in atomically: requests
+already holding the old LoadedModel finish with it.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+from bundle import BUNDLE_FILE, load_bundle, make_predict_fn
+from feature_layout import FeatureLayout
+from rules import DEFAULT_RULE_PARAMS
+
+MODEL_FILE = "model_visitor_prediction_final.pkl"
+FEATURES_FILE = "feature_columns_final.pkl"
+ENCODERS_FILE = "label_encoders_final.pkl"
+
+DEFAULT_TEMPLE = "default"
+
+NAME_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")
+
+
+def version_key(name):
+    """Sort key ordering version directory names numerically (v9 < v10)"""
+    # re.split with a group alternates text (even) and digit runs (odd)
+    return tuple((0, int(part), "") if i % 2 else (1, 0, part)
+                 for i, part in enumerate(re.split(r"([0-9]+)", name)) if part)
+
+
+def safe_name(value):
+    """`value` as a plain directory name, or None if it is anything else"""
+    name = str(value)
+    if not NAME_PATTERN.fullmatch(name) or name in (".", ".."):
+        return None
+    return name
+
+
+def artifact_version(path):
+    """Short content hash identifying a model artifact"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def has_artifacts(directory):
+    if os.path.isfile(os.path.join(directory, BUNDLE_FILE)):
+        return True
+    return (
+        os.path.isfile(os.path.join(directory, MODEL_FILE))
+        and os.path.isfile(os.path.join(directory, FEATURES_FILE))
+    )
+
+
+def artifact_signature(directory):
+    """Cheap stat-based signature used to notice new artifacts on disk"""
+    signature = []
+    for name in (BUNDLE_FILE, MODEL_FILE, FEATURES_FILE, ENCODERS_FILE):
+        try:
+            st = os.stat(os.path.join(directory, name))
+            signature.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((name, None, None))
+    return tuple(signature)
+
+
+class LoadedModel:
+    """Everything needed to score requests with one set of artifacts"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.signature = artifact_signature(directory)
+
+        self.metadata = {}
+        self.rule_params = DEFAULT_RULE_PARAMS
+        # Pickles come from model.py / retrain.py, which train on float32 frames
+        self.feature_dtype = np.float32
+        self.fill_values = None
+        bundle_path = os.path.join(directory, BUNDLE_FILE)
+        if os.path.isfile(bundle_path):
+            # Checksum and schema are verified by load_bundle
+            bundle = load_bundle(bundle_path)
+            self.model = bundle.model
+            self.version = bundle.version
+            self.feature_columns = bundle.feature_columns
+            self.label_encoders = bundle.label_encoders
+            self.metadata = bundle.metadata
+            self.rule_params = {**DEFAULT_RULE_PARAMS, **bundle.rule_params}
+            self.feature_dtype = bundle.feature_dtype
+            self.fill_values = bundle.fill_values
+            self.source = "bundle"
+        else:
+            model_path = os.path.join(directory, MODEL_FILE)
+            self.model = joblib.load(model_path)
+            self.version = artifact_version(model_path)
+            self.feature_columns = joblib.load(os.path.join(directory, FEATURES_FILE))
+
+            encoders_path = os.path.join(directory, ENCODERS_FILE)
+            self.label_encoders = joblib.load(encoders_path) if os.path.isfile(encoders_path) else {}
+            self.source = "pickles"
+
+            n_features = getattr(self.model, "n_features_in_", None)
+            if n_features is not None and n_features != len(self.feature_columns):
+                raise ValueError(
+                    f"{directory}: model expects {n_features} features, "
+                    f"feature list has {len(self.feature_columns)}"
+                )
+
+        # Class -> code lookups so whole columns can be encoded with a single map
+        self.encoder_lookup = {
+            col: {cls: code for code, cls in enumerate(le.classes_)}
+            for col, le in self.label_encoders.items()
+        }
+        self.layout = FeatureLayout(self.feature_columns, self.label_encoders, self.feature_dtype,
+                                    self.fill_values)
+        self.predict_fn = make_predict_fn(self.model)
+        self.loaded_at = time.time()
+
+    def describe(self):
+        return {
+            "directory": self.directory,
+            "version": self.version,
+            "source": self.source,
+            "features": len(self.feature_columns),
+            "model_type": type(self.model).__name__,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, root="./models", max_resident=8, check_interval=5.0, on_retire=None):
+        self.root = root
+        self.max_resident = max_resident
+        self.check_interval = check_interval
+        # Called with a LoadedModel when it is swapped out or evicted
+        self.on_retire = on_retire
+
+        # Keyed by artifact directories that exist; entries of evicted
+        # directories are dropped with them, so clients cannot grow these
+        self._resident = OrderedDict()   # directory -> LoadedModel
+        self._checked_at = {}            # directory -> last disk check
+        self._resolved = {}              # (temple_id, version) -> (directory, resolved_at)
+        self._lock = threading.Lock()
+        # Kept for the registry's lifetime: a loader may hold (or be about
+        # to take) a directory's lock when it is evicted, and a fresh lock
+        # would let a second thread load it again. One per model directory
+        # on disk, so still bounded.
+        self._load_locks = {}            # directory -> threading.Lock
+
+        self.loads = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def resolve(self, temple_id=None, version=None):
+        """Map (temple_id, version) to the artifact directory that serves it"""
+        temple_id = temple_id or DEFAULT_TEMPLE
+        key = (str(temple_id), None if version is None else str(version))
+        now = time.monotonic()
+
+        cached = self._resolved.get(key)
+        if cached is not None and now - cached[1] < self.check_interval:
+            return cached[0]
+
+        name = safe_name(temple_id)
+        if name is None:
+            raise ValueError(f"Unknown temple {temple_id!r}")
+        version_name = None if version is None else safe_name(version)
+        if version is not None and version_name is None:
+            raise ValueError(f"Unknown version {version!r} for temple {temple_id!r}")
+
+        directory = None
+        temple_dir = self._inside_root(os.path.join(self.root, name), temple_id)
+        if version is not None:
+            candidate = self._inside_root(os.path.join(temple_dir, version_name), temple_id)
+            if not has_artifacts(candidate):
+                raise FileNotFoundError(f"No artifacts for temple {temple_id} version {version}")
+            directory = candidate
+        elif temple_id != DEFAULT_TEMPLE and os.path.isdir(temple_dir):
+            versions = sorted(
+                (entry for entry in os.listdir(temple_dir)
+                 if has_artifacts(os.path.join(temple_dir, entry))),
+                key=version_key,
+            )
+            if versions:
+                directory = os.path.join(temple_dir, versions[-1])
+            elif has_artifacts(temple_dir):
+                directory = temple_dir
+
+        if directory is None:
+            if not has_artifacts(self.root):
+                raise FileNotFoundError(f"No artifacts for temple {temple_id} in {self.root}")
+            directory = self.root
+
+        # Temples without their own directory fall back uncached: any string
+        # resolves that way, so caching them would let clients fill the dict
+        if directory != self.root or temple_id == DEFAULT_TEMPLE:
+            with self._lock:
+                self._resolved[key] = (directory, now)
+        return directory
+
+    def _inside_root(self, path, temple_id):
+        """`path` if it resolves to a place under the models directory"""
+        root = os.path.realpath(self.root)
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            raise ValueError(f"Unknown temple {temple_id!r}")
+        return path
+
+    def get(self, temple_id=None, version=None):
+        directory = self.resolve(temple_id, version)
+        now = time.monotonic()
+
+        with self._lock:
+            loaded = self._resident.get(directory)
+            if loaded is not None:
+                self._resident.move_to_end(directory)
+                if now - self._checked_at.get(directory, 0) < self.check_interval:
+                    return loaded
+                self._checked_at[directory] = now
+            load_lock = self._load_locks.setdefault(directory, threading.Lock())
+
+        if loaded is not None and artifact_signature(directory) == loaded.signature:
+            return loaded
+
+        # Load outside the registry lock; one loader per directory
+        with load_lock:
+            with self._lock:
+                current = self._resident.get(directory)
+            if current is not None and current is not loaded:
+                return current
+
+            try:
+                fresh = LoadedModel(directory)
+            except Exception as e:
+                if loaded is None:
+                    raise
+                # Half-written or broken artifact: keep serving the old model
+                print(f"✗ Reload of {directory} failed, keeping version {loaded.version}: {e}")
+                return loaded
+
+            retired = []
+            with self._lock:
+                self._resident[directory] = fresh
+                self._resident.move_to_end(directory)
+                self._checked_at[directory] = time.monotonic()
+                if loaded is not None:
+                    self.reloads += 1
+                    retired.append(loaded)
+                else:
+                    self.loads += 1
+                while len(self._resident) > self.max_resident:
+                    evicted_dir, evicted = self._resident.popitem(last=False)
+                    self._forget(evicted_dir)
+                    self.evictions += 1
+                    retired.append(evicted)
+
+        if loaded is not None:
+            print(f"✓ Hot-swapped {directory}: {loaded.version} -> {fresh.version}")
+        if self.on_retire is not None:
+            for old in retired:
+                self.on_retire(old)
+        return fresh
+
+    def _forget(self, directory):
+        """Drop the bookkeeping of an evicted directory (caller holds self._lock)"""
+        self._checked_at.pop(directory, None)
+        for key in [key for key, (resolved, _) in self._resolved.items() if resolved == directory]:
+            del self._resolved[key]
+
+    def resident(self):
+        with self._lock:
+            return [m.describe() for m in self._resident.values()]
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "max_resident": self.max_resident,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "evictions": self.evictions,
+            "resident": self.resident(),
+        }
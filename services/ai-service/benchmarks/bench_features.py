@@ -0,0 +1,161 @@
+"""
+FEATURE ENGINEERING BENCHMARK
+Compares the original src/model.py feature code (polyfit in rolling().apply,
+per-season loc loop, expanding means via groupby().transform) with the
+vectorized src/features.py on a synthetic multi-temple, multi-year frame.
+
+The old code handles one temple at a time, so it runs once per temple; the
+vectorized build runs once over all temples with by='temple_id'.
+
+Run from services/ai-service:
+    python benchmarks/bench_features.py --data ./data/kedarnath_temple_mock_dataset.csv --years 10 --temples 24
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from features import build_features
+
+
+def legacy_features(df):
+    """Feature engineering as src/model.py had it before src/features.py"""
+    categorical_columns = ['weather_condition', 'yatra_phase', 'temple_open_status', 'road_condition']
+    for col in categorical_columns:
+        if col in df.columns:
+            le = LabelEncoder()
+            df[col + '_encoded'] = le.fit_transform(df[col].astype(str))
+
+    df['day_of_month'] = df['date'].dt.day
+    df['quarter'] = df['date'].dt.quarter
+    df['is_month_start'] = (df['date'].dt.day <= 7).astype(int)
+    df['is_month_end'] = (df['date'].dt.day >= 24).astype(int)
+
+    df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
+    df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
+    df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
+    df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
+    df['week_sin'] = np.sin(2 * np.pi * df['week_of_year'] / 52)
+    df['week_cos'] = np.cos(2 * np.pi * df['week_of_year'] / 52)
+
+    df['temp_humidity_interaction'] = df['temperature_avg'] * df['humidity'] / 100
+    df['rainfall_temp'] = df['rainfall'] * df['temperature_avg']
+    df['extreme_weather'] = ((df['rainfall'] > 50) | (df['temperature_avg'] < 5)).astype(int)
+
+    df['weekend_festival'] = df['is_weekend'] * df['is_festival']
+    df['holiday_weekend'] = df['is_holiday'] * df['is_weekend']
+    df['weekend_vacation'] = df['is_weekend'] * df['school_vacation']
+    df['peak_weekend'] = df['is_weekend'] * df['yatra_season']
+
+    df['days_since_season_start'] = 0
+    season_changes = df['yatra_season'].ne(df['yatra_season'].shift()).cumsum()
+    for season_id in season_changes.unique():
+        mask = season_changes == season_id
+        if mask.sum() > 0:
+            df.loc[mask, 'days_since_season_start'] = range(mask.sum())
+
+    for lag in [1, 2, 3, 7, 14]:
+        df[f'visitors_lag_{lag}'] = df['visitors_today'].shift(lag)
+
+    for window in [3, 7, 14, 30]:
+        df[f'visitors_rolling_mean_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).mean()
+        df[f'visitors_rolling_std_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).std().fillna(0)
+        df[f'visitors_rolling_max_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).max()
+        df[f'visitors_rolling_min_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).min()
+
+    df['visitor_trend_7d'] = df['visitors_today'].shift(1).rolling(7, min_periods=2).apply(
+        lambda x: np.polyfit(range(len(x)), x, 1)[0] if len(x) > 1 else 0, raw=True
+    )
+    df['visitor_momentum'] = df['visitors_today'].shift(1) - df['visitors_today'].shift(8)
+
+    df['visitors_ewm_7'] = df['visitors_today'].shift(1).ewm(span=7, adjust=False).mean()
+    df['visitors_ewm_30'] = df['visitors_today'].shift(1).ewm(span=30, adjust=False).mean()
+
+    df['dow_avg_visitors'] = df.groupby('day_of_week')['visitors_today'].transform(
+        lambda x: x.shift(1).expanding().mean()
+    )
+    df['month_avg_visitors'] = df.groupby('month')['visitors_today'].transform(
+        lambda x: x.shift(1).expanding().mean()
+    )
+
+    df['occupancy_booking_ratio'] = df['hotel_occupancy_rate'] / (df['bus_bookings'] + 1)
+    df['demand_pressure'] = (df['google_trends_score'] * df['bus_bookings']) / 1000
+    df['festival_within_3days'] = (df['days_to_next_festival'] <= 3).astype(int)
+    df['festival_within_week'] = (df['days_to_next_festival'] <= 7).astype(int)
+    return df
+
+
+def synthetic_temples(base, years, temples, seed=42):
+    """Tile the base dataset to `years` per temple with per-temple noise on visitors"""
+    base = base.sort_values('date').reset_index(drop=True)
+    days = years * 365
+    reps = -(-days // len(base))
+    tiled = pd.concat([base] * reps, ignore_index=True).iloc[:days].copy()
+    tiled['date'] = pd.date_range(base['date'].min(), periods=days, freq='D')
+
+    rng = np.random.default_rng(seed)
+    frames = []
+    for t in range(temples):
+        frame = tiled.copy()
+        scale = rng.uniform(0.5, 1.5)
+        noise = rng.normal(0, 50, len(frame))
+        frame['visitors_today'] = np.maximum(0, (frame['visitors_today'] * scale + noise).round()).astype('int64')
+        frame.insert(0, 'temple_id', f'temple_{t:03d}')
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/kedarnath_temple_mock_dataset.csv')
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--temples', type=int, default=24)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.data, parse_dates=['date'])
+    frame = synthetic_temples(base, args.years, args.temples)
+
+    def run_legacy():
+        return [legacy_features(group.reset_index(drop=True)) for _, group in frame.groupby('temple_id', sort=False)]
+
+    def run_vectorized():
+        return build_features(frame.copy(), by='temple_id')[0]
+
+    # Same features (up to polyfit rounding noise in the trend) before timing
+    legacy = pd.concat(run_legacy(), ignore_index=True)
+    vectorized = run_vectorized()
+    for col in legacy.columns:
+        if col.endswith('_encoded') or not pd.api.types.is_numeric_dtype(legacy[col]):
+            continue
+        a, b = legacy[col].to_numpy(float), vectorized[col].to_numpy(float)
+        assert np.array_equal(np.isnan(a), np.isnan(b)), f"{col}: NaN positions differ"
+        assert np.allclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True), f"{col}: values differ"
+
+    print("=" * 80)
+    print(f"FEATURE ENGINEERING ({args.temples} temples x {args.years} years = {len(frame):,} rows)")
+    print("=" * 80)
+    print(f"{'Path':<12} {'best (s)':<12} {'rows/s':<12}")
+
+    results = {}
+    for name, fn in [('legacy', run_legacy), ('vectorized', run_vectorized)]:
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+        print(f"{name:<12} {results[name]:<12.3f} {len(frame) / results[name]:<12,.0f}")
+
+    print(f"\nSpeedup: {results['legacy'] / results['vectorized']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+SINGLE-ROW INFERENCE BENCHMARK
+Compares the original pandas /predict path with the precompiled FeatureLayout path.
+
+Run from services/ai-service (same working directory as the API):
+    python benchmarks/bench_single_row.py --data ./data/kedarnath_temple_mock_dataset.csv
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from bundle import make_predict_fn
+from feature_layout import FeatureLayout
+
+
+def pandas_path(input_data, model, feature_columns, label_encoders):
+    """The /predict feature path before the precompiled layout"""
+    df = pd.DataFrame([input_data])
+    for col, le in label_encoders.items():
+        if col in df.columns:
+            try:
+                df[col + '_encoded'] = le.transform(df[col].astype(str))
+            except Exception:
+                pass
+    df = df.reindex(columns=feature_columns, fill_value=0)
+    return float(model.predict(df)[0])
+
+
+def time_calls(fn, records, repeats):
+    timings = np.empty(repeats * len(records))
+    i = 0
+    for _ in range(repeats):
+        for record in records:
+            start = time.perf_counter()
+            fn(record)
+            timings[i] = time.perf_counter() - start
+            i += 1
+    return timings * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/kedarnath_temple_mock_dataset.csv')
+    parser.add_argument('--models', default='./models')
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(args.models, 'model_visitor_prediction_final.pkl'))
+    feature_columns = joblib.load(os.path.join(args.models, 'feature_columns_final.pkl'))
+    label_encoders = joblib.load(os.path.join(args.models, 'label_encoders_final.pkl'))
+
+    df = pd.read_csv(args.data)
+    sample = df.sample(min(args.samples, len(df)), random_state=42)
+    records = [
+        {k: (v.item() if hasattr(v, 'item') else v) for k, v in row.items()}
+        for row in sample.to_dict(orient='records')
+    ]
+
+    layout = FeatureLayout(feature_columns, label_encoders)
+    predict_fn = make_predict_fn(model)
+
+    def layout_path(input_data):
+        return float(predict_fn(layout.fill_row(input_data))[0])
+
+    # Both paths must agree before timing means anything
+    for record in records:
+        a = pandas_path(record, model, feature_columns, label_encoders)
+        b = layout_path(record)
+        assert abs(a - b) <= 1e-3 * max(1.0, abs(a)), f"Paths disagree: {a} vs {b}"
+
+    print("=" * 80)
+    print(f"SINGLE-ROW INFERENCE ({len(records)} records x {args.repeats} repeats)")
+    print("=" * 80)
+    print(f"{'Path':<12} {'p50 (ms)':<12} {'p95 (ms)':<12} {'p99 (ms)':<12}")
+
+    results = {}
+    for name, fn in [
+        ('pandas', lambda r: pandas_path(r, model, feature_columns, label_encoders)),
+        ('layout', layout_path),
+    ]:
+        fn(records[0])
+        t = time_calls(fn, records, args.repeats)
+        results[name] = np.percentile(t, 50)
+        print(f"{name:<12} {np.percentile(t, 50):<12.3f} {np.percentile(t, 95):<12.3f} {np.percentile(t, 99):<12.3f}")
+
+    print(f"\nSpeedup (p50): {results['pandas'] / results['layout']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
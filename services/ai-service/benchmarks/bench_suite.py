@@ -0,0 +1,374 @@
+"""
+AI-SERVICE BENCHMARK SUITE
+Times every stage of the service on a dataset generated on the spot and
+compares the numbers with a JSON baseline:
+
+    generate   create_dataset.generate (--years of daily rows) and the
+               15-minute intraday split of the same rows
+    features   features.build_features on the generated frame
+    train      each default candidate fitted alone on the training split
+               (best of --train-repeats fits)
+    predict    /predict single-request p50 / p95, /predict/batch latency for
+               --batch-size records, and /predict under --concurrency
+               parallel clients (p95 and requests per second)
+
+The best candidate is saved to a temporary models directory and served by
+api/main.py on a local uvicorn server (prediction cache off), or pass --url
+to measure a running API instead.
+
+A metric regresses when it is worse than the baseline by more than its
+threshold (relative, --threshold or the baseline's "thresholds" entry) and
+by more than the unit's noise floor; the run then exits with status 1.
+With no baseline yet, or with --update-baseline, the results become the
+baseline. Baselines are machine-specific: record one per machine / CI
+runner.
+
+Run from services/ai-service:
+    python benchmarks/bench_suite.py [--baseline benchmarks/baselines.json] [--years 10]
+        [--stages generate,features,train,predict] [--threshold 0.25] [--update-baseline]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import create_dataset
+import intraday
+from features import CATEGORICAL_COLUMNS, RULE_METADATA_COLUMNS, build_features, training_frame
+from schema import feature_matrix
+from training import available_cores, default_candidates
+
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+STAGES = ('generate', 'features', 'train', 'predict')
+DEFAULT_THRESHOLD = 0.25
+# Changes smaller than this never count as regressions (timer and scheduler noise)
+NOISE_FLOOR = {'s': 0.01, 'ms': 0.5, 'req/s': 5.0}
+HIGHER_IS_BETTER = {'req/s'}
+
+
+def best_of(fn, repeats):
+    """Fastest of `repeats` runs of fn(), in seconds, and the last result"""
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def metric(value, unit):
+    return {'value': round(float(value), 4), 'unit': unit}
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def bench_generate(args, state):
+    start = pd.Timestamp(create_dataset.END_DATE) - pd.DateOffset(years=args.years) + pd.Timedelta(days=1)
+    seconds, daily = best_of(lambda: create_dataset.generate(start, create_dataset.END_DATE), args.repeats)
+    intraday_seconds, slots = best_of(lambda: intraday.intraday_frame(daily, 15), args.repeats)
+    state['daily'] = daily
+    print(f"   {len(daily):,} daily rows, {len(slots):,} intraday rows")
+    return {
+        'generate.daily_s': metric(seconds, 's'),
+        'generate.intraday_15min_s': metric(intraday_seconds, 's'),
+    }
+
+
+def bench_features(args, state):
+    daily = state['daily']
+    seconds, (df, label_encoders) = best_of(lambda: build_features(daily.copy()), args.repeats)
+    state['features'] = df
+    state['label_encoders'] = label_encoders
+    print(f"   {df.shape[1]} columns")
+    return {'features.build_s': metric(seconds, 's')}
+
+
+def bench_train(args, state):
+    X, y, _, _, feature_columns = training_frame(state['features'])
+    split = int(len(X) * 0.8)
+    X_train, y_train = feature_matrix(X[:split]), y[:split].to_numpy()
+    X_test, y_test = feature_matrix(X[split:]), y[split:].to_numpy()
+
+    results = {}
+    best = None
+    for name, estimator in default_candidates(feature_columns=feature_columns).items():
+        seconds, model = best_of(lambda: estimator.fit(X_train, y_train), args.train_repeats)
+        mae = float(np.mean(np.abs(model.predict(X_test) - y_test)))
+        print(f"   {name:<20} {seconds:7.2f}s  MAE {mae:.1f}")
+        results[f'train.{name}_s'] = metric(seconds, 's')
+        if best is None or mae < best[1]:
+            best = (name, mae, model)
+
+    state['model'] = best
+    state['feature_columns'] = feature_columns
+    state['records'] = request_records(state['features'].iloc[split:], feature_columns)
+    return results
+
+
+def request_records(df, feature_columns):
+    """JSON-ready /predict payloads: feature values plus the fields the rules and encoders read"""
+    extra = [col for col in CATEGORICAL_COLUMNS + RULE_METADATA_COLUMNS if col not in feature_columns]
+    columns = list(dict.fromkeys(feature_columns + extra))
+    return json.loads(df[columns].to_json(orient='records'))
+
+
+class LocalServer:
+    """api/main.py on uvicorn in a background thread, serving `models_dir`"""
+
+    def __init__(self, models_dir):
+        os.environ['TRINETRA_MODELS_DIR'] = models_dir
+        os.environ.setdefault('TRINETRA_CACHE_SIZE', '0')
+        sys.path.insert(0, os.path.join(ROOT, 'api'))
+        import uvicorn
+        from main import app
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=self.port, log_level='warning'))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("API server did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class Client:
+    """Keep-alive JSON client for one thread"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+
+    def post(self, path, payload):
+        self.conn.request('POST', path, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+        response = self.conn.getresponse()
+        body = json.loads(response.read())
+        if response.status != 200 or body.get('status') != 'success':
+            raise RuntimeError(f"POST {path} failed ({response.status}): {body}")
+        return body
+
+    def timed_post(self, path, payload):
+        start = time.perf_counter()
+        self.post(path, payload)
+        return (time.perf_counter() - start) * 1000
+
+
+def bench_predict(args, state):
+    if args.url:
+        return measure_api(args, args.url, state['records'])
+
+    from model import save_artifacts
+
+    name, mae, model = state['model']
+    with tempfile.TemporaryDirectory() as models_dir:
+        save_artifacts(models_dir, model, state['feature_columns'], state['label_encoders'],
+                       metadata={'model_name': name, 'mae_raw': mae})
+        with LocalServer(models_dir) as server:
+            return measure_api(args, server.url, state['records'])
+
+
+def measure_api(args, url, records):
+    records = (records * (1 + args.requests // max(len(records), 1)))[:max(args.requests, args.batch_size)]
+    client = Client(url)
+    for record in records[:20]:
+        client.post('/predict', record)
+
+    single = np.array([client.timed_post('/predict', record) for record in records[:args.requests]])
+    batch = [client.timed_post('/predict/batch', {'records': records[:args.batch_size]})
+             for _ in range(args.repeats)]
+
+    local = threading.local()
+
+    def concurrent_call(record):
+        if not hasattr(local, 'client'):
+            local.client = Client(url)
+        return local.client.timed_post('/predict', record)
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        start = time.perf_counter()
+        concurrent = np.array(list(pool.map(concurrent_call, records[:args.requests])))
+        wall = time.perf_counter() - start
+
+    print(f"   single p50 {np.percentile(single, 50):.2f} ms, batch of {args.batch_size} {min(batch):.1f} ms, "
+          f"{args.concurrency} clients {len(concurrent) / wall:.0f} req/s")
+    return {
+        'predict.single_p50_ms': metric(np.percentile(single, 50), 'ms'),
+        'predict.single_p95_ms': metric(np.percentile(single, 95), 'ms'),
+        f'predict.batch_{args.batch_size}_ms': metric(min(batch), 'ms'),
+        'predict.concurrent_p95_ms': metric(np.percentile(concurrent, 95), 'ms'),
+        'predict.concurrent_rps': metric(len(concurrent) / wall, 'req/s'),
+    }
+
+
+STAGE_FUNCTIONS = {
+    'generate': bench_generate,
+    'features': bench_features,
+    'train': bench_train,
+    'predict': bench_predict,
+}
+# Stages whose outputs later stages read
+REQUIRES = {'features': 'generate', 'train': 'features', 'predict': 'train'}
+
+
+# ============================================================================
+# BASELINES
+# ============================================================================
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cores': available_cores(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, run, previous=None):
+    baseline = dict(run)
+    # Hand-tuned thresholds survive a baseline refresh
+    if previous and previous.get('thresholds'):
+        baseline['thresholds'] = previous['thresholds']
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(metrics, baseline, threshold):
+    """Rows of (name, baseline, current, change, limit, regressed) for metrics in both runs"""
+    thresholds = baseline.get('thresholds', {})
+    rows = []
+    for name, current in metrics.items():
+        previous = baseline['metrics'].get(name)
+        if previous is None:
+            continue
+        base, value, unit = previous['value'], current['value'], current['unit']
+        limit = thresholds.get(name, threshold)
+        if unit in HIGHER_IS_BETTER:
+            worse = base - value
+        else:
+            worse = value - base
+        change = worse / base if base else 0.0
+        regressed = change > limit and worse > NOISE_FLOOR.get(unit, 0.0)
+        rows.append((name, base, value, unit, change, limit, regressed))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"\n{'Metric':<32} {'baseline':>10} {'current':>10} {'unit':<6} {'worse by':>9} {'limit':>7}")
+    for name, base, value, unit, change, limit, regressed in rows:
+        flag = '  ❌ REGRESSION' if regressed else ''
+        print(f"{name:<32} {base:>10.3f} {value:>10.3f} {unit:<6} {change:>8.1%} {limit:>7.0%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--out', default=None, help='Also write this run\'s results to this JSON file')
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--years', type=int, default=10, help='Years of daily data to generate')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--train-repeats', type=int, default=2, help='Fits per candidate (best is kept)')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--url', default=None, help='Benchmark a running API instead of a local server')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative slowdown per metric')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    selected = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(selected) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    # Pull in the stages the selected ones depend on; only the selected ones are reported
+    stages = set(selected)
+    for stage in selected:
+        while stage in REQUIRES:
+            stage = REQUIRES[stage]
+            stages.add(stage)
+
+    print("=" * 80)
+    print(f"AI-SERVICE BENCHMARK SUITE ({args.years} years, {available_cores()} cores)")
+    print("=" * 80)
+
+    state = {}
+    metrics = {}
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        print(f"\n▶ {stage}")
+        stage_metrics = STAGE_FUNCTIONS[stage](args, state)
+        if stage in selected:
+            metrics.update(stage_metrics)
+
+    run = {
+        'environment': environment(),
+        'settings': {key: getattr(args, key) for key in ('years', 'repeats', 'train_repeats', 'requests', 'batch_size', 'concurrency')},
+        'metrics': metrics,
+    }
+    if args.out:
+        save_baseline(args.out, run)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None or args.update_baseline:
+        save_baseline(args.baseline, run, baseline)
+        print(f"\n✅ Baseline written: {args.baseline}")
+        return 0
+
+    if baseline.get('environment', {}).get('cores') != run['environment']['cores']:
+        print(f"\n⚠️  Baseline was recorded on {baseline['environment'].get('cores')} cores, "
+              f"this machine has {run['environment']['cores']}")
+    if baseline.get('settings') != run['settings']:
+        print("⚠️  Baseline was recorded with different settings:", baseline.get('settings'))
+
+    rows = compare(metrics, baseline, args.threshold)
+    print_comparison(rows)
+    regressions = [row[0] for row in rows if row[-1]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
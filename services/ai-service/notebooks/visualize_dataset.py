@@ -1,13 +1,25 @@
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from schema import read_raw
 # Set style
 plt.style.use('seaborn-v0_8-darkgrid')
 sns.set_palette("husl")
 
 # Load data
-df = pd.read_csv('kedarnath_temple_mock_dataset.csv')
-df['date'] = pd.to_datetime(df['date'])
+# Only the columns plotted below, with the compact dtypes of src/schema.py;
+# the dataset may be the CSV or a Parquet file written by src/create_dataset.py
+DATA_PATH = sys.argv[1] if len(sys.argv) > 1 else 'kedarnath_temple_mock_dataset.csv'
+df = read_raw(DATA_PATH, columns=[
+    'date', 'month', 'is_weekend', 'weather_condition', 'is_festival', 'yatra_phase',
+    'temperature_avg', 'rainfall', 'visitors_today',
+])
 
 # Create visualization dashboard
 fig = plt.figure(figsize=(18, 12))
@@ -23,7 +35,7 @@ plt.grid(True, alpha=0.3)
 
 # 2. Monthly average visitors
 ax2 = plt.subplot(3, 3, 2)
-monthly_avg = df.groupby('month')['visitors_today'].mean()
+monthly_avg = df.groupby('month', observed=True)['visitors_today'].mean()
 months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 plt.bar(range(1, 13), monthly_avg.values, color='steelblue', edgecolor='black')
 plt.title('Average Visitors by Month', fontsize=12, fontweight='bold')
@@ -34,7 +46,7 @@ plt.grid(True, alpha=0.3, axis='y')
 
 # 3. Weekend vs Weekday
 ax3 = plt.subplot(3, 3, 3)
-weekend_data = df.groupby('is_weekend')['visitors_today'].mean()
+weekend_data = df.groupby('is_weekend', observed=True)['visitors_today'].mean()
 plt.bar(['Weekday', 'Weekend'], weekend_data.values, color=['coral', 'lightgreen'], edgecolor='black')
 plt.title('Weekday vs Weekend Visitors', fontsize=12, fontweight='bold')
 plt.ylabel('Average Visitors')
@@ -42,7 +54,7 @@ plt.grid(True, alpha=0.3, axis='y')
 
 # 4. Weather condition impact
 ax4 = plt.subplot(3, 3, 4)
-weather_avg = df.groupby('weather_condition')['visitors_today'].mean().sort_values()
+weather_avg = df.groupby('weather_condition', observed=True)['visitors_today'].mean().sort_values()
 plt.barh(weather_avg.index, weather_avg.values, color='skyblue', edgecolor='black')
 plt.title('Impact of Weather Conditions', fontsize=12, fontweight='bold')
 plt.xlabel('Average Visitors')
@@ -50,7 +62,7 @@ plt.grid(True, alpha=0.3, axis='x')
 
 # 5. Festival impact
 ax5 = plt.subplot(3, 3, 5)
-festival_data = df.groupby('is_festival')['visitors_today'].mean()
+festival_data = df.groupby('is_festival', observed=True)['visitors_today'].mean()
 plt.bar(['Regular Day', 'Festival'], festival_data.values, color=['lightcoral', 'gold'], edgecolor='black')
 plt.title('Festival vs Regular Day', fontsize=12, fontweight='bold')
 plt.ylabel('Average Visitors')
@@ -58,7 +70,7 @@ plt.grid(True, alpha=0.3, axis='y')
 
 # 6. Yatra phase distribution
 ax6 = plt.subplot(3, 3, 6)
-phase_avg = df.groupby('yatra_phase')['visitors_today'].mean()
+phase_avg = df.groupby('yatra_phase', observed=True)['visitors_today'].mean()
 plt.bar(phase_avg.index, phase_avg.values, color='mediumpurple', edgecolor='black')
 plt.title('Visitors by Yatra Phase', fontsize=12, fontweight='bold')
 plt.ylabel('Average Visitors')
@@ -76,7 +88,7 @@ plt.grid(True, alpha=0.3)
 # 8. Rainfall impact
 ax8 = plt.subplot(3, 3, 8)
 rainfall_bins = pd.cut(df['rainfall'], bins=[0, 5, 20, 50, 100], labels=['No Rain', 'Light', 'Moderate', 'Heavy'])
-rainfall_impact = df.groupby(rainfall_bins)['visitors_today'].mean()
+rainfall_impact = df.groupby(rainfall_bins, observed=True)['visitors_today'].mean()
 plt.bar(rainfall_impact.index, rainfall_impact.values, color='steelblue', edgecolor='black')
 plt.title('Rainfall Impact on Visitors', fontsize=12, fontweight='bold')
 plt.ylabel('Average Visitors')
@@ -0,0 +1,250 @@
+"""
+WALK-FORWARD BACKTEST
+Expanding-window evaluation of the candidate models over many folds,
+instead of the single 80/20 holdout in model.py.
+
+Fold k trains on rows [0, train_end_k) and scores the next `test_size`
+rows; train_end moves forward by `test_size` each fold, so every test day
+is scored exactly once, by a model that only saw earlier days.
+
+Folds x candidates run as independent tasks in a process pool (one
+thread per task, one task per core) started from the same forkserver as
+src/training.py, so no worker inherits this process's OpenMP thread pools.
+The feature matrix is converted to one float32 array up front - the dtype
+XGBoost and sklearn trees work in, so they do not convert it again - and
+pickled once to each worker when it starts; each fold's train and test
+rows are slices (views) of that array, and a task only sends back its
+test-fold predictions.
+
+Predictions go through the same post-processing rules as model.py, and
+every fold is scored on MAE / MAPE overall and split by open and closed
+season.
+
+Run from services/ai-service:
+    python src/backtest.py --data ./data/kedarnath_temple_mock_dataset.csv --folds 36
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from feature_store import load_csv_features
+from features import training_frame
+from rules import apply_rules
+from schema import feature_matrix
+from training import START_METHOD, available_cores, default_candidates, is_multithreaded
+
+# Set once in each worker by run_tasks (the pool initializer), not per task
+_X = None
+_y = None
+
+
+def walk_forward_folds(n_rows, n_folds, min_train=None, test_size=None):
+    """
+    [(train_end, test_end), ...] row bounds for an expanding-window
+    backtest. By default the first half of the rows is the minimum
+    training window and the rest is split into `n_folds` test windows.
+    """
+    if min_train is None:
+        min_train = n_rows // 2
+    if test_size is None:
+        test_size = max(1, (n_rows - min_train) // n_folds)
+    folds = []
+    train_end = min_train
+    while len(folds) < n_folds and train_end < n_rows:
+        test_end = min(train_end + test_size, n_rows)
+        folds.append((train_end, test_end))
+        train_end = test_end
+    if not folds:
+        raise ValueError(f"min_train={min_train} leaves no rows to test out of {n_rows}")
+    return folds
+
+
+def _init_worker(X, y):
+    global _X, _y
+    _X, _y = X, y
+    warnings.filterwarnings('ignore')
+
+
+def fold_arrays():
+    """(X, y) arrays of the run_tasks call this worker belongs to"""
+    return _X, _y
+
+
+def run_tasks(func, tasks, X_values, y_values, max_workers=None):
+    """
+    [func(*task) for task in tasks], run in a forkserver process pool whose
+    workers receive the arrays once and read them through fold_arrays().
+    `func` must be importable (module level) and callers need the
+    `if __name__ == '__main__':` guard, as for training.train_candidates.
+    Runs in this process when forkserver is unavailable or there is a
+    single worker.
+    """
+    max_workers = min(max_workers or available_cores(), len(tasks))
+    if START_METHOD in mp.get_all_start_methods() and max_workers > 1:
+        with ProcessPoolExecutor(max_workers, mp_context=mp.get_context(START_METHOD),
+                                 initializer=_init_worker, initargs=(X_values, y_values)) as pool:
+            futures = [pool.submit(func, *task) for task in tasks]
+            return [future.result() for future in futures]
+
+    previous = _X, _y
+    _init_worker(X_values, y_values)
+    try:
+        return [func(*task) for task in tasks]
+    finally:
+        _init_worker(*previous)
+
+
+def _run_fold(name, estimator, train_end, test_end):
+    X, y = fold_arrays()
+    start = time.perf_counter()
+    estimator.fit(X[:train_end], y[:train_end])
+    predictions = estimator.predict(X[train_end:test_end])
+    return name, train_end, predictions, time.perf_counter() - start
+
+
+def _score(y_true, y_pred):
+    if len(y_true) == 0:
+        return np.nan, np.nan
+    mae = float(np.mean(np.abs(y_true - y_pred)))
+    mape = float(np.mean(np.abs((y_true - y_pred) / (y_true + 1))) * 100)
+    return mae, mape
+
+
+def backtest(models, X, y, dates, metadata, n_folds=36, min_train=None, test_size=None,
+             max_workers=None):
+    """
+    Walk-forward backtest of every estimator in `models` ({name: estimator}).
+
+    Returns (folds, summary) DataFrames:
+    - folds: one row per model and fold with its dates, row counts, and
+      raw/processed MAE and processed MAPE overall, open and closed season
+    - summary: per model, the same metrics over all test days pooled, plus
+      the mean and std of fold MAE
+    """
+    X_values = feature_matrix(X)
+    y_values = np.asarray(y, dtype=np.float64)
+    dates = pd.to_datetime(pd.Series(np.asarray(dates)))
+    metadata = metadata.reset_index(drop=True)
+    bounds = walk_forward_folds(len(X_values), n_folds, min_train, test_size)
+
+    tasks = []
+    for name, estimator in models.items():
+        for train_end, test_end in bounds:
+            task = clone(estimator)
+            if is_multithreaded(task):
+                task.set_params(n_jobs=1)
+            tasks.append((name, task, train_end, test_end))
+    # Longest fits (largest training windows) first, so the pool drains evenly
+    tasks.sort(key=lambda t: -t[2])
+
+    predictions = {}
+    for name, train_end, preds, seconds in run_tasks(_run_fold, tasks, X_values, y_values, max_workers):
+        predictions[name, train_end] = (preds, seconds)
+
+    rows = []
+    pooled = {name: [] for name in models}
+    for name in models:
+        for fold, (train_end, test_end) in enumerate(bounds):
+            raw, seconds = predictions[name, train_end]
+            meta = metadata.iloc[train_end:test_end]
+            processed, _ = apply_rules(raw, meta, exclusive=True)
+            y_true = y_values[train_end:test_end]
+            season = meta['yatra_season'].to_numpy()
+            pooled[name].append((y_true, raw, processed, season))
+
+            mae_raw, _ = _score(y_true, raw)
+            mae, mape = _score(y_true, processed)
+            mae_open, mape_open = _score(y_true[season == 1], processed[season == 1])
+            mae_closed, mape_closed = _score(y_true[season == 0], processed[season == 0])
+            rows.append({
+                'model': name,
+                'fold': fold,
+                'train_rows': train_end,
+                'test_start': dates.iloc[train_end].date(),
+                'test_end': dates.iloc[test_end - 1].date(),
+                'open_days': int((season == 1).sum()),
+                'closed_days': int((season == 0).sum()),
+                'mae_raw': mae_raw,
+                'mae_processed': mae,
+                'mape_processed': mape,
+                'mae_open': mae_open,
+                'mape_open': mape_open,
+                'mae_closed': mae_closed,
+                'mape_closed': mape_closed,
+                'fit_seconds': seconds,
+            })
+    folds = pd.DataFrame(rows)
+
+    summary_rows = []
+    for name, parts in pooled.items():
+        y_true, raw, processed, season = (np.concatenate(p) for p in zip(*parts))
+        model_folds = folds[folds['model'] == name]
+        mae, mape = _score(y_true, processed)
+        mae_open, mape_open = _score(y_true[season == 1], processed[season == 1])
+        mae_closed, mape_closed = _score(y_true[season == 0], processed[season == 0])
+        summary_rows.append({
+            'model': name,
+            'folds': len(model_folds),
+            'test_days': len(y_true),
+            'mae_raw': _score(y_true, raw)[0],
+            'mae_processed': mae,
+            'mape_processed': mape,
+            'mae_open': mae_open,
+            'mape_open': mape_open,
+            'mae_closed': mae_closed,
+            'mape_closed': mape_closed,
+            'fold_mae_mean': model_folds['mae_processed'].mean(),
+            'fold_mae_std': model_folds['mae_processed'].std(),
+        })
+    summary = pd.DataFrame(summary_rows).sort_values('mae_processed').reset_index(drop=True)
+    return folds, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/kedarnath_temple_mock_dataset.csv')
+    parser.add_argument('--folds', type=int, default=36)
+    parser.add_argument('--min-train', type=int, default=None, help='rows in the first training window')
+    parser.add_argument('--test-size', type=int, default=None, help='rows per test fold')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--models', default=None, help='comma-separated subset of the candidates')
+    parser.add_argument('--out', default=None, help='write the per-fold table to this CSV')
+    args = parser.parse_args()
+
+    df, _, _ = load_csv_features(args.data)
+    X, y, dates, metadata, feature_columns = training_frame(df)
+
+    models = default_candidates(feature_columns=feature_columns)
+    if args.models:
+        models = {name: models[name] for name in args.models.split(',')}
+
+    start = time.perf_counter()
+    folds, summary = backtest(models, X, y, dates, metadata, args.folds,
+                              args.min_train, args.test_size, args.workers)
+    elapsed = time.perf_counter() - start
+
+    n_folds = folds['fold'].nunique()
+    print("=" * 80)
+    print(f"WALK-FORWARD BACKTEST ({n_folds} folds x {len(models)} models, {elapsed:.1f} s)")
+    print("=" * 80)
+    columns = ['model', 'fold', 'test_start', 'test_end', 'mae_processed', 'mape_processed',
+               'mae_open', 'mae_closed']
+    with pd.option_context('display.width', 120, 'display.max_rows', None, 'display.float_format', '{:.2f}'.format):
+        print(folds[columns].to_string(index=False))
+        print()
+        print(summary.to_string(index=False))
+
+    if args.out:
+        folds.to_csv(args.out, index=False)
+        print(f"\n✅ Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+MODEL BUNDLE FORMAT
+One versioned file replacing the three joblib pickles written by training.
+
+Layout (little endian):
+    magic      4 bytes   b"TRNB"
+    version    uint16    BUNDLE_FORMAT_VERSION
+    header_len uint32    length of the JSON header
+    header     JSON      schema, encoder vocabularies, rule parameters,
+                         training metadata, payload offset/size/sha256
+    padding    to a 64-byte boundary
+    payload    the model in its native binary form
+               (XGBoost UBJSON, LightGBM text model, or a joblib pickle
+               for sklearn ensembles)
+
+The file is read through mmap, which only saves the read() copy: the
+header parse and checksum pass run straight over the mapped file. The
+model is then rebuilt from the payload into memory owned by the booster
+(or unpickled), so every worker process holds its own copy of the model
+and the mapping is closed once loading is done. Loading refuses
+bundles whose checksum, feature schema or encoders do not line up, so a
+mismatched model/feature-list pair cannot be deployed.
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from rules import DEFAULT_RULE_PARAMS
+
+MAGIC = b"TRNB"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_FILE = "model_bundle_final.trnb"
+
+_PREAMBLE = struct.Struct("<4sHI")
+_ALIGN = 64
+
+
+class BundleError(ValueError):
+    """Raised when a bundle is corrupt or internally inconsistent"""
+
+
+def schema_hash(feature_columns):
+    return hashlib.sha256(json.dumps(list(feature_columns)).encode()).hexdigest()[:16]
+
+
+def _serialize_model(model):
+    """Return (kind, payload bytes) for a fitted model"""
+    if hasattr(model, "get_booster"):
+        return "xgboost", bytes(model.get_booster().save_raw(raw_format="ubj"))
+    if hasattr(model, "save_raw"):
+        return "xgboost", bytes(model.save_raw(raw_format="ubj"))
+
+    if hasattr(model, "booster_") and hasattr(model.booster_, "model_to_string"):
+        return "lightgbm", model.booster_.model_to_string().encode()
+
+    import joblib
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return "pickle", buffer.getvalue()
+
+
+def _model_feature_names(model):
+    if hasattr(model, "get_booster"):
+        return model.get_booster().feature_names
+    if hasattr(model, "feature_names_in_"):
+        return list(model.feature_names_in_)
+    if hasattr(model, "feature_names"):
+        return model.feature_names
+    return None
+
+
+def save_bundle(path, model, feature_columns, label_encoders, metadata=None, rule_params=None,
+                feature_dtype="float32", fill_values=None):
+    """
+    Write model + schema + encoders + rule parameters + metadata to one file.
+    `feature_dtype` is the dtype of the training matrix, which rows must be
+    rounded to when serving (see ModelBundle.feature_dtype). `fill_values`
+    maps columns to the training medians missing inputs were filled with
+    (features.fill_values); serving fills missing features the same way.
+    The write goes to a temp file first and is renamed into place, so a
+    watcher never sees a half-written bundle.
+    """
+    feature_columns = list(feature_columns)
+    names = _model_feature_names(model)
+    if names is not None and list(names) != feature_columns:
+        raise BundleError("Model was trained on a different feature list than the one being bundled")
+
+    kind, payload = _serialize_model(model)
+    header = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model_kind": kind,
+        "model_class": type(model).__name__,
+        "feature_columns": feature_columns,
+        "feature_dtype": np.dtype(feature_dtype).name,
+        "fill_values": {col: float(fill_values[col]) for col in feature_columns if col in (fill_values or {})},
+        "schema_hash": schema_hash(feature_columns),
+        "encoders": {col: [str(c) for c in le.classes_] for col, le in label_encoders.items()},
+        "rule_params": rule_params or DEFAULT_RULE_PARAMS,
+        "metadata": {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **(metadata or {})},
+        "payload_size": len(payload),
+        "payload_sha256": hashlib.sha256(payload).hexdigest(),
+    }
+
+    header_bytes = json.dumps(header, default=str).encode()
+    offset = _PREAMBLE.size + len(header_bytes)
+    padding = (-offset) % _ALIGN
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, BUNDLE_FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * padding)
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return header
+
+
+class ModelBundle:
+    """A loaded bundle: model, feature schema, encoders and header fields"""
+
+    def __init__(self, header, model, label_encoders):
+        self.header = header
+        self.model = model
+        self.label_encoders = label_encoders
+        self.feature_columns = header["feature_columns"]
+        self.rule_params = header["rule_params"]
+        self.metadata = header["metadata"]
+        self.version = header["payload_sha256"][:12]
+        # Rows are served in the training dtype: LightGBM keeps float64
+        # thresholds that can sit exactly on a float32 training value, so
+        # rounding differently from training can flip a split. Bundles that
+        # predate the field had float32 XGBoost/sklearn and float64 LightGBM.
+        legacy = "float64" if header["model_kind"] == "lightgbm" else "float32"
+        self.feature_dtype = np.dtype(header.get("feature_dtype", legacy))
+        self.fill_values = header.get("fill_values")
+
+
+def missing_row(feature_columns, fill_values, dtype=np.float32):
+    """
+    The row a request with no usable features is served as: each feature's
+    training median, NaN where training had none. Artifacts that predate
+    `fill_values` (None) get zeros, as they were always served.
+    """
+    if fill_values is None:
+        return np.zeros(len(feature_columns), dtype=dtype)
+    return np.array([fill_values.get(col, np.nan) for col in feature_columns], dtype=dtype)
+
+
+def read_header(mm):
+    if len(mm) < _PREAMBLE.size:
+        raise BundleError("File too small to be a model bundle")
+    magic, version, header_len = _PREAMBLE.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise BundleError("Not a model bundle (bad magic)")
+    if version != BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format version {version}")
+
+    start = _PREAMBLE.size
+    header = json.loads(bytes(mm[start:start + header_len]))
+    offset = start + header_len
+    header["payload_offset"] = offset + (-offset) % _ALIGN
+    return header
+
+
+def _encoder_from_classes(classes):
+    from sklearn.preprocessing import LabelEncoder
+    le = LabelEncoder()
+    le.classes_ = np.array(classes, dtype=object)
+    return le
+
+
+def _load_model(kind, payload):
+    if kind == "xgboost":
+        import xgboost as xgb
+        booster = xgb.Booster()
+        booster.load_model(bytearray(payload))
+        return booster
+    if kind == "lightgbm":
+        import lightgbm as lgb
+        return lgb.Booster(model_str=bytes(payload).decode())
+    if kind == "pickle":
+        import joblib
+        return joblib.load(io.BytesIO(payload))
+    raise BundleError(f"Unknown model kind {kind!r}")
+
+
+def _validate_schema(header, model):
+    columns = header["feature_columns"]
+    if schema_hash(columns) != header["schema_hash"]:
+        raise BundleError("Feature schema does not match its recorded hash")
+
+    names = _model_feature_names(model)
+    if names is None and hasattr(model, "feature_name"):
+        names = model.feature_name()
+    if names is not None and list(names) != list(columns):
+        raise BundleError("Bundled model and feature schema disagree on feature names")
+
+    n_features = None
+    if hasattr(model, "num_features"):
+        n_features = model.num_features()
+    elif hasattr(model, "n_features_in_"):
+        n_features = model.n_features_in_
+    if n_features is not None and n_features != len(columns):
+        raise BundleError(f"Model expects {n_features} features, schema has {len(columns)}")
+
+    for col in header["encoders"]:
+        if col + "_encoded" not in columns:
+            raise BundleError(f"Encoder for {col} has no {col}_encoded column in the schema")
+
+
+def load_bundle(path, verify=True):
+    """Map a bundle file, check it and rebuild the model"""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header = read_header(mm)
+        start = header["payload_offset"]
+        end = start + header["payload_size"]
+        if end > len(mm):
+            raise BundleError("Bundle is truncated")
+
+        payload = memoryview(mm)[start:end]
+        try:
+            if verify and hashlib.sha256(payload).hexdigest() != header["payload_sha256"]:
+                raise BundleError("Payload checksum mismatch")
+            model = _load_model(header["model_kind"], payload)
+        finally:
+            payload.release()
+    finally:
+        mm.close()
+
+    _validate_schema(header, model)
+    label_encoders = {col: _encoder_from_classes(classes) for col, classes in header["encoders"].items()}
+    return ModelBundle(header, model, label_encoders)
+
+
+def make_predict_fn(model):
+    """
+    Return f(X) -> 1d predictions, X in the bundle's feature_dtype.
+    XGBoost models go through the booster's inplace_predict, which skips the
+    DMatrix construction and feature validation done by XGBRegressor.predict.
+    LightGBM models go straight to the Booster (LGBMRegressor.predict would
+    re-validate feature names on every call).
+    """
+    booster = None
+    if hasattr(model, "get_booster"):
+        booster = model.get_booster()
+    elif hasattr(model, "inplace_predict"):
+        booster = model
+
+    if booster is not None:
+        def predict_fn(X):
+            return booster.inplace_predict(X)
+        return predict_fn
+
+    lgb_booster = getattr(model, "booster_", None)
+    if lgb_booster is None and hasattr(model, "model_to_string"):
+        lgb_booster = model
+    if lgb_booster is not None:
+        def predict_fn(X):
+            return lgb_booster.predict(X)
+        return predict_fn
+
+    def predict_fn(X):
+        return model.predict(X)
+    return predict_fn
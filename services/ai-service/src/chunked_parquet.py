@@ -0,0 +1,91 @@
+"""
+CHUNKED PARQUET WRITER
+Streams column chunks into one Parquet file in row groups of a fixed size,
+holding at most one row group (plus the chunk being added) in memory.
+
+    with ChunkedParquetWriter('data/kedarnath.parquet') as writer:
+        for chunk in create_dataset.iter_chunks('1950-01-01', '2024-12-31'):
+            writer.write(chunk)
+
+Chunks are dicts of arrays or DataFrames with the same columns; the file
+schema comes from the first chunk's columns and src/schema.py (RAW_DTYPES,
+dictionary-encoded text), so every chunk lands with the same compact types
+whatever NumPy types it was built with.
+"""
+
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schema import arrow_schema
+
+CHUNK_ROWS = 65536
+
+
+class ChunkedParquetWriter:
+    def __init__(self, path, chunk_rows=CHUNK_ROWS, compression='zstd'):
+        if chunk_rows < 1:
+            raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+        self.schema = None
+        self.rows = 0
+        self.row_groups = 0
+        self._writer = None
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, chunk):
+        """Buffer a chunk and write every full row group it completes"""
+        columns = list(chunk.keys()) if isinstance(chunk, dict) else list(chunk.columns)
+        if self.schema is None:
+            self.schema = arrow_schema(columns)
+        elif columns != self.schema.names:
+            raise ValueError(f"{self.path}: chunk columns {columns} differ from {self.schema.names}")
+
+        if isinstance(chunk, dict):
+            table = pa.table({col: chunk[col] for col in columns}, schema=self.schema)
+        else:
+            table = pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False)
+        if table.num_rows == 0:
+            return
+        self._buffer.append(table)
+        self._buffered += table.num_rows
+        while self._buffered >= self.chunk_rows:
+            self._flush(self.chunk_rows)
+
+    def _flush(self, rows):
+        table = pa.concat_tables(self._buffer)
+        if self._writer is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression)
+        self._writer.write_table(table.slice(0, rows), row_group_size=rows)
+        self.rows += rows
+        self.row_groups += 1
+        rest = table.slice(rows)
+        self._buffer = [rest] if rest.num_rows else []
+        self._buffered = rest.num_rows
+
+    def close(self):
+        """Write the last, shorter row group and finish the file"""
+        if self._buffered:
+            self._flush(self._buffered)
+        if self._writer is None:
+            if self.schema is None:
+                raise ValueError(f"{self.path}: nothing was written")
+            pq.write_table(self.schema.empty_table(), self.path, compression=self.compression)
+        else:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+            self._writer = None
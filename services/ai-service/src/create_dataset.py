@@ -5,26 +5,59 @@ Fixes:
 2. Stronger closed season signal
 3. More realistic visitor patterns
 4. Reduced missing values impact
+
+Vectorized: every calendar, weather and indicator column is computed for
+all days of a chunk at once -
+- nearest festival from a sorted date array and searchsorted
+- yatra phase and school vacations from per-year boundary arrays
+- weather regimes, conditions and indicator noise drawn as whole arrays
+Only the visitor AR(1) recursion (today's mean depends on yesterday's
+sampled count) is sequential, as one tight loop over precomputed
+multipliers and noise.
+
+Rows are produced one calendar year at a time (iter_chunks). The visitor
+history and the next-day target carry over between years, and each year
+draws from its own child of the seed, so a seed reproduces the dataset
+exactly however it is consumed: generate() builds one frame, and
+write_parquet() streams chunks to a Parquet file in fixed-size row groups
+with flat memory however many years are generated.
+
+Years outside the season / festival tables reuse them cyclically (2025 is
+laid out like 2022, 2026 like 2023, ...), so any date range has seasons.
+
+Run from services/ai-service:
+    python src/create_dataset.py [--start 2022-01-01] [--end 2024-12-31] [--seed 42] [--out ...]
+    python src/create_dataset.py --start 1900-01-01 --out data/kedarnath.parquet [--chunk-rows 65536]
 """
 
-import pandas as pd
+import argparse
+import math
+import time
+from datetime import datetime
+
 import numpy as np
-from datetime import datetime, timedelta
-import random
+import pandas as pd
 
-np.random.seed(42)
-random.seed(42)
+from chunked_parquet import CHUNK_ROWS, ChunkedParquetWriter
+from schema import apply_raw_dtypes, memory_mb
 
-START_DATE = datetime(2022, 1, 1)
-END_DATE = datetime(2024, 12, 31)
+START_DATE = '2022-01-01'
+END_DATE = '2024-12-31'
+SEED = 42
+OUTPUT_FILE = 'kedarnath_temple_mock_dataset_optimal_v2.csv'
 
 MIN_VISITORS = 50
 MAX_VISITORS = 12000  # Reduced cap for more realistic distribution
 AUTOCORR_STRENGTH = 0.70  # Stronger day-to-day correlation
+LOG_SIGMA = 0.22  # Tighter variance
+NOISE_SIGMA = 0.04
+DAMPENING = 0.65
+# Longest look-back of the history columns (visitors_avg_30days)
+HISTORY_DAYS = 30
 
 # Festival data (same as before)
 festivals = {
-    '2022': [('2022-01-26', 'Republic Day'), ('2022-03-18', 'Holi'), 
+    '2022': [('2022-01-26', 'Republic Day'), ('2022-03-18', 'Holi'),
              ('2022-04-14', 'Ram Navami'), ('2022-05-16', 'Buddha Purnima'),
              ('2022-08-15', 'Independence Day'), ('2022-08-19', 'Raksha Bandhan'),
              ('2022-10-05', 'Dussehra'), ('2022-10-24', 'Diwali')],
@@ -38,223 +71,328 @@ festivals = {
              ('2024-10-12', 'Dussehra'), ('2024-11-01', 'Diwali')]
 }
 
-all_festivals = []
-for year_festivals in festivals.values():
-    for date_str, name in year_festivals:
-        all_festivals.append((datetime.strptime(date_str, '%Y-%m-%d'), name))
-
 kedarnath_seasons = {
     2022: (datetime(2022, 5, 6), datetime(2022, 11, 7)),
     2023: (datetime(2023, 4, 25), datetime(2023, 11, 3)),
     2024: (datetime(2024, 5, 10), datetime(2024, 11, 5)),
 }
 
-summer_vacations = [
-    (datetime(2022, 5, 15), datetime(2022, 6, 30)),
-    (datetime(2023, 5, 15), datetime(2023, 6, 30)),
-    (datetime(2024, 5, 15), datetime(2024, 6, 30)),
-]
-
-winter_vacations = [
-    (datetime(2022, 12, 20), datetime(2023, 1, 5)),
-    (datetime(2023, 12, 20), datetime(2024, 1, 5)),
-    (datetime(2024, 12, 20), datetime(2025, 1, 5)),
-]
+# (month, day) spans; the winter break runs into the next year
+summer_vacation = ((5, 15), (6, 30))
+winter_vacation = ((12, 20), (1, 5))
 
 festival_strength = {
     'Diwali': 1.9, 'Dussehra': 1.7, 'Holi': 1.6, 'Ram Navami': 1.5,
-    'Raksha Bandhan': 1.4, 'Buddha Purnima': 1.3, 
+    'Raksha Bandhan': 1.4, 'Buddha Purnima': 1.3,
     'Independence Day': 1.2, 'Republic Day': 1.15
 }
+DEFAULT_FESTIVAL_STRENGTH = 1.5
+
+# IMPROVED: Better distribution of baselines (index = month)
+monthly_baselines = {
+    1: 150, 2: 200, 3: 1200, 4: 3000,
+    5: 6500, 6: 8000, 7: 7500, 8: 7000,
+    9: 5500, 10: 4000, 11: 2000, 12: 150
+}
+CLOSED_BASELINE_CAP = 250
+
+# Weather regimes: temperature (mean, sd), chance and mean size of rain,
+# conditions with their probabilities
+WEATHER_REGIMES = (
+    dict(months=(12, 1, 2), temp_max=(8, 4), temp_min=(-1, 3), rain_chance=0.25, rain_scale=2,
+         conditions=('Snowy', 'Foggy', 'Cloudy', 'Sunny'), weights=(0.3, 0.2, 0.3, 0.2)),
+    dict(months=(6, 7, 8), temp_max=(20, 3), temp_min=(14, 2), rain_chance=0.65, rain_scale=12,
+         conditions=('Rainy', 'Cloudy', 'Sunny'), weights=(0.55, 0.35, 0.10)),
+    dict(months=(3, 4, 5, 9, 10, 11), temp_max=(18, 4), temp_min=(9, 3), rain_chance=0.2, rain_scale=4,
+         conditions=('Rainy', 'Cloudy', 'Sunny'), weights=(0.15, 0.30, 0.55)),
+)
+
+
+# ============================================================================
+# CALENDAR
+# ============================================================================
+
+def _source_year(year, known):
+    """`year` if it is in the table, else the table year it cycles onto"""
+    known = sorted(known)
+    return year if year in known else known[(year - known[0]) % len(known)]
+
+
+def _move_to_year(day, source, year):
+    """Shift a date from table year `source` to `year` (Feb 29 becomes Feb 28)"""
+    day = pd.Timestamp(day)
+    target = day.year + (year - source)
+    if day.month == 2 and day.day == 29 and not pd.Timestamp(target, 1, 1).is_leap_year:
+        return day.replace(year=target, day=28)
+    return day.replace(year=target)
+
+
+def festival_calendar(years, table=festivals):
+    """(sorted datetime64[D] dates, names) for `years`, cycling the table"""
+    table = {int(year): entries for year, entries in table.items()}
+    entries = []
+    for year in years:
+        source = _source_year(year, table)
+        entries.extend((_move_to_year(day, source, year), name) for day, name in table[source])
+    entries.sort(key=lambda entry: entry[0])
+    dates = np.array([day.to_datetime64() for day, _ in entries], dtype='datetime64[D]')
+    return dates, np.array([name for _, name in entries], dtype=object)
+
+
+def season_bounds(years, table=kedarnath_seasons):
+    """(open, close) datetime64[D] arrays, one entry per year in `years`"""
+    bounds = []
+    for year in years:
+        source = _source_year(year, table)
+        bounds.append([_move_to_year(day, source, year).to_datetime64() for day in table[source]])
+    bounds = np.array(bounds, dtype='datetime64[D]').reshape(-1, 2)
+    return bounds[:, 0], bounds[:, 1]
+
+
+def calendar_parts(days):
+    """Year, month, day of week (Monday = 0) and ISO week of datetime64[D] days"""
+    year = days.astype('datetime64[Y]')
+    month = (days.astype('datetime64[M]') - year.astype('datetime64[M]')).astype(np.int64) + 1
+    day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    # ISO week: the week's Thursday decides its year
+    thursday = days - day_of_week + 3
+    week = (thursday - thursday.astype('datetime64[Y]').astype('datetime64[D]')).astype(np.int64) // 7 + 1
+    return year.astype(np.int64) + 1970, month, day_of_week, week
+
+
+def nearest_festival(days, dates, names):
+    """Days to the nearest festival (either direction) and that day's festival name or None"""
+    right = np.clip(np.searchsorted(dates, days), 0, len(dates) - 1)
+    left = np.clip(right - 1, 0, len(dates) - 1)
+    to_right = np.abs((dates[right] - days).astype(np.int64))
+    to_left = np.abs((days - dates[left]).astype(np.int64))
+    nearest = np.where(to_left <= to_right, left, right)
+    distance = np.minimum(to_left, to_right)
+    return distance, np.where(distance == 0, names[nearest], None)
+
+
+def in_spans(days, starts, ends):
+    """Boolean mask of days inside any [start, end] span (spans sorted, not overlapping)"""
+    i = np.searchsorted(starts, days, side='right') - 1
+    return (i >= 0) & (days <= ends[np.maximum(i, 0)])
+
+
+def vacation_spans(years, spans=(summer_vacation, winter_vacation)):
+    starts, ends = [], []
+    for year in range(min(years) - 1, max(years) + 1):
+        for (start_month, start_day), (end_month, end_day) in spans:
+            end_year = year + (1 if (end_month, end_day) < (start_month, start_day) else 0)
+            starts.append(np.datetime64(f'{year:04d}-{start_month:02d}-{start_day:02d}'))
+            ends.append(np.datetime64(f'{end_year:04d}-{end_month:02d}-{end_day:02d}'))
+    order = np.argsort(starts)
+    return np.array(starts)[order], np.array(ends)[order]
+
+
+def yatra_phase(days, years, seasons=kedarnath_seasons):
+    """Phase names ('Closed', 'Pre-Peak', 'Peak', 'Post-Peak') and the 0/1 season flag"""
+    first = years.min()
+    open_day, close_day = season_bounds(range(first, years.max() + 1), seasons)
+    open_day, close_day = open_day[years - first], close_day[years - first]
+
+    is_open = (days >= open_day) & (days <= close_day)
+    total = np.maximum((close_day - open_day).astype(np.int64), 1)
+    fraction = (days - open_day).astype(np.int64) / total
+    phase = np.select([~is_open, fraction < 0.2, fraction < 0.8], ['Closed', 'Pre-Peak', 'Peak'], 'Post-Peak')
+    return phase.astype(object), is_open.astype(np.int64)
+
+
+# ============================================================================
+# WEATHER
+# ============================================================================
+
+def draw_weather(month, rng, regimes=WEATHER_REGIMES):
+    """Temperatures, rainfall, condition and visitor multiplier for every day"""
+    n = len(month)
+    regime = np.zeros(n, dtype=np.int64)
+    for i, spec in enumerate(regimes):
+        regime[np.isin(month, spec['months'])] = i
+
+    def per_day(key, part=None):
+        values = np.array([spec[key] if part is None else spec[key][part] for spec in regimes], dtype=float)
+        return values[regime]
+
+    temp_max = rng.normal(per_day('temp_max', 0), per_day('temp_max', 1))
+    temp_min = rng.normal(per_day('temp_min', 0), per_day('temp_min', 1))
+    rains = rng.random(n) < per_day('rain_chance')
+    rainfall = np.where(rains, rng.exponential(per_day('rain_scale')), 0.0)
+
+    u = rng.random(n)
+    condition = np.empty(n, dtype=object)
+    for i, spec in enumerate(regimes):
+        mask = regime == i
+        cumulative = np.cumsum(spec['weights']) / np.sum(spec['weights'])
+        pick = np.minimum(np.searchsorted(cumulative, u[mask], side='right'), len(cumulative) - 1)
+        condition[mask] = np.array(spec['conditions'], dtype=object)[pick]
+
+    winter, monsoon = regime == 0, regime == 1
+    multiplier = np.select(
+        [winter & (condition == 'Snowy'), winter & (condition == 'Foggy'), winter,
+         monsoon & (rainfall > 25), monsoon & (rainfall > 15), monsoon,
+         rainfall > 10],
+        [0.45, 0.75, 0.88, 0.6, 0.78, 0.92, 0.88],
+        1.0,
+    )
+    return temp_max, temp_min, rainfall, condition, multiplier
+
+
+# ============================================================================
+# VISITORS
+# ============================================================================
+
+def ar1_visitors(base, multiplier, z, noise, previous=None, strength=AUTOCORR_STRENGTH, log_sigma=LOG_SIGMA,
+                 low=MIN_VISITORS, high=MAX_VISITORS):
+    """
+    The sequential part: each day's mean blends the monthly baseline with
+    yesterday's count, is scaled by that day's multiplier and sampled
+    lognormally (z = standard normal draw), then scaled by `noise`.
+    `previous` is the count of the day before the first one, if any.
+    """
+    keep = 1 - strength
+    carry = strength * strength
+    log, exp = math.log, math.exp
+
+    visitors = []
+    for b, m, zt, nt in zip(base.tolist(), multiplier.tolist(), z.tolist(), noise.tolist()):
+        mean = b if previous is None else b * keep + previous * carry
+        expected = mean * m
+        sample = exp(log(expected if expected > 1 else 1) + log_sigma * zt)
+        count = int(min(max(sample, low), high))
+        count = int(min(max(count * nt, low), high))
+        visitors.append(count)
+        previous = count
+    return np.array(visitors, dtype=np.int64)
 
-def is_in_vacation(date, vacation_list):
-    for start, end in vacation_list:
-        if start <= date <= end:
-            return 1
-    return 0
-
-def days_to_nearest_festival(date, festival_dates):
-    differences = [(abs((f[0] - date).days), f[1]) for f in festival_dates]
-    differences.sort()
-    return differences[0][0], differences[0][1]
-
-def get_yatra_phase(date, year):
-    if year not in kedarnath_seasons:
-        return 'Closed', 0
-    open_date, close_date = kedarnath_seasons[year]
-    if date < open_date or date > close_date:
-        return 'Closed', 0
-    total_days = max((close_date - open_date).days, 1)
-    days_from_open = (date - open_date).days
-    frac = days_from_open / total_days
-    if frac < 0.2:
-        return 'Pre-Peak', 1
-    elif frac < 0.8:
-        return 'Peak', 1
-    else:
-        return 'Post-Peak', 1
-
-def get_monthly_baseline(month, yatra_phase):
-    """IMPROVED: Better distribution of baselines"""
-    baselines = {
-        1: 150, 2: 200, 3: 1200, 4: 3000,
-        5: 6500, 6: 8000, 7: 7500, 8: 7000,
-        9: 5500, 10: 4000, 11: 2000, 12: 150
+
+def trailing_mean(values, window, offset=0):
+    """
+    int(mean of the previous `window` values), or the value itself for the
+    first `window` days of the series; values[0] is day `offset` of the series
+    """
+    sums = np.concatenate([[0], np.cumsum(values)])
+    t = np.arange(len(values))
+    start = np.maximum(t - window, 0)
+    means = (sums[t] - sums[start]) // window
+    return np.where(offset + t >= window, means, values)
+
+
+def history_columns(visitors, tail, seen):
+    """
+    Yesterday, last week and 7/30-day trailing means of a chunk, given the
+    last HISTORY_DAYS counts before it (`tail`) and the number of days
+    before it (`seen`)
+    """
+    k = len(tail)
+    values = np.concatenate([tail, visitors])
+    offset = seen - k
+    t = np.arange(k, len(values))
+    day = offset + t
+
+    def lagged(lag):
+        return np.where(day >= lag, values[np.maximum(t - lag, 0)], values[t])
+
+    return {
+        'visitors_yesterday': lagged(1),
+        'visitors_last_week': lagged(7),
+        'visitors_avg_7days': trailing_mean(values, 7, offset)[k:],
+        'visitors_avg_30days': trailing_mean(values, 30, offset)[k:],
     }
-    baseline = baselines.get(month, 500)
-    if yatra_phase == 'Closed':
-        baseline = min(baseline, 250)
-    return baseline
-
-print("="*80)
-print("GENERATING IMPROVED DATASET V2")
-print("="*80)
-
-date_range = pd.date_range(START_DATE, END_DATE, freq='D')
-data = []
-visitors_history = []
-
-for idx, date in enumerate(date_range):
-    year = date.year
-    month = date.month
-    day_of_week = date.weekday()
-    is_weekend = 1 if day_of_week >= 5 else 0
-    
-    yatra_phase, yatra_season = get_yatra_phase(date, year)
-    base_mean = get_monthly_baseline(month, yatra_phase)
-    
-    # IMPROVED: Stronger autocorrelation
-    if len(visitors_history) > 0:
-        prev_day_visitors = visitors_history[-1]
-        autocorr_component = prev_day_visitors * AUTOCORR_STRENGTH
-        base_mean = base_mean * (1 - AUTOCORR_STRENGTH) + autocorr_component * AUTOCORR_STRENGTH
-    
+
+
+def simulate(dates, rng, history, seasons=kedarnath_seasons, baselines=monthly_baselines,
+             festival_table=festivals, strengths=festival_strength, max_visitors=MAX_VISITORS):
+    """
+    Raw columns (dict of arrays, no next_day_visitors) for consecutive
+    `dates`. `history` carries the visitor series across calls: the last
+    count ('previous'), the last HISTORY_DAYS counts ('tail') and the number
+    of days generated so far ('seen'); it is updated in place.
+    """
+    days = dates.values.astype('datetime64[D]')
+    n = len(days)
+    year, month, day_of_week, week_of_year = calendar_parts(days)
+    is_weekend = (day_of_week >= 5).astype(np.int64)
+
+    phase, yatra_season = yatra_phase(days, year, seasons)
+    closed = phase == 'Closed'
+    baseline_by_month = np.array([baselines.get(m, 500) for m in range(13)], dtype=float)
+    base = baseline_by_month[month]
+    base = np.where(closed, np.minimum(base, CLOSED_BASELINE_CAP), base)
+
     # Factors (same logic but better tuning)
-    weekend_mult = 1.25 if (is_weekend and yatra_phase != 'Closed') else 1.0
-    
-    is_festival = 0
-    festival_name = 'None'
-    days_to_festival, nearest_fest = days_to_nearest_festival(date, all_festivals)
-    
-    festival_mult = 1.0
-    for fdate, fname in all_festivals:
-        if fdate == date:
-            is_festival = 1
-            festival_name = fname
-            festival_mult = festival_strength.get(fname, 1.5)
-            break
-    else:
-        if days_to_festival <= 3:
-            festival_mult = 1.2
-        elif days_to_festival <= 7:
-            festival_mult = 1.08
-    
-    is_holiday = 1 if (is_festival or is_weekend) else 0
-    holiday_name = festival_name if is_festival else ('Weekend' if is_weekend else 'None')
-    
-    is_long_weekend = 0
-    if is_holiday:
-        prev_holiday = ((date - timedelta(days=1)).weekday() >= 5)
-        next_holiday = ((date + timedelta(days=1)).weekday() >= 5)
-        if prev_holiday or next_holiday:
-            is_long_weekend = 1
-    long_weekend_mult = 1.15 if is_long_weekend else 1.0
-    
-    school_vacation = max(is_in_vacation(date, summer_vacations), 
-                          is_in_vacation(date, winter_vacations))
-    school_mult = 1.3 if (school_vacation and yatra_phase != 'Closed') else 1.0
-    
-    # Weather (same logic)
-    if month in [12, 1, 2]:
-        temp_max = np.random.normal(8, 4)
-        temp_min = np.random.normal(-1, 3)
-        rainfall = np.random.exponential(2) if np.random.random() < 0.25 else 0
-        weather_condition = random.choices(
-            ['Snowy', 'Foggy', 'Cloudy', 'Sunny'],
-            weights=[0.3, 0.2, 0.3, 0.2]
-        )[0]
-        weather_mult = 0.45 if weather_condition == 'Snowy' else 0.75 if weather_condition == 'Foggy' else 0.88
-    elif month in [6, 7, 8]:
-        temp_max = np.random.normal(20, 3)
-        temp_min = np.random.normal(14, 2)
-        rainfall = np.random.exponential(12) if np.random.random() < 0.65 else 0
-        weather_condition = random.choices(['Rainy', 'Cloudy', 'Sunny'], weights=[0.55, 0.35, 0.10])[0]
-        weather_mult = 0.6 if rainfall > 25 else 0.78 if rainfall > 15 else 0.92
-    else:
-        temp_max = np.random.normal(18, 4)
-        temp_min = np.random.normal(9, 3)
-        rainfall = np.random.exponential(4) if np.random.random() < 0.2 else 0
-        weather_condition = random.choices(['Rainy', 'Cloudy', 'Sunny'], weights=[0.15, 0.30, 0.55])[0]
-        weather_mult = 0.88 if rainfall > 10 else 1.0
-    
+    weekend_mult = np.where(is_weekend.astype(bool) & ~closed, 1.25, 1.0)
+
+    years = range(year.min() - 1, year.max() + 2)
+    festival_days, festival_names = festival_calendar(years, festival_table)
+    days_to_festival, festival_today = nearest_festival(days, festival_days, festival_names)
+    is_festival = (days_to_festival == 0).astype(np.int64)
+    festival_name = np.where(is_festival == 1, festival_today, 'None').astype(object)
+    strength = np.array([strengths.get(name, DEFAULT_FESTIVAL_STRENGTH) for name in festival_name])
+    festival_mult = np.select([is_festival == 1, days_to_festival <= 3, days_to_festival <= 7],
+                              [strength, 1.2, 1.08], 1.0)
+
+    is_holiday = ((is_festival == 1) | (is_weekend == 1)).astype(np.int64)
+    holiday_name = np.where(is_festival == 1, festival_name, np.where(is_weekend == 1, 'Weekend', 'None')).astype(object)
+    next_to_weekend = ((day_of_week - 1) % 7 >= 5) | ((day_of_week + 1) % 7 >= 5)
+    is_long_weekend = ((is_holiday == 1) & next_to_weekend).astype(np.int64)
+    long_weekend_mult = np.where(is_long_weekend == 1, 1.15, 1.0)
+
+    school_vacation = in_spans(days, *vacation_spans(range(year.min(), year.max() + 1))).astype(np.int64)
+    school_mult = np.where((school_vacation == 1) & ~closed, 1.3, 1.0)
+
+    temp_max, temp_min, rainfall, weather_condition, weather_mult = draw_weather(month, rng)
     temp_avg = (temp_max + temp_min) / 2
-    humidity = np.clip(np.random.normal(65, 12), 30, 95)
-    
+    humidity = np.clip(rng.normal(65, 12, n), 30, 95)
+
     # Road condition
-    if yatra_phase == 'Closed' or weather_condition == 'Snowy':
-        road_condition = 'Closed'
-        road_mult = 0.35  # Stronger signal
-    elif rainfall > 30:
-        road_condition = 'Poor'
-        road_mult = 0.55
-    elif rainfall > 15:
-        road_condition = 'Fair'
-        road_mult = 0.78
-    else:
-        road_condition = 'Good'
-        road_mult = 1.0
-    
-    helicopter_service = 1 if (yatra_season == 1 and weather_condition in ['Sunny', 'Cloudy']) else 0
-    helicopter_mult = 1.18 if helicopter_service else 1.0
-    
+    road_closed = closed | (weather_condition == 'Snowy')
+    road_condition = np.select([road_closed, rainfall > 30, rainfall > 15], ['Closed', 'Poor', 'Fair'], 'Good').astype(object)
+    road_mult = np.select([road_closed, rainfall > 30, rainfall > 15], [0.35, 0.55, 0.78], 1.0)
+
+    helicopter_service = ((yatra_season == 1) & np.isin(weather_condition, ['Sunny', 'Cloudy'])).astype(np.int64)
+    helicopter_mult = np.where(helicopter_service == 1, 1.18, 1.0)
+
     # Combine factors with dampening
     total_mult = weekend_mult * festival_mult * long_weekend_mult * school_mult * weather_mult * road_mult * helicopter_mult
-    total_mult = 1 + 0.65 * (total_mult - 1)  # Dampen
-    total_mult = np.clip(total_mult, 0.3, 2.3)
-    
-    expected_visitors = base_mean * total_mult
-    
-    # Stochastic sampling
-    log_mean = np.log(max(expected_visitors, 1))
-    log_sigma = 0.22  # Tighter variance
-    visitors_sample = np.random.lognormal(log_mean, log_sigma)
-    visitors = int(np.clip(visitors_sample, MIN_VISITORS, MAX_VISITORS))
-    
-    # Small noise
-    noise = np.random.normal(1.0, 0.04)
-    visitors = int(np.clip(visitors * noise, MIN_VISITORS, MAX_VISITORS))
-    
+    total_mult = np.clip(1 + DAMPENING * (total_mult - 1), 0.3, 2.3)
+
+    visitors = ar1_visitors(base, total_mult, rng.standard_normal(n), rng.normal(1.0, NOISE_SIGMA, n),
+                            previous=history.get('previous'), high=max_visitors)
+
     # Historical features
-    visitors_yesterday = visitors_history[-1] if len(visitors_history) > 0 else visitors
-    visitors_last_week = visitors_history[-7] if len(visitors_history) >= 7 else visitors
-    visitors_avg_7days = int(np.mean(visitors_history[-7:])) if len(visitors_history) >= 7 else visitors
-    visitors_avg_30days = int(np.mean(visitors_history[-30:])) if len(visitors_history) >= 30 else visitors
-    
+    tail = history.get('tail', np.zeros(0, dtype=np.int64))
+    past = history_columns(visitors, tail, history.get('seen', 0))
+    history['previous'] = int(visitors[-1])
+    history['tail'] = np.concatenate([tail, visitors])[-HISTORY_DAYS:]
+    history['seen'] = history.get('seen', 0) + n
+
     # External indicators
-    google_trends = int(np.clip(35 + (visitors / 120) + np.random.normal(0, 7), 5, 100))
-    bus_bookings = int(np.clip(visitors * np.random.uniform(0.55, 0.82), 50, visitors))
-    hotel_occupancy = float(np.clip(25 + (visitors / 150) + np.random.normal(0, 7), 15, 98))
-    parking_utilization = float(np.clip(18 + (visitors / 110) + np.random.normal(0, 5), 10, 95))
-    
-    active_users_within_500m = int(visitors * np.random.uniform(0.27, 0.37))
-    average_users_last_hour = int(active_users_within_500m * np.random.uniform(0.09, 0.16))
-    peak_hour_users = int(active_users_within_500m * np.random.uniform(0.27, 0.42))
-    
-    temple_status = 'Open' if yatra_season == 1 else 'Closed'
-    if yatra_phase in ('Pre-Peak', 'Post-Peak'):
-        temple_status = 'Limited'
-    
-    row = {
-        'date': date.strftime('%Y-%m-%d'),
+    google_trends = np.clip(35 + visitors / 120 + rng.normal(0, 7, n), 5, 100).astype(np.int64)
+    bus_bookings = np.clip(visitors * rng.uniform(0.55, 0.82, n), 50, visitors).astype(np.int64)
+    hotel_occupancy = np.clip(25 + visitors / 150 + rng.normal(0, 7, n), 15, 98)
+    parking_utilization = np.clip(18 + visitors / 110 + rng.normal(0, 5, n), 10, 95)
+
+    active_users = (visitors * rng.uniform(0.27, 0.37, n)).astype(np.int64)
+    average_users_last_hour = (active_users * rng.uniform(0.09, 0.16, n)).astype(np.int64)
+    peak_hour_users = (active_users * rng.uniform(0.27, 0.42, n)).astype(np.int64)
+
+    temple_status = np.where(yatra_season == 1, 'Open', 'Closed').astype(object)
+    temple_status[np.isin(phase, ['Pre-Peak', 'Post-Peak'])] = 'Limited'
+
+    return {
+        'date': dates.values,
         'day_of_week': day_of_week,
         'month': month,
         'is_weekend': is_weekend,
-        'week_of_year': date.isocalendar()[1],
-        'temperature_max': round(float(temp_max), 1),
-        'temperature_min': round(float(temp_min), 1),
-        'temperature_avg': round(float(temp_avg), 1),
-        'rainfall': round(float(rainfall), 1),
-        'humidity': round(float(humidity), 1),
+        'week_of_year': week_of_year,
+        'temperature_max': np.round(temp_max, 1),
+        'temperature_min': np.round(temp_min, 1),
+        'temperature_avg': np.round(temp_avg, 1),
+        'rainfall': np.round(rainfall, 1),
+        'humidity': np.round(humidity, 1),
         'weather_condition': weather_condition,
         'is_holiday': is_holiday,
         'holiday_name': holiday_name,
@@ -264,46 +402,119 @@ for idx, date in enumerate(date_range):
         'days_to_next_festival': days_to_festival,
         'school_vacation': school_vacation,
         'yatra_season': yatra_season,
-        'yatra_phase': yatra_phase,
+        'yatra_phase': phase,
         'temple_open_status': temple_status,
         'helicopter_service_available': helicopter_service,
         'road_condition': road_condition,
-        'visitors_yesterday': int(visitors_yesterday),
-        'visitors_last_week': int(visitors_last_week),
-        'visitors_avg_7days': int(visitors_avg_7days),
-        'visitors_avg_30days': int(visitors_avg_30days),
-        'active_users_within_500m': int(active_users_within_500m),
-        'average_users_last_hour': int(average_users_last_hour),
-        'peak_hour_users': int(peak_hour_users),
-        'google_trends_score': int(google_trends),
-        'bus_bookings': int(bus_bookings),
-        'hotel_occupancy_rate': round(float(hotel_occupancy), 1),
-        'parking_utilization': round(float(parking_utilization), 1),
-        'visitors_today': int(visitors),
-        'next_day_visitors': 0
+        **past,
+        'active_users_within_500m': active_users,
+        'average_users_last_hour': average_users_last_hour,
+        'peak_hour_users': peak_hour_users,
+        'google_trends_score': google_trends,
+        'bus_bookings': bus_bookings,
+        'hotel_occupancy_rate': np.round(hotel_occupancy, 1),
+        'parking_utilization': np.round(parking_utilization, 1),
+        'visitors_today': visitors,
     }
-    
-    data.append(row)
-    visitors_history.append(int(visitors))
-
-df = pd.DataFrame(data)
-df['next_day_visitors'] = df['visitors_today'].shift(-1)
-df = df[:-1]
-
-print(f"Records: {len(df):,}")
-print("\nVisitor Distribution:")
-def cat(v):
-    if v < 2000: return 'Low'
-    elif v < 5000: return 'Medium'
-    elif v < 8000: return 'High'
-    else: return 'Very High'
-
-for level, count in df['visitors_today'].apply(cat).value_counts().sort_index().items():
-    pct = (count / len(df)) * 100
-    print(f"   {level:12s}: {pct:5.1f}%")
-
-print(f"\nAutocorrelation (lag-1): {df['visitors_today'].autocorr(lag=1):.3f}")
-print(f"Visitor stats: Mean={df['visitors_today'].mean():.0f}, Std={df['visitors_today'].std():.0f}")
-
-df.to_csv('kedarnath_temple_mock_dataset_optimal_v2.csv', index=False)
-print(f"\nSaved: kedarnath_temple_mock_dataset_optimal_v2.csv")
\ No newline at end of file
+
+
+def chunk_seed(seed, year):
+    """Generator for one calendar year of the series seeded by `seed` (int or SeedSequence)"""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return np.random.default_rng(np.random.SeedSequence(seed.entropy, spawn_key=(*seed.spawn_key, year)))
+
+
+def iter_chunks(start=START_DATE, end=END_DATE, seed=SEED, **params):
+    """
+    One temple's daily rows for [start, end] as column dicts, one calendar
+    year per chunk, holding a single year in memory at a time. The visitor
+    history and next_day_visitors carry across chunk boundaries: a chunk is
+    yielded once the first day of the next one exists, and the last day of
+    the range is dropped (it has no next day). Each year draws from its own
+    child of `seed`, so the rows do not depend on how they are chunked.
+    `params` are the temple parameters of simulate().
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    history = {}
+    pending = None
+    for year in range(start.year, end.year + 1):
+        dates = pd.date_range(max(start, pd.Timestamp(year, 1, 1)), min(end, pd.Timestamp(year, 12, 31)), freq='D')
+        if len(dates) == 0:
+            continue
+        columns = simulate(dates, chunk_seed(seed, year), history, **params)
+        if pending is not None:
+            pending['next_day_visitors'][-1] = columns['visitors_today'][0]
+            yield pending
+        columns['next_day_visitors'] = np.append(columns['visitors_today'][1:], np.nan).astype(float)
+        pending = columns
+    if pending is not None and len(pending['date']) > 1:
+        yield {col: values[:-1] for col, values in pending.items()}
+
+
+def generate(start=START_DATE, end=END_DATE, seed=SEED, **params):
+    """
+    One temple's daily dataset for [start, end] as a single frame (the last
+    day is dropped: it has no next_day_visitors). The same seed gives the
+    same frame, equal to the concatenated iter_chunks() output.
+    """
+    chunks = list(iter_chunks(start, end, seed, **params))
+    df = pd.DataFrame({col: np.concatenate([chunk[col] for chunk in chunks]) for col in chunks[0]})
+    return apply_raw_dtypes(df)
+
+
+def write_parquet(path, start=START_DATE, end=END_DATE, seed=SEED, chunk_rows=CHUNK_ROWS, **params):
+    """Stream iter_chunks() into one Parquet file in row groups of `chunk_rows`; returns the row count"""
+    with ChunkedParquetWriter(path, chunk_rows) as writer:
+        for chunk in iter_chunks(start, end, seed, **params):
+            writer.write(chunk)
+    return writer.rows
+
+
+def crowd_category(visitors):
+    return pd.cut(visitors, [-np.inf, 2000, 5000, 8000, np.inf], right=False,
+                  labels=['Low', 'Medium', 'High', 'Very High'])
+
+
+def print_summary(df):
+    print("\nVisitor Distribution:")
+    for level, count in crowd_category(df['visitors_today']).value_counts().sort_index().items():
+        pct = (count / len(df)) * 100
+        print(f"   {level:12s}: {pct:5.1f}%")
+
+    print(f"\nAutocorrelation (lag-1): {df['visitors_today'].autocorr(lag=1):.3f}")
+    print(f"Visitor stats: Mean={df['visitors_today'].mean():.0f}, Std={df['visitors_today'].std():.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--start', default=START_DATE)
+    parser.add_argument('--end', default=END_DATE)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', default=OUTPUT_FILE, help='.parquet streams in chunks, anything else is CSV')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Parquet row group size')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("GENERATING IMPROVED DATASET V2")
+    print("="*80)
+
+    start = time.perf_counter()
+    if args.out.endswith('.parquet'):
+        rows = write_parquet(args.out, args.start, args.end, args.seed, args.chunk_rows)
+        seconds = time.perf_counter() - start
+        print(f"Records: {rows:,} streamed in {seconds * 1000:.0f} ms")
+        print(f"\nSaved: {args.out}")
+        return
+
+    df = generate(args.start, args.end, args.seed)
+    seconds = time.perf_counter() - start
+
+    print(f"Records: {len(df):,} in {seconds * 1000:.0f} ms ({memory_mb(df):.2f} MB in memory)")
+    print_summary(df)
+
+    df.to_csv(args.out, index=False)
+    print(f"\nSaved: {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+ROLLING FEATURE STATE
+Incremental history features for serving (/predict/observed, /forecast)
+and for feature store appends (src/feature_store.py).
+
+Keeps a compact per-temple history of daily visitor counts and builds
+the history-based features from src/features.py (lags, rolling mean/std/min/max,
+EWMs, 7-day trend, momentum, expanding day-of-week / month averages,
+days since season start) with O(1) work per new day. Clients send only
+today's raw observation; the full feature vector is assembled here.
+
+Feature semantics follow training: the row for day t predicts day t+1 and its
+history features only look at days before t (the `shift(1)` in model.py).
+So the newest observation is held as "today" and only folded into the
+history when the next day's observation arrives. Posting the same date again
+replaces today's observation without touching the history.
+"""
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import date as date_type
+
+from features import EWM_SPANS, LAGS, MOMENTUM_LAG, TREND_WINDOW, WINDOWS
+
+HISTORY = max(max(LAGS), max(WINDOWS), MOMENTUM_LAG)
+
+NAN = float("nan")
+
+
+class RollingWindow:
+    """Sum, sum of squares and monotonic min/max deques over the last `size` values"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._max = deque()   # (position, value), values decreasing
+        self._min = deque()   # (position, value), values increasing
+        self._position = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+        position = self._position
+        self._position += 1
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((position, value))
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((position, value))
+
+        oldest = position - self.size + 1
+        if self._max[0][0] < oldest:
+            self._max.popleft()
+        if self._min[0][0] < oldest:
+            self._min.popleft()
+
+    def copy(self):
+        clone = RollingWindow(self.size)
+        clone.values = deque(self.values)
+        clone.total = self.total
+        clone.total_sq = self.total_sq
+        clone._max = deque(self._max)
+        clone._min = deque(self._min)
+        clone._position = self._position
+        return clone
+
+    def features(self, suffix):
+        n = len(self.values)
+        if n == 0:
+            return {
+                f'visitors_rolling_mean_{suffix}': NAN,
+                f'visitors_rolling_std_{suffix}': 0.0,
+                f'visitors_rolling_max_{suffix}': NAN,
+                f'visitors_rolling_min_{suffix}': NAN,
+            }
+
+        mean = self.total / n
+        std = 0.0
+        if n > 1:
+            # Sample std (ddof=1) as pandas; clamp tiny negative rounding error
+            variance = (self.total_sq - self.total * mean) / (n - 1)
+            std = math.sqrt(variance) if variance > 0 else 0.0
+        return {
+            f'visitors_rolling_mean_{suffix}': mean,
+            f'visitors_rolling_std_{suffix}': std,
+            f'visitors_rolling_max_{suffix}': self._max[0][1],
+            f'visitors_rolling_min_{suffix}': self._min[0][1],
+        }
+
+
+def parse_date(value):
+    if isinstance(value, date_type):
+        return value
+    return date_type.fromisoformat(str(value)[:10])
+
+
+def derive_row_features(obs):
+    """
+    Calendar, cyclical and interaction features computed from one raw
+    observation, mirroring the non-history feature code in src/features.py.
+    As there, a missing input makes arithmetic on it NaN (stored as None,
+    i.e. missing to the layout) and comparisons on it false, so a row
+    without temperature_avg is not extreme weather.
+    """
+    row = dict(obs)
+    if 'date' in row:
+        d = parse_date(row['date'])
+        row.setdefault('day_of_week', d.weekday())
+        row.setdefault('month', d.month)
+        row.setdefault('is_weekend', int(d.weekday() >= 5))
+        row.setdefault('week_of_year', d.isocalendar()[1])
+        row['day_of_month'] = d.day
+        row['quarter'] = (d.month - 1) // 3 + 1
+        row['is_month_start'] = int(d.day <= 7)
+        row['is_month_end'] = int(d.day >= 24)
+
+    def get(name):
+        value = row.get(name)
+        return NAN if value is None else value
+
+    row['month_sin'] = math.sin(2 * math.pi * get('month') / 12)
+    row['month_cos'] = math.cos(2 * math.pi * get('month') / 12)
+    row['day_sin'] = math.sin(2 * math.pi * get('day_of_week') / 7)
+    row['day_cos'] = math.cos(2 * math.pi * get('day_of_week') / 7)
+    row['week_sin'] = math.sin(2 * math.pi * get('week_of_year') / 52)
+    row['week_cos'] = math.cos(2 * math.pi * get('week_of_year') / 52)
+
+    row['temp_humidity_interaction'] = get('temperature_avg') * get('humidity') / 100
+    row['rainfall_temp'] = get('rainfall') * get('temperature_avg')
+    row['extreme_weather'] = int(get('rainfall') > 50 or get('temperature_avg') < 5)
+
+    row['weekend_festival'] = get('is_weekend') * get('is_festival')
+    row['holiday_weekend'] = get('is_holiday') * get('is_weekend')
+    row['weekend_vacation'] = get('is_weekend') * get('school_vacation')
+    row['peak_weekend'] = get('is_weekend') * get('yatra_season')
+
+    row['occupancy_booking_ratio'] = get('hotel_occupancy_rate') / (get('bus_bookings') + 1)
+    row['demand_pressure'] = (get('google_trends_score') * get('bus_bookings')) / 1000
+    if 'days_to_next_festival' in row:
+        row['festival_within_3days'] = int(get('days_to_next_festival') <= 3)
+        row['festival_within_week'] = int(get('days_to_next_festival') <= 7)
+
+    for name, value in row.items():
+        if isinstance(value, float) and math.isnan(value):
+            row[name] = None
+    return row
+
+
+class TempleFeatureState:
+    """History-based feature state for one temple"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=HISTORY)
+        self.windows = {w: RollingWindow(w) for w in WINDOWS}
+
+        # Slope over the last TREND_WINDOW values: sum(i * y_i), i = position in window
+        self.trend_sum_xy = 0.0
+
+        self.ewm = {span: NAN for span in EWM_SPANS}
+        self.dow_sum = [0.0] * 7
+        self.dow_count = [0] * 7
+        self.month_sum = [0.0] * 13
+        self.month_count = [0] * 13
+
+        # Season of the last folded day and its days_since_season_start
+        self.last_season = None
+        self.last_season_days = 0
+        self.season_days = 0
+
+        self.today = None        # pending raw observation (derived features included)
+        self.today_date = None
+        self.days_observed = 0
+
+    def __getstate__(self):
+        # Picklable for the feature store; the lock is recreated on load
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def copy(self):
+        """Independent copy for what-if rollouts (O(history), done once per forecast)"""
+        clone = TempleFeatureState()
+        clone.history = deque(self.history, maxlen=HISTORY)
+        clone.windows = {w: window.copy() for w, window in self.windows.items()}
+        clone.trend_sum_xy = self.trend_sum_xy
+        clone.ewm = dict(self.ewm)
+        clone.dow_sum = list(self.dow_sum)
+        clone.dow_count = list(self.dow_count)
+        clone.month_sum = list(self.month_sum)
+        clone.month_count = list(self.month_count)
+        clone.last_season = self.last_season
+        clone.last_season_days = self.last_season_days
+        clone.season_days = self.season_days
+        clone.today = dict(self.today) if self.today is not None else None
+        clone.today_date = self.today_date
+        clone.days_observed = self.days_observed
+        return clone
+
+    # ---------- updates ----------
+    def _fold(self, obs, obs_date):
+        """Move a completed day's visitor count into the history, O(1)"""
+        value = float(obs.get('visitors_today', 0) or 0)
+
+        trend = self.windows[TREND_WINDOW]
+        n = len(trend.values)
+        if n == TREND_WINDOW:
+            oldest = trend.values[0]
+            self.trend_sum_xy = self.trend_sum_xy - (trend.total - oldest) + (n - 1) * value
+        else:
+            self.trend_sum_xy += n * value
+
+        for window in self.windows.values():
+            window.push(value)
+        self.history.append(value)
+
+        for span in EWM_SPANS:
+            alpha = 2.0 / (span + 1)
+            previous = self.ewm[span]
+            self.ewm[span] = value if math.isnan(previous) else (1 - alpha) * previous + alpha * value
+
+        dow = obs_date.weekday()
+        self.dow_sum[dow] += value
+        self.dow_count[dow] += 1
+        self.month_sum[obs_date.month] += value
+        self.month_count[obs_date.month] += 1
+
+        self.last_season = obs.get('yatra_season', 1)
+        self.last_season_days = self.season_days
+        self.days_observed += 1
+
+    def observe(self, obs):
+        """
+        Record today's raw observation. A later date folds the previous
+        pending day into the history first; the same date replaces it.
+        """
+        obs_date = parse_date(obs['date'])
+        if self.today_date is not None:
+            if obs_date < self.today_date:
+                raise ValueError(f"Observation for {obs_date} is older than the latest ({self.today_date})")
+            if obs_date > self.today_date:
+                self._fold(self.today, self.today_date)
+
+        row = derive_row_features(obs)
+        if self.last_season is not None and row.get('yatra_season', 1) == self.last_season:
+            self.season_days = self.last_season_days + 1
+        else:
+            self.season_days = 0
+
+        self.today = row
+        self.today_date = obs_date
+
+    # ---------- features ----------
+    def history_features(self, obs_date):
+        """History features for the row of obs_date, O(1) in history length"""
+        features = {}
+        history = self.history
+        n_hist = len(history)
+        for lag in LAGS:
+            features[f'visitors_lag_{lag}'] = history[-lag] if n_hist >= lag else NAN
+
+        for w, window in self.windows.items():
+            features.update(window.features(w))
+
+        # features.rolling_slope is NaN while its window still holds the
+        # first row's missing shift(1) value, i.e. until TREND_WINDOW days
+        trend = self.windows[TREND_WINDOW]
+        n = len(trend.values)
+        if n == TREND_WINDOW:
+            sum_x = n * (n - 1) / 2
+            sum_xx = (n - 1) * n * (2 * n - 1) / 6
+            features['visitor_trend_7d'] = (n * self.trend_sum_xy - sum_x * trend.total) / (n * sum_xx - sum_x * sum_x)
+        else:
+            features['visitor_trend_7d'] = NAN
+
+        features['visitor_momentum'] = (
+            history[-1] - history[-MOMENTUM_LAG] if n_hist >= MOMENTUM_LAG else NAN
+        )
+        for span in EWM_SPANS:
+            features[f'visitors_ewm_{span}'] = self.ewm[span]
+
+        dow = obs_date.weekday()
+        features['dow_avg_visitors'] = (
+            self.dow_sum[dow] / self.dow_count[dow] if self.dow_count[dow] else NAN
+        )
+        month = obs_date.month
+        features['month_avg_visitors'] = (
+            self.month_sum[month] / self.month_count[month] if self.month_count[month] else NAN
+        )
+        features['days_since_season_start'] = self.season_days
+        return features
+
+    def feature_row(self):
+        """Full feature dict for today's pending observation"""
+        if self.today is None:
+            raise ValueError("No observation recorded yet")
+        row = dict(self.today)
+        # NaN -> None so the layout treats them as missing values
+        for name, value in self.history_features(self.today_date).items():
+            row[name] = None if isinstance(value, float) and math.isnan(value) else value
+        return row
+
+    def summary(self):
+        return {
+            "days_observed": self.days_observed,
+            "latest_date": str(self.today_date) if self.today_date else None,
+            "history_length": len(self.history),
+            "days_since_season_start": self.season_days,
+        }
+
+
+class FeatureStateStore:
+    """
+    TempleFeatureState per temple ID. Observations create states (get);
+    read paths use lookup, which does not. Any valid templeId can observe
+    (it is served by the default model), so at most `max_temples` states
+    are kept and the least recently used one is dropped beyond that.
+    """
+
+    def __init__(self, max_temples=1024):
+        self.max_temples = max_temples
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def lookup(self, temple_id):
+        """The temple's state, or None if nothing was recorded for it"""
+        with self._lock:
+            state = self._states.get(temple_id)
+            if state is not None:
+                self._states.move_to_end(temple_id)
+            return state
+
+    def get(self, temple_id):
+        """The temple's state, created empty on first use"""
+        with self._lock:
+            state = self._states.get(temple_id)
+            if state is None:
+                state = self._states[temple_id] = TempleFeatureState()
+                while len(self._states) > self.max_temples:
+                    self._states.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._states.move_to_end(temple_id)
+            return state
+
+    def summary(self):
+        with self._lock:
+            return {temple_id: state.summary() for temple_id, state in self._states.items()}
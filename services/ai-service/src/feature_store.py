@@ -0,0 +1,314 @@
+"""
+FEATURE STORE
+Engineered training features kept as Parquet, extended incrementally.
+
+Layout, keyed by dataset name and a hash of the feature code:
+
+    <root>/<dataset>/<code_hash>/parts/part-00000.parquet   full build
+    <root>/<dataset>/<code_hash>/parts/part-00001.parquet   each later append
+    <root>/<dataset>/<code_hash>/tail_state.pkl             TempleFeatureState
+    <root>/<dataset>/<code_hash>/state.json                 rows, digest, encoders
+
+Changing the feature code (src/features.py, src/feature_state.py,
+src/schema.py or this file) changes the hash, so stale features are never
+reused. Parts are written with the compact dtypes of src/schema.py.
+
+A full build runs the vectorized src/features.py and then replays the
+visitor history into a TempleFeatureState (the same O(1)-per-day state the
+API uses). When the raw data grows by a few days, only those rows are fed
+through that state and written as a new part file, so append cost depends
+on the number of new days, not on the length of the history.
+
+The newest stored row's next_day_visitors is unknown until the next day
+arrives, so the prefix check leaves that one target out: when it is filled
+in, the stored row's target is patched in place (its part file rewritten)
+instead of rebuilding. Earlier rows edited (targets included), changed
+columns, or an unseen category that would renumber the label encoding all
+trigger a full rebuild instead. So does
+any change to multi-temple data (several temple_id values, rows sorted by
+temple then date): its history features are built per temple with
+build_features(by='temple_id'), and the single tail state cannot follow
+several temples.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sklearn.preprocessing import LabelEncoder
+
+import feature_state
+import features
+import schema
+from feature_state import TempleFeatureState
+from features import build_features
+from schema import RAW_COLUMNS, date_order, read_raw, sort_raw
+
+STATE_FILE = "state.json"
+TAIL_STATE_FILE = "tail_state.pkl"
+PARTS_DIR = "parts"
+# Training target: no feature reads it, and the newest row's is filled in late
+LABEL = "next_day_visitors"
+# Appends past this many part files are compacted into one
+MAX_PARTS = 32
+
+
+def feature_code_hash():
+    """Hash of the code that defines the features"""
+    digest = hashlib.sha256()
+    for path in (features.__file__, feature_state.__file__, schema.__file__, __file__):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def row_hashes(raw):
+    """One uint64 content hash per raw row, target excluded (vectorized)"""
+    return pd.util.hash_pandas_object(raw.drop(columns=[LABEL], errors="ignore"), index=False).to_numpy()
+
+
+def target_digest(raw, rows):
+    """Digest of the targets of the first `rows` raw rows"""
+    if LABEL not in raw.columns:
+        return None
+    return hashlib.sha256(raw[LABEL].iloc[:rows].to_numpy(dtype=np.float64).tobytes()).hexdigest()
+
+
+def raw_digest(columns, hashes):
+    """Digest of raw rows from their column names and row hashes"""
+    digest = hashlib.sha256(json.dumps(list(columns)).encode())
+    digest.update(hashes.tobytes())
+    return digest.hexdigest()
+
+
+def _encoder_from_classes(classes):
+    le = LabelEncoder()
+    le.classes_ = np.array(classes, dtype=object)
+    return le
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _dump_pickle(obj, path):
+    with open(path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _dump_json(obj, path):
+    with open(path, "w") as f:
+        json.dump(obj, f, indent=2)
+
+
+def _temples(raw):
+    return raw['temple_id'].nunique() if 'temple_id' in raw.columns else 1
+
+
+def _records(raw):
+    """Raw rows as dicts of plain Python values (NaN -> None)"""
+    columns = list(raw.columns)
+    return [
+        {k: (None if v != v else v) for k, v in zip(columns, values)}
+        for values in raw.to_numpy(dtype=object)
+    ]
+
+
+class FeatureStore:
+    def __init__(self, root="./feature_store"):
+        self.root = root
+        self.code_hash = feature_code_hash()
+        # {"mode": "full" | "append" | "unchanged", "rows_added": n, "seconds": t}
+        self.last_update = None
+
+    def path(self, dataset, name=""):
+        return os.path.join(self.root, dataset, self.code_hash, name)
+
+    def _part_path(self, dataset, i):
+        return self.path(dataset, os.path.join(PARTS_DIR, f"part-{i:05d}.parquet"))
+
+    # ---------- reading ----------
+    def read_state(self, dataset):
+        try:
+            with open(self.path(dataset, STATE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def load(self, dataset, columns=None):
+        """
+        Stored features as one DataFrame (optionally only `columns`), plus the
+        label encoders that produced the *_encoded columns.
+        """
+        state = self.read_state(dataset)
+        if state is None:
+            raise FileNotFoundError(f"No stored features for {dataset} ({self.code_hash})")
+
+        paths = [self._part_path(dataset, i) for i in range(state["parts"])]
+        df = ds.dataset(paths, format="parquet").to_table(columns=columns).to_pandas()
+        label_encoders = {col: _encoder_from_classes(c) for col, c in state["encoders"].items()}
+        return df, label_encoders
+
+    # ---------- writing ----------
+    def update(self, dataset, raw):
+        """
+        Bring the stored features in line with `raw` (schema.sort_raw
+        order, one row per temple and day). Returns {"mode": "full" | "append" | "unchanged",
+        "rows_added": n, "seconds": t}; read the features with load().
+        """
+        start = time.perf_counter()
+        state = self.read_state(dataset)
+        hashes = row_hashes(raw)
+
+        if state is not None and self._extends(state, raw, hashes):
+            self._patch_target(dataset, state, raw)
+            new_rows = raw.iloc[state["rows"]:]
+            if len(new_rows):
+                self._append(dataset, state, raw, hashes, new_rows)
+                mode = "append"
+            else:
+                mode = "unchanged"
+        else:
+            new_rows = raw
+            self._build(dataset, raw, hashes)
+            mode = "full"
+
+        self.last_update = {
+            "mode": mode,
+            "rows_added": len(new_rows) if mode != "unchanged" else 0,
+            "seconds": time.perf_counter() - start,
+        }
+        return self.last_update
+
+    def _extends(self, state, raw, hashes):
+        """True if raw is the stored raw data plus zero or more new rows of a single temple"""
+        if list(raw.columns) != state["raw_columns"] or len(raw) < state["rows"]:
+            return False
+        if _temples(raw) > 1 and len(raw) > state["rows"]:
+            return False
+        if raw_digest(raw.columns, hashes[:state["rows"]]) != state["raw_digest"]:
+            return False
+        # Every stored target but the newest, which may have been filled in since
+        if target_digest(raw, state["rows"] - 1) != state["target_digest"]:
+            return False
+
+        new_rows = raw.iloc[state["rows"]:]
+        for col, classes in state["encoders"].items():
+            if not set(new_rows[col].astype(str)).issubset(classes):
+                return False
+        return True
+
+    def _build(self, dataset, raw, hashes):
+        by = 'temple_id' if 'temple_id' in raw.columns else None
+        df, label_encoders = build_features(raw.copy(), by=by)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        os.makedirs(self.path(dataset, PARTS_DIR), exist_ok=True)
+        _write_atomic(self._part_path(dataset, 0), lambda p: pq.write_table(table, p))
+
+        # Only single-temple data is ever appended to (see _extends)
+        tail = TempleFeatureState()
+        if _temples(raw) <= 1:
+            for obs in _records(raw):
+                tail.observe(obs)
+
+        state = {
+            "dataset": dataset,
+            "code_hash": self.code_hash,
+            "parts": 1,
+            "raw_columns": list(raw.columns),
+            "encoders": {col: [str(c) for c in le.classes_] for col, le in label_encoders.items()},
+        }
+        self._save(dataset, state, raw, hashes, tail)
+
+    def _patch_target(self, dataset, state, raw):
+        """Bring the newest stored row's target in line with raw (last row of the last part)"""
+        if LABEL not in raw.columns:
+            return
+        target = raw[LABEL].iloc[state["rows"] - 1]
+        path = self._part_path(dataset, state["parts"] - 1)
+        table = pq.read_table(path)
+        column = table.column(LABEL).to_numpy(zero_copy_only=False).astype(np.float64)
+        if column[-1] == target or (np.isnan(column[-1]) and pd.isna(target)):
+            return
+        column[-1] = np.nan if pd.isna(target) else target
+        i = table.schema.get_field_index(LABEL)
+        patched = table.set_column(i, table.schema.field(i), pa.array(column, type=table.schema.field(i).type,
+                                                                     from_pandas=True))
+        _write_atomic(path, lambda p: pq.write_table(patched, p))
+
+    def _append(self, dataset, state, raw, hashes, new_rows):
+        with open(self.path(dataset, TAIL_STATE_FILE), "rb") as f:
+            tail = pickle.load(f)
+
+        # Same codes as LabelEncoder.transform on the stored classes
+        lookups = {col: {cls: i for i, cls in enumerate(c)} for col, c in state["encoders"].items()}
+
+        rows = []
+        for obs in _records(new_rows):
+            tail.observe(obs)
+            row = tail.feature_row()
+            for col, lookup in lookups.items():
+                value = obs[col]
+                row[col + "_encoded"] = lookup["nan" if value is None else str(value)]
+            row["date"] = obs["date"]
+            rows.append(row)
+
+        # Straight from dicts to Arrow with the first part's schema (no DataFrame)
+        schema = pq.read_schema(self._part_path(dataset, 0))
+        table = pa.Table.from_pylist(rows, schema=schema)
+        _write_atomic(self._part_path(dataset, state["parts"]), lambda p: pq.write_table(table, p))
+
+        state = dict(state, parts=state["parts"] + 1)
+        self._save(dataset, state, raw, hashes, tail)
+        if state["parts"] > MAX_PARTS:
+            self.compact(dataset)
+
+    def _save(self, dataset, state, raw, hashes, tail):
+        """Write the tail state, then state.json (the commit point of an update)"""
+        state = dict(
+            state,
+            rows=len(raw),
+            last_date=str(raw["date"].iloc[-1]),
+            raw_digest=raw_digest(raw.columns, hashes),
+            target_digest=target_digest(raw, len(raw) - 1),
+        )
+        _write_atomic(self.path(dataset, TAIL_STATE_FILE), lambda p: _dump_pickle(tail, p))
+        _write_atomic(self.path(dataset, STATE_FILE), lambda p: _dump_json(state, p))
+
+    def compact(self, dataset):
+        """Rewrite all parts as one file (each append leaves one small part)"""
+        state = self.read_state(dataset)
+        if state is None or state["parts"] <= 1:
+            return
+        df, _ = self.load(dataset)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        _write_atomic(self._part_path(dataset, 0), lambda p: pq.write_table(table, p))
+        _write_atomic(self.path(dataset, STATE_FILE), lambda p: _dump_json(dict(state, parts=1), p))
+        for i in range(1, state["parts"]):
+            os.remove(self._part_path(dataset, i))
+
+
+def load_csv_features(path, root=None):
+    """
+    Read a raw daily CSV or Parquet dataset, bring its stored features up
+    to date and load them. The dataset is named after the file; the store
+    root defaults to TRINETRA_FEATURE_STORE. Returns (df in date order,
+    label_encoders, update info).
+    """
+    raw = sort_raw(read_raw(path, RAW_COLUMNS))
+
+    dataset = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+    store = FeatureStore(root or os.getenv('TRINETRA_FEATURE_STORE', './feature_store'))
+    update = store.update(dataset, raw)
+    df, label_encoders = store.load(dataset)
+    return date_order(df), label_encoders, update
@@ -0,0 +1,301 @@
+"""
+FEATURE ENGINEERING
+Vectorized feature building shared by training (src/model.py) and tooling.
+
+Every history feature follows the training convention: the row for day t
+only sees visitors up to day t-1 (`shift(1)`) and is used to predict t+1.
+Passing `by` (e.g. "temple_id") computes lags, windows, season counters and
+expanding averages per group, so many temples can share one frame; rows must
+be sorted by group, then date.
+
+No step loops over rows or groups in Python:
+- days_since_season_start is groupby(run id).cumcount()
+- visitor_trend_7d is the closed-form least-squares slope from rolling sums
+  of y and position * y (instead of np.polyfit in rolling().apply)
+- dow / month averages are exclusive cumulative sums / counts
+
+Arithmetic runs in float64; build_features then stores the new columns as
+float32 / int16 (src/schema.py compact) and training_frame hands the
+models one float32 block.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+from sklearn.preprocessing import LabelEncoder
+
+from schema import compact
+
+CATEGORICAL_COLUMNS = ['weather_condition', 'yatra_phase', 'temple_open_status', 'road_condition']
+
+TARGET = 'visitors_today'
+LAGS = (1, 2, 3, 7, 14)
+WINDOWS = (3, 7, 14, 30)
+TREND_WINDOW = 7
+EWM_SPANS = (7, 30)
+MOMENTUM_LAG = 8
+
+# Raw visitor aggregates and text columns never used as model inputs
+EXCLUDED_FEATURES = [
+    'date', 'visitors_today', 'next_day_visitors',
+    'visitors_yesterday', 'visitors_last_week', 'visitors_avg_7days', 'visitors_avg_30days',
+    'weather_condition', 'yatra_phase', 'temple_open_status', 'road_condition',
+    'holiday_name', 'festival_name'
+]
+NUMERIC_DTYPES = ['int64', 'float64', 'int32', 'float32', 'int16', 'int8']
+# Columns the post-processing rules read (src/rules.py)
+RULE_METADATA_COLUMNS = ['yatra_season', 'temple_open_status', 'road_condition',
+                         'weather_condition', 'month', 'extreme_weather']
+
+
+def encode_categoricals(df, columns=CATEGORICAL_COLUMNS, label_encoders=None):
+    """
+    Add <col>_encoded for each categorical column and return the encoders.
+    Fits new encoders unless already-fitted ones are passed in.
+    """
+    if label_encoders is not None:
+        for col, le in label_encoders.items():
+            df[col + '_encoded'] = le.transform(df[col].astype(str))
+        return label_encoders
+
+    label_encoders = {}
+    for col in columns:
+        if col in df.columns:
+            le = LabelEncoder()
+            df[col + '_encoded'] = le.fit_transform(df[col].astype(str))
+            label_encoders[col] = le
+    return label_encoders
+
+
+def add_time_features(df):
+    """Calendar parts and cyclical encodings"""
+    df['day_of_month'] = df['date'].dt.day
+    df['quarter'] = df['date'].dt.quarter
+    df['is_month_start'] = (df['date'].dt.day <= 7).astype(int)
+    df['is_month_end'] = (df['date'].dt.day >= 24).astype(int)
+
+    df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
+    df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
+    df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
+    df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
+    df['week_sin'] = np.sin(2 * np.pi * df['week_of_year'] / 52)
+    df['week_cos'] = np.cos(2 * np.pi * df['week_of_year'] / 52)
+    return df
+
+
+def add_interaction_features(df):
+    """Weather and calendar interactions"""
+    df['temp_humidity_interaction'] = df['temperature_avg'] * df['humidity'] / 100
+    df['rainfall_temp'] = df['rainfall'] * df['temperature_avg']
+    df['extreme_weather'] = ((df['rainfall'] > 50) | (df['temperature_avg'] < 5)).astype(int)
+
+    df['weekend_festival'] = df['is_weekend'] * df['is_festival']
+    df['holiday_weekend'] = df['is_holiday'] * df['is_weekend']
+    df['weekend_vacation'] = df['is_weekend'] * df['school_vacation']
+    df['peak_weekend'] = df['is_weekend'] * df['yatra_season']
+    return df
+
+
+def add_external_features(df):
+    """Bookings, occupancy and festival proximity"""
+    df['occupancy_booking_ratio'] = df['hotel_occupancy_rate'] / (df['bus_bookings'] + 1)
+    df['demand_pressure'] = (df['google_trends_score'] * df['bus_bookings']) / 1000
+    df['festival_within_3days'] = (df['days_to_next_festival'] <= 3).astype(int)
+    df['festival_within_week'] = (df['days_to_next_festival'] <= 7).astype(int)
+    return df
+
+
+class GroupWindow(BaseIndexer):
+    """
+    Trailing window of `window_size` rows clipped at each row's group start,
+    so one ungrouped rolling() pass computes every group's windows without
+    groupby().rolling() building a MultiIndex per call. Groups must be
+    contiguous (sorted by group, then date).
+    """
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.group_start)
+        return start, end
+
+
+def _group_starts(df, by):
+    """(group codes, index of each row's group start); (None, None) without `by`"""
+    if by is None:
+        return None, None
+    codes = pd.factorize(df[by])[0]
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    if first.sum() != len(np.unique(codes)):
+        raise ValueError(f"Rows must be sorted by {by!r} (each group contiguous)")
+    group_start = np.maximum.accumulate(np.where(first, np.arange(len(codes)), 0))
+    return pd.Series(codes, index=df.index), group_start
+
+
+def _shift(series, keys, periods):
+    if keys is None:
+        return series.shift(periods)
+    return series.groupby(keys, sort=False).shift(periods)
+
+
+def _rolling(series, group_start, window, min_periods):
+    if group_start is None:
+        return series.rolling(window=window, min_periods=min_periods)
+    indexer = GroupWindow(window_size=window, group_start=group_start)
+    return series.rolling(window=indexer, min_periods=min_periods)
+
+
+def add_season_features(df, by=None):
+    """Days since the current yatra_season run (open or closed) started"""
+    season = df['yatra_season']
+    starts = season.ne(season.shift())
+    if by is not None:
+        starts |= df[by].ne(df[by].shift())
+    df['days_since_season_start'] = season.groupby(starts.cumsum()).cumcount()
+    return df
+
+
+def rolling_slope(series, window, group_start=None):
+    """
+    Least-squares slope of each trailing window (x = 0..n-1), as
+    rolling(window, min_periods=2).apply(np.polyfit(...)[0]) but closed form:
+
+        slope = (n * Sxy - Sx * Sy) / (n * Sxx - Sx^2)
+
+    Sy and Sxy come from rolling sums of y and p * y, p being the row's
+    position in its group, with Sxy = sum(p * y) - start * Sy. Windows that
+    contain a NaN are NaN, as with polyfit.
+    """
+    values = series.astype(float)
+    position = np.arange(len(values), dtype=float)
+    if group_start is not None:
+        position -= group_start
+    position = pd.Series(position, index=values.index)
+
+    sum_y = _rolling(values, group_start, window, 1).sum()
+    sum_py = _rolling(values * position, group_start, window, 1).sum()
+    count = _rolling(values, group_start, window, 1).count()
+
+    n = np.minimum(position + 1, window)
+    start = position - n + 1
+    sum_xy = sum_py - start * sum_y
+    sum_x = n * (n - 1) / 2
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+    return slope.where((count == n) & (n >= 2))
+
+
+def expanding_group_mean(series, keys):
+    """
+    Mean of all earlier values in the same group (NaN for the first), as
+    groupby(keys).transform(lambda x: x.shift(1).expanding().mean())
+    """
+    valid = series.notna()
+    filled = series.where(valid, 0).astype(float)
+    total = filled.groupby(keys, sort=False).cumsum() - filled
+    count = valid.groupby(keys, sort=False).cumsum() - valid
+    return (total / count).where(count > 0)
+
+
+def add_history_features(df, by=None, target=TARGET):
+    """Lags, rolling stats, trend, momentum, EWMs and expanding averages"""
+    keys, group_start = _group_starts(df, by)
+    y = df[target]
+    previous = _shift(y, keys, 1)
+
+    for lag in LAGS:
+        df[f'visitors_lag_{lag}'] = previous if lag == 1 else _shift(y, keys, lag)
+
+    for window in WINDOWS:
+        rolling = _rolling(previous, group_start, window, 1)
+        df[f'visitors_rolling_mean_{window}'] = rolling.mean()
+        df[f'visitors_rolling_std_{window}'] = rolling.std().fillna(0)
+        df[f'visitors_rolling_max_{window}'] = rolling.max()
+        df[f'visitors_rolling_min_{window}'] = rolling.min()
+
+    df['visitor_trend_7d'] = rolling_slope(previous, TREND_WINDOW, group_start)
+    df['visitor_momentum'] = previous - _shift(y, keys, MOMENTUM_LAG)
+
+    for span in EWM_SPANS:
+        if keys is None:
+            ewm = previous.ewm(span=span, adjust=False).mean()
+        else:
+            # EWM state must restart per group; only two calls, so groupby is fine here
+            ewm = previous.groupby(keys, sort=False).ewm(span=span, adjust=False).mean()
+            ewm = ewm.reset_index(level=0, drop=True)
+        df[f'visitors_ewm_{span}'] = ewm
+
+    for name, column in (('dow_avg_visitors', 'day_of_week'), ('month_avg_visitors', 'month')):
+        group_keys = df[column] if keys is None else [keys, df[column]]
+        df[name] = expanding_group_mean(y, group_keys)
+    return df
+
+
+def build_features(df, by=None, label_encoders=None):
+    """
+    Full training feature set, in the column order model.py has always used,
+    downcast with schema.compact. Returns (df, label_encoders); df is
+    modified in place.
+    """
+    label_encoders = encode_categoricals(df, label_encoders=label_encoders)
+    add_time_features(df)
+    add_interaction_features(df)
+    add_season_features(df, by)
+    add_history_features(df, by)
+    add_external_features(df)
+    return compact(df), label_encoders
+
+
+def feature_cost(column, raw_columns):
+    """
+    Relative cost of computing `column` for one request, in history values
+    read: 0 for raw inputs, the window length for rolling stats and the
+    trend, 1 for everything else derived (lags, EWMs, expanding averages,
+    encodings, calendar and interaction arithmetic)
+    """
+    if column in raw_columns:
+        return 0
+    if column.startswith('visitors_rolling_'):
+        return int(column.rsplit('_', 1)[1])
+    if column == 'visitor_trend_7d':
+        return TREND_WINDOW
+    return 1
+
+
+def select_feature_columns(df):
+    """Numeric model inputs, in frame order"""
+    return [col for col in df.columns
+            if col not in EXCLUDED_FEATURES and df[col].dtype in NUMERIC_DTYPES]
+
+
+def training_frame(df, feature_columns=None):
+    """
+    Rows with a next-day target, split into (X, y, dates, metadata,
+    feature_columns). X is all float32 (one contiguous block); NaN inputs
+    are filled with the column median.
+    """
+    if feature_columns is None:
+        feature_columns = select_feature_columns(df)
+    df_clean = df.dropna(subset=['next_day_visitors'])
+    X = df_clean[feature_columns].astype(np.float32)
+    y = df_clean['next_day_visitors'].copy()
+    dates = df_clean['date'].copy()
+    metadata = df_clean[RULE_METADATA_COLUMNS].copy()
+
+    for col in X.columns:
+        if X[col].isna().any():
+            X[col] = X[col].fillna(X[col].median())
+    return X, y, dates, metadata, feature_columns
+
+
+def fill_values(X):
+    """
+    Per-column medians of a training_frame X: the values its missing inputs
+    were filled with, and so the values serving fills missing features with
+    (stored in the bundle header). Filling with the median leaves the median
+    unchanged, so the filled X gives the same numbers.
+    """
+    medians = X.median()
+    return {col: float(value) for col, value in medians.items() if np.isfinite(value)}
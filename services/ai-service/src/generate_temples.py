@@ -0,0 +1,233 @@
+"""
+MULTI-TEMPLE DATA GENERATOR
+Generates many temples over many years with create_dataset.generate, one
+shard per temple, spread over a process pool.
+
+The temple config (config/temples.json) holds shared `defaults` and a
+`temples` list; each temple may override any default:
+
+    temple_id          required, becomes the temple_id column
+    seasons            {year: [open, close]} yatra season per year
+    baselines          {month: visitors} monthly baselines
+    festival_strength  {festival name: multiplier}
+    festivals          {year: [[date, name], ...]}
+    max_visitors       daily cap
+    scale              multiplies baselines and the cap (default 1)
+
+Years missing from a table are cycled (see create_dataset.py). Asking for
+more temples than the config lists (--temples N) adds replicas of the
+configured temples ("kedarnath_2", ...) with a seeded scale jitter.
+
+Every shard gets its own child of np.random.SeedSequence(seed), so a shard
+does not depend on which worker ran it or how many workers there were, and
+shards are merged in config order (temple, then date): the same seed and
+config always give the same file.
+
+An --out path without a .parquet / .csv suffix is written as a
+hive-partitioned Parquet directory, <out>/temple_id=<id>/part-0.parquet:
+each worker streams its temple's yearly chunks straight to its partition
+(src/chunked_parquet.py), so neither the workers nor this process ever
+hold more than a row group. schema.read_raw reads it back. With
+--intraday-minutes 60 / 15 the partitions hold intraday slots
+(src/intraday.py) instead of daily rows.
+
+Run from services/ai-service:
+    python src/generate_temples.py [--config config/temples.json] [--temples 100]
+        [--start 2005-01-01] [--end 2024-12-31] [--seed 42] [--workers N]
+        [--out data/temples.parquet | data/temples/] [--chunk-rows 65536] [--intraday-minutes 15]
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import create_dataset
+import intraday
+from chunked_parquet import CHUNK_ROWS
+from schema import apply_raw_dtypes, memory_mb
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'temples.json')
+OUTPUT_FILE = 'temples_mock_dataset.parquet'
+REPLICA_SCALE = (0.7, 1.3)
+
+
+# ============================================================================
+# CONFIG
+# ============================================================================
+
+def _parse_temple(spec):
+    """JSON temple entry -> keyword arguments for create_dataset.generate"""
+    scale = float(spec.get('scale', 1.0))
+    kwargs = {}
+    if 'seasons' in spec:
+        kwargs['seasons'] = {
+            int(year): (datetime.fromisoformat(start), datetime.fromisoformat(end))
+            for year, (start, end) in spec['seasons'].items()
+        }
+    baselines = spec.get('baselines', create_dataset.monthly_baselines)
+    kwargs['baselines'] = {int(month): value * scale for month, value in baselines.items()}
+    if 'festivals' in spec:
+        kwargs['festival_table'] = {
+            str(year): [tuple(entry) for entry in entries] for year, entries in spec['festivals'].items()
+        }
+    if 'festival_strength' in spec:
+        kwargs['strengths'] = dict(spec['festival_strength'])
+    kwargs['max_visitors'] = int(spec.get('max_visitors', create_dataset.MAX_VISITORS) * scale)
+    return kwargs
+
+
+def load_config(path=CONFIG_FILE):
+    """List of temple specs with the config defaults merged in"""
+    with open(path) as f:
+        config = json.load(f)
+    defaults = config.get('defaults', {})
+    temples = []
+    for spec in config['temples']:
+        merged = {**defaults, **spec}
+        # Festival strengths merge per festival instead of replacing the table
+        if 'festival_strength' in defaults and 'festival_strength' in spec:
+            merged['festival_strength'] = {**defaults['festival_strength'], **spec['festival_strength']}
+        temples.append(merged)
+    if not temples:
+        raise ValueError(f"{path}: no temples configured")
+    return temples
+
+
+def expand_temples(temples, count, seed):
+    """
+    `count` temple specs: the configured ones, then replicas cycling through
+    them with a scale drawn from `seed` and the replica index
+    """
+    if count is None or count <= len(temples):
+        return temples[:count] if count else temples
+    expanded = list(temples)
+    for index in range(len(temples), count):
+        spec = temples[index % len(temples)]
+        jitter = np.random.default_rng([seed, index]).uniform(*REPLICA_SCALE)
+        expanded.append({**spec,
+                         'temple_id': f"{spec['temple_id']}_{index // len(temples) + 1}",
+                         'scale': float(spec.get('scale', 1.0)) * jitter})
+    return expanded
+
+
+# ============================================================================
+# SHARDS
+# ============================================================================
+
+def _generate_shard(spec, start, end, seed_sequence):
+    df = create_dataset.generate(start, end, seed_sequence, **_parse_temple(spec))
+    df.insert(0, 'temple_id', spec['temple_id'])
+    return df
+
+
+def _write_shard(spec, start, end, seed_sequence, directory, chunk_rows, minutes=None):
+    path = os.path.join(directory, f"temple_id={spec['temple_id']}", 'part-0.parquet')
+    if minutes:
+        daily = create_dataset.iter_chunks(start, end, seed_sequence, **_parse_temple(spec))
+        return intraday.write_parquet(path, daily, minutes, seed_sequence, chunk_rows)
+    return create_dataset.write_parquet(path, start, end, seed_sequence, chunk_rows, **_parse_temple(spec))
+
+
+def run_shards(temples, start, end, seed, max_workers=None, func=_generate_shard, extra=()):
+    """
+    [func(spec, start, end, shard seed, *extra)] per temple, in temple
+    order. Forked process pool where available, this process otherwise or
+    with a single worker.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(temples))
+    tasks = [(spec, start, end, child, *extra) for spec, child in zip(temples, seeds)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if 'fork' in mp.get_all_start_methods() and max_workers > 1:
+        with ProcessPoolExecutor(max_workers, mp_context=mp.get_context('fork')) as pool:
+            return list(pool.map(func, *zip(*tasks), chunksize=max(1, len(tasks) // (4 * max_workers))))
+    return [func(*task) for task in tasks]
+
+
+def merge_shards(frames, temples):
+    """Concatenate shards sorted by temple (config order), then date"""
+    df = pd.concat(frames, ignore_index=True)
+    df = apply_raw_dtypes(df)
+    df['temple_id'] = pd.Categorical(df['temple_id'], categories=[spec['temple_id'] for spec in temples])
+    return df
+
+
+def generate(config=CONFIG_FILE, temples=None, start=create_dataset.START_DATE, end=create_dataset.END_DATE,
+             seed=create_dataset.SEED, max_workers=None):
+    """Merged multi-temple frame; `temples` is the number of temples (default: as configured)"""
+    specs = expand_temples(load_config(config), temples, seed)
+    return merge_shards(run_shards(specs, start, end, seed, max_workers), specs)
+
+
+def write_dataset(directory, config=CONFIG_FILE, temples=None, start=create_dataset.START_DATE,
+                  end=create_dataset.END_DATE, seed=create_dataset.SEED, max_workers=None, chunk_rows=CHUNK_ROWS,
+                  intraday_minutes=None):
+    """
+    Stream every temple into its own partition of a hive-partitioned
+    Parquet directory; returns {temple_id: rows}. Daily rows are the same
+    as generate() with the same arguments; with `intraday_minutes` the
+    partitions hold that temple's intraday slots instead.
+    """
+    specs = expand_temples(load_config(config), temples, seed)
+    rows = run_shards(specs, start, end, seed, max_workers, _write_shard, (directory, chunk_rows, intraday_minutes))
+    return {spec['temple_id']: count for spec, count in zip(specs, rows)}
+
+
+def save(df, path):
+    """Parquet for .parquet paths, CSV otherwise"""
+    if path.endswith('.parquet'):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=CONFIG_FILE)
+    parser.add_argument('--temples', type=int, default=None, help='Number of temples (default: as configured)')
+    parser.add_argument('--start', default=create_dataset.START_DATE)
+    parser.add_argument('--end', default=create_dataset.END_DATE)
+    parser.add_argument('--seed', type=int, default=create_dataset.SEED)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--out', default=OUTPUT_FILE,
+                        help='.parquet / .csv file, or a directory to stream partitions into')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Parquet row group size (directory output)')
+    parser.add_argument('--intraday-minutes', type=int, choices=intraday.SLOT_MINUTES, default=None,
+                        help='Write intraday slots instead of daily rows (directory output)')
+    args = parser.parse_args()
+
+    print("="*80)
+    print("GENERATING MULTI-TEMPLE DATASET")
+    print("="*80)
+
+    if args.intraday_minutes and args.out.endswith(('.parquet', '.csv')):
+        parser.error('--intraday-minutes needs a directory --out')
+
+    start = time.perf_counter()
+    if not args.out.endswith(('.parquet', '.csv')):
+        rows = write_dataset(args.out, args.config, args.temples, args.start, args.end, args.seed,
+                             args.workers, args.chunk_rows, args.intraday_minutes)
+        seconds = time.perf_counter() - start
+        print(f"Temples: {len(rows)}, records: {sum(rows.values()):,} streamed in {seconds:.2f} s")
+        print(f"\nSaved: {args.out}/temple_id=*/")
+        return
+
+    df = generate(args.config, args.temples, args.start, args.end, args.seed, args.workers)
+    seconds = time.perf_counter() - start
+
+    print(f"Temples: {df['temple_id'].nunique()}, records: {len(df):,} in {seconds:.2f} s "
+          f"({memory_mb(df):.1f} MB in memory)")
+    create_dataset.print_summary(df)
+
+    save(df, args.out)
+    print(f"\nSaved: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+INTRADAY CROWD SIMULATION
+Splits daily rows (src/create_dataset.py) into hourly or 15-minute slots:
+
+    arrivals            visitors arriving in the slot; a day's slots sum
+                        to visitors_today
+    users_within_500m   app users near the temple during the slot
+
+The crowd curve is consistent with the daily fields at hourly resolution:
+the busiest hour averages exactly peak_hour_users and the 24 hourly values
+average average_users_last_hour (to within rounding to whole users).
+
+Each day's shape is a morning darshan peak plus an afternoon bump over a
+small night floor (closed season: one flat midday bump), with the centres,
+widths and afternoon weight drawn per day. The hourly crowd is
+peak_hour_users * shape ** k, where k is solved per day by bisection so the
+mean hits average_users_last_hour; 15-minute slots spread each hour over
+its quarters with a little noise that keeps the hourly mean. Arrivals are
+one multinomial draw per day over an arrival curve that leads the crowd.
+
+Everything is computed as (days x slots) arrays, one yearly daily chunk at
+a time, so decades of 15-minute data for many temples stream to Parquet in
+bounded memory (see generate_temples.py --intraday-minutes).
+
+Run from services/ai-service:
+    python src/intraday.py [--daily data.csv | --start 2022-01-01 --end 2024-12-31] [--minutes 15]
+        [--seed 42] [--out intraday.parquet]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import create_dataset
+from chunked_parquet import CHUNK_ROWS, ChunkedParquetWriter
+from schema import INTRADAY_DTYPES, read_raw
+
+SLOT_MINUTES = (60, 15)
+OUTPUT_FILE = 'kedarnath_intraday.parquet'
+
+NIGHT_FLOOR = 0.02
+# Arrivals run ahead of the crowd near the temple by about the climb's last leg
+ARRIVAL_LEAD_HOURS = 1.0
+SLOT_NOISE_SIGMA = 0.08
+BISECTION_STEPS = 40
+LOG_K_RANGE = (-4.0, 5.0)
+
+DAILY_COLUMNS = ['date', 'visitors_today', 'average_users_last_hour', 'peak_hour_users',
+                 'yatra_season', 'is_weekend', 'is_festival']
+# Key of the intraday random stream, after the shard's spawn key (daily years use one element)
+INTRADAY_STREAM = 1
+
+
+def _column(daily, name, default=0):
+    if name in daily:
+        return np.asarray(daily[name])
+    return np.full(len(daily['date']), default)
+
+
+def _chunk_rng(seed, first_day):
+    """Random stream for the daily chunk starting on `first_day`, apart from the daily streams"""
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    day = int(np.datetime64(first_day, 'D').astype(np.int64))
+    return np.random.default_rng(np.random.SeedSequence(
+        seed.entropy, spawn_key=(*seed.spawn_key, INTRADAY_STREAM, day)))
+
+
+def day_shapes(hours, is_open, busy, rng, lead=0.0):
+    """
+    (days x slots) shape at `hours` (slot centres, in hours), max 1 per day.
+    `lead` shifts the curve that many hours earlier.
+    """
+    n = len(is_open)
+    morning = np.where(is_open, np.clip(rng.normal(9.0, 0.8, n), 6, 12), rng.normal(12.5, 1.0, n))
+    morning_width = np.where(is_open, rng.uniform(1.5, 2.5, n), rng.uniform(2.5, 4.0, n))
+    afternoon = np.clip(rng.normal(15.5, 1.0, n), 13, 18)
+    afternoon_width = rng.uniform(1.5, 3.0, n)
+    afternoon_weight = np.where(is_open, rng.uniform(0.3, 0.7, n) + 0.2 * busy, rng.uniform(0.0, 0.2, n))
+
+    t = hours[None, :] + lead
+    shape = (np.exp(-0.5 * ((t - morning[:, None]) / morning_width[:, None]) ** 2)
+             + afternoon_weight[:, None] * np.exp(-0.5 * ((t - afternoon[:, None]) / afternoon_width[:, None]) ** 2)
+             + NIGHT_FLOOR)
+    return shape / shape.max(axis=1, keepdims=True)
+
+
+def solve_exponent(log_shape, ratio):
+    """
+    Per-row k with mean(exp(k * log_shape)) == ratio, by bisection on log k
+    (the mean falls from 1 towards 0 as k grows); clipped to LOG_K_RANGE
+    """
+    low = np.full(len(ratio), LOG_K_RANGE[0])
+    high = np.full(len(ratio), LOG_K_RANGE[1])
+    for _ in range(BISECTION_STEPS):
+        mid = (low + high) / 2
+        too_high = np.exp(np.exp(mid)[:, None] * log_shape).mean(axis=1) > ratio
+        low = np.where(too_high, mid, low)
+        high = np.where(too_high, high, mid)
+    return np.exp((low + high) / 2)
+
+
+def simulate_intraday(daily, minutes=60, rng=None):
+    """
+    Slot columns (dict of arrays) for one temple's consecutive daily rows
+    (dict of arrays or DataFrame with DAILY_COLUMNS; the last three are
+    optional). `minutes` is 60 or 15.
+    """
+    if minutes not in SLOT_MINUTES:
+        raise ValueError(f"minutes must be one of {SLOT_MINUTES}, got {minutes}")
+    rng = np.random.default_rng(rng)
+    per_hour = 60 // minutes
+    slots = 24 * per_hour
+
+    days = np.asarray(daily['date']).astype('datetime64[D]')
+    n = len(days)
+    visitors = _column(daily, 'visitors_today').astype(np.int64)
+    average = _column(daily, 'average_users_last_hour').astype(float)
+    peak = _column(daily, 'peak_hour_users').astype(float)
+    is_open = _column(daily, 'yatra_season', 1).astype(bool)
+    busy = ((_column(daily, 'is_weekend') == 1) | (_column(daily, 'is_festival') == 1)).astype(float)
+
+    # Crowd: shape per slot, rescaled so the hourly means meet peak and average
+    centres = (np.arange(slots) + 0.5) * minutes / 60
+    shape = day_shapes(centres, is_open, busy, rng)
+    hourly_shape = shape.reshape(n, 24, per_hour).mean(axis=2)
+    hourly_shape /= hourly_shape.max(axis=1, keepdims=True)
+    ratio = np.clip(np.divide(average, peak, out=np.ones(n), where=peak > 0), 0, 1)
+    k = solve_exponent(np.log(hourly_shape), ratio)
+    hourly = peak[:, None] * hourly_shape ** k[:, None]
+
+    within_hour = shape ** k[:, None] * rng.lognormal(0, SLOT_NOISE_SIGMA, (n, slots))
+    within_hour = within_hour.reshape(n, 24, per_hour)
+    within_hour /= within_hour.mean(axis=2, keepdims=True)
+    crowd = (hourly[:, :, None] * within_hour).reshape(n, slots)
+
+    # Arrivals: the whole day's visitors over a curve that leads the crowd
+    arrival_curve = day_shapes(centres, is_open, busy, rng, lead=ARRIVAL_LEAD_HOURS) ** k[:, None]
+    arrivals = rng.multinomial(visitors, arrival_curve / arrival_curve.sum(axis=1, keepdims=True))
+
+    offsets = (np.arange(slots) * minutes).astype('timedelta64[m]')
+    timestamps = (days.astype('datetime64[m]')[:, None] + offsets[None, :]).reshape(-1)
+    slot_index = np.tile(np.arange(slots), n)
+    return {
+        'date': np.repeat(days, slots).astype('datetime64[ns]'),
+        'timestamp': timestamps.astype('datetime64[ns]'),
+        'hour': slot_index // per_hour,
+        'slot': slot_index,
+        'arrivals': arrivals.reshape(-1),
+        'users_within_500m': np.rint(crowd).reshape(-1).astype(np.int64),
+    }
+
+
+def iter_intraday(daily_chunks, minutes=60, seed=create_dataset.SEED):
+    """Intraday chunks for a stream of daily chunks (e.g. create_dataset.iter_chunks)"""
+    for daily in daily_chunks:
+        if len(daily['date']) == 0:
+            continue
+        yield simulate_intraday(daily, minutes, _chunk_rng(seed, np.asarray(daily['date'])[0]))
+
+
+def intraday_frame(daily, minutes=60, seed=create_dataset.SEED):
+    """
+    Intraday frame for a daily frame of one temple, processed per calendar
+    year like the streamed output (same rows as iter_intraday over yearly
+    chunks)
+    """
+    years = pd.DatetimeIndex(daily['date']).year
+    chunks = list(iter_intraday((daily[years == year] for year in np.unique(years)), minutes, seed))
+    df = pd.DataFrame({col: np.concatenate([chunk[col] for chunk in chunks]) for col in chunks[0]})
+    return df.astype(INTRADAY_DTYPES)
+
+
+def write_parquet(path, daily_chunks, minutes=60, seed=create_dataset.SEED, chunk_rows=CHUNK_ROWS):
+    """Stream the intraday rows of `daily_chunks` into one Parquet file; returns the row count"""
+    with ChunkedParquetWriter(path, chunk_rows) as writer:
+        for chunk in iter_intraday(daily_chunks, minutes, seed):
+            writer.write(chunk)
+    return writer.rows
+
+
+def hourly_rollup(intraday):
+    """Per-day arrivals total and busiest / average hourly crowd, to compare with the daily fields"""
+    hourly = intraday.groupby(['date', 'hour'])['users_within_500m'].mean()
+    by_day = hourly.groupby(level='date')
+    return pd.DataFrame({
+        'visitors_today': intraday.groupby('date')['arrivals'].sum(),
+        'peak_hour_users': by_day.max(),
+        'average_users_last_hour': by_day.mean(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--daily', default=None, help='Daily CSV / Parquet to split (default: generate one)')
+    parser.add_argument('--start', default=create_dataset.START_DATE)
+    parser.add_argument('--end', default=create_dataset.END_DATE)
+    parser.add_argument('--seed', type=int, default=create_dataset.SEED)
+    parser.add_argument('--minutes', type=int, choices=SLOT_MINUTES, default=60)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Parquet row group size')
+    parser.add_argument('--out', default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    print("="*80)
+    print(f"GENERATING INTRADAY DATASET ({args.minutes}-minute slots)")
+    print("="*80)
+
+    start = time.perf_counter()
+    if args.daily:
+        daily = read_raw(args.daily, DAILY_COLUMNS).sort_values('date')
+        years = daily['date'].dt.year
+        chunks = (daily[years == year] for year in years.unique())
+    else:
+        chunks = create_dataset.iter_chunks(args.start, args.end, args.seed)
+    rows = write_parquet(args.out, chunks, args.minutes, args.seed, args.chunk_rows)
+    seconds = time.perf_counter() - start
+
+    print(f"Records: {rows:,} streamed in {seconds:.2f} s")
+    print(f"\nSaved: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
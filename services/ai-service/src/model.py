@@ -7,396 +7,468 @@ This version adds intelligent rules to handle edge cases:
 2. Applies minimum thresholds for open season
 3. Handles extreme weather conditions
 4. Better boundary detection
+
+Train from services/ai-service (artifacts are written to --out):
+    python src/model.py train [--data ./data/kedarnath_temple_mock_dataset.csv | .parquet] [--out .]
+
+Predict from Python; the artifacts are read once when the Predictor is
+built, so repeated predictions never touch the disk:
+    from model import Predictor
+    predictor = Predictor('.')
+    predictor.predict_one(features)       # dict -> result dict
+    predictor.predict_many(rows)          # list of dicts -> list of result dicts
+
+Importing this module only loads NumPy and src/bundle.py / src/rules.py;
+pandas, scikit-learn and the model libraries are imported by train() and
+by the Predictor for the model kind it loads.
 """
 
-import pandas as pd
+import argparse
+import os
+
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from xgboost import XGBRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.preprocessing import LabelEncoder
-import joblib
-import warnings
-warnings.filterwarnings('ignore')
-
-
-try:
-    df = pd.read_csv('./data/kedarnath_temple_mock_dataset.csv')
-    print("✅ Loaded V2 dataset")
-except:
-    df = pd.read_csv('../data/kedarnath_temple_mock_dataset.csv')
-    print("✅ Loaded V1 dataset")
-
-df['date'] = pd.to_datetime(df['date'])
-df = df.sort_values('date').reset_index(drop=True)
-
-print(f"   Total records: {len(df):,}")
-print(f"   Date range: {df['date'].min().date()} to {df['date'].max().date()}")
-print()
-
-
-# Encode categorical
-categorical_columns = ['weather_condition', 'yatra_phase', 'temple_open_status', 'road_condition']
-label_encoders = {}
-
-for col in categorical_columns:
-    if col in df.columns:
-        le = LabelEncoder()
-        df[col + '_encoded'] = le.fit_transform(df[col].astype(str))
-        label_encoders[col] = le
-
-# Time features
-df['day_of_month'] = df['date'].dt.day
-df['quarter'] = df['date'].dt.quarter
-df['is_month_start'] = (df['date'].dt.day <= 7).astype(int)
-df['is_month_end'] = (df['date'].dt.day >= 24).astype(int)
-
-# Cyclical encoding
-df['month_sin'] = np.sin(2 * np.pi * df['month'] / 12)
-df['month_cos'] = np.cos(2 * np.pi * df['month'] / 12)
-df['day_sin'] = np.sin(2 * np.pi * df['day_of_week'] / 7)
-df['day_cos'] = np.cos(2 * np.pi * df['day_of_week'] / 7)
-df['week_sin'] = np.sin(2 * np.pi * df['week_of_year'] / 52)
-df['week_cos'] = np.cos(2 * np.pi * df['week_of_year'] / 52)
-
-# Weather interactions
-df['temp_humidity_interaction'] = df['temperature_avg'] * df['humidity'] / 100
-df['rainfall_temp'] = df['rainfall'] * df['temperature_avg']
-df['extreme_weather'] = ((df['rainfall'] > 50) | (df['temperature_avg'] < 5)).astype(int)
-
-# Calendar interactions
-df['weekend_festival'] = df['is_weekend'] * df['is_festival']
-df['holiday_weekend'] = df['is_holiday'] * df['is_weekend']
-df['weekend_vacation'] = df['is_weekend'] * df['school_vacation']
-df['peak_weekend'] = df['is_weekend'] * df['yatra_season']
-
-# Season tracking
-df['days_since_season_start'] = 0
-season_changes = df['yatra_season'].ne(df['yatra_season'].shift()).cumsum()
-for season_id in season_changes.unique():
-    mask = season_changes == season_id
-    if mask.sum() > 0:
-        df.loc[mask, 'days_since_season_start'] = range(mask.sum())
-
-# Lag features
-for lag in [1, 2, 3, 7, 14]:
-    df[f'visitors_lag_{lag}'] = df['visitors_today'].shift(lag)
-
-# Rolling features
-for window in [3, 7, 14, 30]:
-    df[f'visitors_rolling_mean_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).mean()
-    df[f'visitors_rolling_std_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).std().fillna(0)
-    df[f'visitors_rolling_max_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).max()
-    df[f'visitors_rolling_min_{window}'] = df['visitors_today'].shift(1).rolling(window=window, min_periods=1).min()
-
-# Trend features
-df['visitor_trend_7d'] = df['visitors_today'].shift(1).rolling(7, min_periods=2).apply(
-    lambda x: np.polyfit(range(len(x)), x, 1)[0] if len(x) > 1 else 0, raw=True
-)
-df['visitor_momentum'] = df['visitors_today'].shift(1) - df['visitors_today'].shift(8)
-
-# EWM features
-df['visitors_ewm_7'] = df['visitors_today'].shift(1).ewm(span=7, adjust=False).mean()
-df['visitors_ewm_30'] = df['visitors_today'].shift(1).ewm(span=30, adjust=False).mean()
-
-# Historical patterns
-df['dow_avg_visitors'] = df.groupby('day_of_week')['visitors_today'].transform(
-    lambda x: x.shift(1).expanding().mean()
-)
-df['month_avg_visitors'] = df.groupby('month')['visitors_today'].transform(
-    lambda x: x.shift(1).expanding().mean()
-)
-
-# External interactions
-df['occupancy_booking_ratio'] = df['hotel_occupancy_rate'] / (df['bus_bookings'] + 1)
-df['demand_pressure'] = (df['google_trends_score'] * df['bus_bookings']) / 1000
-df['festival_within_3days'] = (df['days_to_next_festival'] <= 3).astype(int)
-df['festival_within_week'] = (df['days_to_next_festival'] <= 7).astype(int)
-
-print(f"✅ Feature engineering complete!")
-print(f"   Total features created: {df.shape[1]}")
-print()
-
-print("🎯 STEP 3: Selecting Features...")
-print("-" * 80)
-
-exclude_features = [
-    'date', 'visitors_today', 'next_day_visitors',
-    'visitors_yesterday', 'visitors_last_week', 'visitors_avg_7days', 'visitors_avg_30days',
-    'weather_condition', 'yatra_phase', 'temple_open_status', 'road_condition',
-    'holiday_name', 'festival_name'
-]
-
-feature_columns = [col for col in df.columns if col not in exclude_features]
-feature_columns = [col for col in feature_columns if df[col].dtype in ['int64', 'float64', 'int32', 'float32']]
-
-
-
-
-df_clean = df.dropna(subset=['next_day_visitors'])
-X = df_clean[feature_columns].copy()
-y = df_clean['next_day_visitors'].copy()
-dates = df_clean['date'].copy()
-
-# Store metadata for post-processing
-metadata = df_clean[['yatra_season', 'temple_open_status', 'road_condition', 
-                      'weather_condition', 'month', 'extreme_weather']].copy()
-
-# Fill NaN
-for col in X.columns:
-    if X[col].isna().any():
-        X[col] = X[col].fillna(X[col].median())
-
-# Time-based split
-split_index = int(len(X) * 0.8)
-
-X_train = X[:split_index]
-X_test = X[split_index:]
-y_train = y[:split_index]
-y_test = y[split_index:]
-dates_train = dates[:split_index]
-dates_test = dates[split_index:]
-metadata_test = metadata[split_index:]
-
-models = {
-    'XGBoost': XGBRegressor(
-        n_estimators=200, learning_rate=0.05, max_depth=6,
-        min_child_weight=3, subsample=0.8, colsample_bytree=0.8,
-        reg_alpha=0.1, reg_lambda=1, random_state=42, n_jobs=-1
-    ),
-    'GradientBoosting': GradientBoostingRegressor(
-        n_estimators=150, learning_rate=0.05, max_depth=5,
-        min_samples_split=10, min_samples_leaf=5, subsample=0.8, random_state=42
-    ),
-    'RandomForest': RandomForestRegressor(
-        n_estimators=150, max_depth=15, min_samples_split=10,
-        min_samples_leaf=5, max_features='sqrt', random_state=42, n_jobs=-1
-    )
-}
-
-results = {}
-
-for name, model in models.items():
-    print(f"\n🔹 Training {name}...")
-    model.fit(X_train, y_train)
-    
-    y_pred_train = model.predict(X_train)
-    y_pred_test_raw = model.predict(X_test)
-    
-    # Store raw predictions
-    results[name] = {
-        'model': model,
-        'predictions_raw': y_pred_test_raw.copy()
-    }
+
+from bundle import BUNDLE_FILE, load_bundle, make_predict_fn, missing_row
+from rules import DEFAULT_RULE_PARAMS, METADATA_DEFAULTS, apply_rules, apply_rules_one, rule_names
+
+MODEL_FILE = 'model_visitor_prediction_final.pkl'
+FEATURES_FILE = 'feature_columns_final.pkl'
+ENCODERS_FILE = 'label_encoders_final.pkl'
+
+DATASET = 'kedarnath_temple_mock_dataset'
+DATA_PATHS = ('./data/kedarnath_temple_mock_dataset.csv', '../data/kedarnath_temple_mock_dataset.csv')
 
 
-print("\n" + "="*80)
-print("🔧 STEP 6: Applying Post-Processing Rules...")
-print("="*80)
+# ============================================================================
+# TRAINING
+# ============================================================================
+
+def _env_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def load_dataset(path=None, columns=None):
+    """
+    Raw daily rows (src/schema.py dtypes) sorted by date (by temple, then
+    date, for multi-temple data), from `path` (CSV or Parquet file /
+    directory) or the first of DATA_PATHS that exists. Only `columns` are
+    read, by default the raw dataset columns.
+    """
+    from schema import RAW_COLUMNS, memory_mb, read_raw, sort_raw
+
+    if path is None:
+        path = next((p for p in DATA_PATHS if os.path.exists(p)), DATA_PATHS[-1])
+    df = sort_raw(read_raw(path, columns or RAW_COLUMNS))
+    print(f"✅ Loaded {path} ({memory_mb(df):.2f} MB)")
+
+    print(f"   Total records: {len(df):,}")
+    print(f"   Date range: {df['date'].min().date()} to {df['date'].max().date()}")
+    print()
+    return df
+
+
+def engineer_features(df, store_root=None, dataset=DATASET):
+    """
+    Encoding, calendar/interaction and history features (see src/features.py),
+    cached in the Parquet feature store: only days added since the last run
+    are computed. History features of multi-temple data are built per
+    temple. Returns (features df in date order, label encoders).
+    """
+    from feature_store import FeatureStore
+    from schema import date_order
+
+    feature_store = FeatureStore(store_root or os.getenv('TRINETRA_FEATURE_STORE', './feature_store'))
+    update = feature_store.update(dataset, df)
+    df, label_encoders = feature_store.load(dataset)
+    df = date_order(df)
+    print(f"✅ Feature store: {update['mode']} ({update['rows_added']} new rows, {update['seconds'] * 1000:.1f} ms)")
+
+    print(f"✅ Feature engineering complete!")
+    print(f"   Total features created: {df.shape[1]}")
+    print()
+    return df, label_encoders
+
 
 def apply_post_processing_rules(predictions, metadata_df):
     """
     Apply intelligent rules based on temple status and conditions
-    
-    Rules:
+
+    Rules (first match wins, see src/rules.py for the shared table):
     1. If temple closed (yatra_season=0) → cap at 300 visitors
+       (winter months Dec-Feb → cap at 150 visitors)
     2. If temple open but road closed → cap at 500 visitors
     3. If extreme weather → reduce by 30%
-    4. If temple open and good conditions → minimum 100 visitors
-    5. Winter months (Dec-Feb) and closed → cap at 150 visitors
+    4. If heavy snow/rain → reduce by 40%
+    5. If temple open → minimum 100 visitors
+    6. General floor of 50 visitors
     """
-    processed = predictions.copy()
-    
-    for idx in range(len(processed)):
-        pred = processed[idx]
-        
-        yatra_season = metadata_df.iloc[idx]['yatra_season']
-        temple_status = metadata_df.iloc[idx]['temple_open_status']
-        road_status = metadata_df.iloc[idx]['road_condition']
-        weather = metadata_df.iloc[idx]['weather_condition']
-        month = metadata_df.iloc[idx]['month']
-        extreme = metadata_df.iloc[idx]['extreme_weather']
-        
-        # Rule 1: Temple completely closed
-        if yatra_season == 0:
-            if month in [12, 1, 2]:  # Deep winter
-                processed[idx] = min(pred, 150)
-            else:
-                processed[idx] = min(pred, 300)
-        
-        # Rule 2: Temple open but road closed
-        elif road_status == 'Closed':
-            processed[idx] = min(pred, 500)
-        
-        # Rule 3: Extreme weather
-        elif extreme == 1:
-            processed[idx] = pred * 0.7
-        
-        # Rule 4: Heavy snow/rain
-        elif weather in ['Snowy', 'Heavy Rain']:
-            processed[idx] = pred * 0.6
-        
-        # Rule 5: Temple open - enforce minimum
-        elif yatra_season == 1:
-            processed[idx] = max(pred, 100)
-        
-        # Rule 6: General floor
-        processed[idx] = max(processed[idx], 50)
-    
+    processed, _ = apply_rules(predictions, metadata_df, exclusive=True)
     return processed
 
 
-for name in results.keys():
-    raw_preds = results[name]['predictions_raw']
-    processed_preds = apply_post_processing_rules(raw_preds, metadata_test)
-    results[name]['predictions_processed'] = processed_preds
-    
-    # Calculate metrics
-    mae_raw = mean_absolute_error(y_test, raw_preds)
-    mae_processed = mean_absolute_error(y_test, processed_preds)
-    
-    r2_raw = r2_score(y_test, raw_preds)
-    r2_processed = r2_score(y_test, processed_preds)
-    
-    mape_raw = np.mean(np.abs((y_test - raw_preds) / (y_test + 1))) * 100
-    mape_processed = np.mean(np.abs((y_test - processed_preds) / (y_test + 1))) * 100
-    
-    results[name]['metrics'] = {
-        'mae_raw': mae_raw,
-        'mae_processed': mae_processed,
-        'r2_raw': r2_raw,
-        'r2_processed': r2_processed,
-        'mape_raw': mape_raw,
-        'mape_processed': mape_processed
-    }
+def evaluate(results, y_test, metadata_test):
+    """Add 'predictions_processed' and 'metrics' to each train_candidates result and print the table"""
+    from sklearn.metrics import mean_absolute_error, r2_score
+
+    for name in results.keys():
+        raw_preds = results[name]['predictions_raw']
+        processed_preds = apply_post_processing_rules(raw_preds, metadata_test)
+        results[name]['predictions_processed'] = processed_preds
+
+        results[name]['metrics'] = {
+            'mae_raw': mean_absolute_error(y_test, raw_preds),
+            'mae_processed': mean_absolute_error(y_test, processed_preds),
+            'r2_raw': r2_score(y_test, raw_preds),
+            'r2_processed': r2_score(y_test, processed_preds),
+            'mape_raw': np.mean(np.abs((y_test - raw_preds) / (y_test + 1))) * 100,
+            'mape_processed': np.mean(np.abs((y_test - processed_preds) / (y_test + 1))) * 100,
+        }
+
+    print(f"{'Model':<20} {'MAE raw':<12} {'MAE':<12} {'MAPE %':<12} {'R2':<10} {'train s':<10} {'1-row us':<10}")
+    for name, res in results.items():
+        m = res['metrics']
+        print(f"{name:<20} {m['mae_raw']:<12.2f} {m['mae_processed']:<12.2f} {m['mape_processed']:<12.2f} {m['r2_processed']:<10.4f} "
+              f"{res['fit_seconds']:<10.2f} {res['latency_seconds'] * 1e6:<10.1f}")
+    return results
+
+
+def season_report(y_test, predictions, metadata_test):
+    """Print MAE / MAPE over the open and closed season test days"""
+    from sklearn.metrics import mean_absolute_error
+
+    open_mask = metadata_test['yatra_season'] == 1
+    closed_mask = metadata_test['yatra_season'] == 0
+    if closed_mask.sum() == 0 or open_mask.sum() == 0:
+        return
+
+    for label, mask in (('Open', open_mask), ('Closed', closed_mask)):
+        y_season = y_test[mask]
+        y_pred = predictions[mask]
+        mae = mean_absolute_error(y_season, y_pred)
+        mape = np.mean(np.abs((y_season - y_pred) / (y_season + 1))) * 100
+        print(f"\n{label} Season ({mask.sum()} days):")
+        print(f"   MAE: ±{mae:.2f} visitors")
+        print(f"   MAPE: {mape:.2f}%")
+        print(f"   Avg actual visitors: {y_season.mean():.0f}")
+    print()
+
 
-for name, res in results.items():
-    m = res['metrics']
-    print(f"{name:<20} {m['mae_raw']:<12.2f} {m['mae_processed']:<12.2f} {m['mape_processed']:<12.2f} {m['r2_processed']:<10.4f}")
+def save_artifacts(directory, model, feature_columns, label_encoders, metadata, fill_values=None):
+    """
+    The three training pickles plus the single-file bundle served by the API.
+    `fill_values` (features.fill_values) go in the bundle for serving.
+    """
+    import joblib
+    from bundle import save_bundle
 
+    os.makedirs(directory, exist_ok=True)
+    joblib.dump(model, os.path.join(directory, MODEL_FILE))
+    joblib.dump(feature_columns, os.path.join(directory, FEATURES_FILE))
+    joblib.dump(label_encoders, os.path.join(directory, ENCODERS_FILE))
 
-# Select best model
-best_model_name = min(results, key=lambda x: results[x]['metrics']['mae_processed'])
-best_model = results[best_model_name]['model']
-best_mae = results[best_model_name]['metrics']['mae_processed']
-best_mape = results[best_model_name]['metrics']['mape_processed']
-best_r2 = results[best_model_name]['metrics']['r2_processed']
+    # Single-file bundle (model + schema + encoders + rule params) served by the API
+    bundle_path = os.path.join(directory, BUNDLE_FILE)
+    save_bundle(bundle_path, model, feature_columns, label_encoders, metadata=metadata, fill_values=fill_values)
+    print(f"✅ Saved {bundle_path}")
 
-open_mask = metadata_test['yatra_season'] == 1
-closed_mask = metadata_test['yatra_season'] == 0
 
-if closed_mask.sum() > 0 and open_mask.sum() > 0:
+def train(data_path=None, output_dir='.', tune=None, prune=None, backtest_folds=None, budget=None, timeout=None):
+    """
+    Full training run: features, optional tuning, concurrent candidate
+    training, post-processing rules, selection by processed MAE, optional
+    pruning, and the artifacts written to `output_dir`.
+
+    Options left as None come from the environment: TRINETRA_TUNE,
+    TRINETRA_PRUNE (TRINETRA_PRUNE_METHOD), TRINETRA_BACKTEST_FOLDS,
+    TRINETRA_TRAIN_BUDGET_SECONDS and TRINETRA_CANDIDATE_TIMEOUT_SECONDS.
+    Returns {'model_name', 'model', 'feature_columns', 'metrics', 'results'}.
+    """
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    from features import fill_values, training_frame
+    from training import default_candidates, train_candidates
+
+    if tune is None:
+        tune = os.getenv('TRINETRA_TUNE', '0') == '1'
+    if prune is None:
+        prune = os.getenv('TRINETRA_PRUNE', '0') == '1'
+    if backtest_folds is None:
+        backtest_folds = int(os.getenv('TRINETRA_BACKTEST_FOLDS', '0'))
+    if budget is None:
+        budget = _env_float('TRINETRA_TRAIN_BUDGET_SECONDS')
+    if timeout is None:
+        timeout = _env_float('TRINETRA_CANDIDATE_TIMEOUT_SECONDS')
+
+    df = load_dataset(data_path)
+    raw_columns = set(df.columns)
+    date_range = [str(df['date'].min().date()), str(df['date'].max().date())]
+    df, label_encoders = engineer_features(df)
+
+    print("🎯 STEP 3: Selecting Features...")
+    print("-" * 80)
+
+    X, y, dates, metadata, feature_columns = training_frame(df)
+
+    # Time-based split
+    split_index = int(len(X) * 0.8)
+
+    X_train = X[:split_index]
+    X_test = X[split_index:]
+    y_train = y[:split_index]
+    y_test = y[split_index:]
+    metadata_test = metadata[split_index:]
+
+    # Optional successive-halving search over the training rows only (src/tuning.py)
+    tuned_params = {}
+    if tune:
+        from tuning import tune as tune_candidates
+
+        print("\n🔧 Tuning hyperparameters (successive halving)...")
+        tuned = tune_candidates(X_train, y_train, metadata[:split_index], feature_columns)
+        for name, result in tuned.items():
+            tuned_params[name] = result['params']
+            print(f"   {name:<20} CV MAE {result['score']:.2f} ({result['fits']} fits, {result['cached']} reused)")
+
+    models = default_candidates(tuned_params, feature_columns)
+
+    # Candidates train concurrently in worker processes (see src/training.py)
+    print(f"\n🔹 Training {', '.join(models)}...")
+    results, training_report = train_candidates(models, X_train, y_train, X_test, budget=budget, timeout=timeout)
+    for name, status in training_report.items():
+        detail = f" ({status['error'].strip().splitlines()[-1]})" if 'error' in status else ""
+        print(f"   {name:<20} {status['status']:<10} {status['seconds']:>7.2f}s  n_jobs={status['n_jobs']}{detail}")
+
+    if not results:
+        raise RuntimeError("No candidate finished training within the time budget")
+
+    print("\n" + "="*80)
+    print("🔧 STEP 6: Applying Post-Processing Rules...")
+    print("="*80)
+    evaluate(results, y_test, metadata_test)
+
+    # Optional walk-forward check of the same candidates over many windows (src/backtest.py)
+    if backtest_folds > 0:
+        from backtest import backtest
+
+        _, backtest_summary = backtest(default_candidates(feature_columns=feature_columns), X, y, dates, metadata,
+                                       n_folds=backtest_folds)
+        print(f"\nWalk-forward backtest ({backtest_folds} folds, pooled test days):")
+        for _, row in backtest_summary.iterrows():
+            print(f"{row['model']:<20} {row['mae_processed']:<12.2f} {row['mape_processed']:<12.2f} "
+                  f"open {row['mae_open']:<10.2f} closed {row['mae_closed']:<10.2f}")
+
+    # Select best model
+    best_model_name = min(results, key=lambda x: results[x]['metrics']['mae_processed'])
+    best_model = results[best_model_name]['model']
+    best_metrics = dict(results[best_model_name]['metrics'])
     best_preds = results[best_model_name]['predictions_processed']
-    
-    # Open season
-    y_test_open = y_test[open_mask]
-    y_pred_open = best_preds[open_mask]
-    mae_open = mean_absolute_error(y_test_open, y_pred_open)
-    mape_open = np.mean(np.abs((y_test_open - y_pred_open) / (y_test_open + 1))) * 100
-    
-    # Closed season
-    y_test_closed = y_test[closed_mask]
-    y_pred_closed = best_preds[closed_mask]
-    mae_closed = mean_absolute_error(y_test_closed, y_pred_closed)
-    mape_closed = np.mean(np.abs((y_test_closed - y_pred_closed) / (y_test_closed + 1))) * 100
-    
-    print(f"\nOpen Season ({open_mask.sum()} days):")
-    print(f"   MAE: ±{mae_open:.2f} visitors")
-    print(f"   MAPE: {mape_open:.2f}%")
-    print(f"   Avg actual visitors: {y_test_open.mean():.0f}")
-    
-    print(f"\nClosed Season ({closed_mask.sum()} days):")
-    print(f"   MAE: ±{mae_closed:.2f} visitors")
-    print(f"   MAPE: {mape_closed:.2f}%")
-    print(f"   Avg actual visitors: {y_test_closed.mean():.0f}")
-    print()
 
-print("💾 STEP 9: Saving Models and Artifacts...")
-print("-" * 80)
+    # Optional latency-aware pruning of the winner's features (src/pruning.py)
+    pruning_metadata = None
+    if prune:
+        from pruning import print_report, prune as prune_features
+
+        print(f"\n✂️  Pruning features for {best_model_name}...")
+        pruning_report, pruned = prune_features(best_model, X_train, y_train, metadata[:split_index],
+                                                X_test, y_test, metadata_test, raw_columns,
+                                                method=os.getenv('TRINETRA_PRUNE_METHOD', 'gain'),
+                                                model=best_model)
+        print_report(pruning_report, pruned)
+
+        best_model = pruned['model']
+        feature_columns = pruned['columns']
+        label_encoders = {col: le for col, le in label_encoders.items() if col + '_encoded' in feature_columns}
+        for key in ('mae_processed', 'mape_processed', 'r2_processed'):
+            best_metrics[key] = pruned[key]
+        best_preds = pruned['predictions_processed']
+        pruning_metadata = {
+            'features_before': int(pruning_report['features'].max()),
+            'features': len(feature_columns),
+            'pareto': pruning_report.to_dict(orient='records'),
+        }
+
+    season_report(y_test, best_preds, metadata_test)
+
+    print("💾 STEP 9: Saving Models and Artifacts...")
+    print("-" * 80)
+
+    save_artifacts(output_dir, best_model, feature_columns, label_encoders, metadata={
+        'model_name': best_model_name,
+        'mae_processed': float(best_metrics['mae_processed']),
+        'mape_processed': float(best_metrics['mape_processed']),
+        'r2_processed': float(best_metrics['r2_processed']),
+        'train_rows': int(len(X_train)),
+        'test_rows': int(len(X_test)),
+        'date_range': date_range,
+        'pruning': pruning_metadata,
+    }, fill_values=fill_values(X[feature_columns]))
 
-joblib.dump(best_model, 'model_visitor_prediction_final.pkl')
-joblib.dump(feature_columns, 'feature_columns_final.pkl')
-joblib.dump(label_encoders, 'label_encoders_final.pkl')
+    return {
+        'model_name': best_model_name,
+        'model': best_model,
+        'feature_columns': feature_columns,
+        'metrics': best_metrics,
+        'results': results,
+    }
+
+
+# ============================================================================
+# PREDICTION
+# ============================================================================
+
+def crowd_level(prediction):
+    if prediction < 2000:
+        return "Low"
+    if prediction < 5000:
+        return "Medium"
+    if prediction < 8000:
+        return "High"
+    return "Very High"
+
+
+class Predictor:
+    """
+    Trained artifacts loaded once - the bundle if `directory` has one, else
+    the three pickles - for repeated predictions with the post-processing
+    rules.
+
+    Inputs are dicts of feature values, as posted to the API: fields that
+    are not features are ignored, missing features are 0, None is NaN, and
+    a known category (weather_condition, ...) sets its <col>_encoded column.
+    """
+
+    def __init__(self, directory='.'):
+        self.directory = directory
+        bundle_path = os.path.join(directory, BUNDLE_FILE)
+        if os.path.isfile(bundle_path):
+            bundle = load_bundle(bundle_path)
+            self.model = bundle.model
+            self.feature_columns = list(bundle.feature_columns)
+            self.label_encoders = bundle.label_encoders
+            self.rule_params = bundle.rule_params
+            self.model_name = bundle.metadata.get('model_name', bundle.header['model_class'])
+            self.feature_dtype = bundle.feature_dtype
+            fill_values = bundle.fill_values
+        else:
+            import joblib
+            self.model = joblib.load(os.path.join(directory, MODEL_FILE))
+            self.feature_columns = list(joblib.load(os.path.join(directory, FEATURES_FILE)))
+            encoders_path = os.path.join(directory, ENCODERS_FILE)
+            self.label_encoders = joblib.load(encoders_path) if os.path.isfile(encoders_path) else {}
+            self.rule_params = DEFAULT_RULE_PARAMS
+            self.model_name = type(self.model).__name__
+            self.feature_dtype = np.dtype(np.float32)
+            fill_values = None
+
+        self.missing = missing_row(self.feature_columns, fill_values, self.feature_dtype)
+        self.index = {col: i for i, col in enumerate(self.feature_columns)}
+        self.encoders = []
+        for col, le in self.label_encoders.items():
+            target = self.index.get(col + '_encoded')
+            if target is not None:
+                lookup = {str(cls): float(code) for code, cls in enumerate(le.classes_)}
+                self.encoders.append((col, target, lookup))
+        self._predict = make_predict_fn(self.model)
+
+    def features_matrix(self, rows):
+        """
+        (len(rows), n_features) matrix in training column order and dtype:
+        inputs are rounded the way the training matrix was, so they fall on
+        the same side of every split threshold. Missing features, nulls and
+        strings get the training fill values, as in api/feature_layout.py.
+        """
+        X = np.tile(self.missing, (len(rows), 1))
+        index = self.index
+        for features, row in zip(rows, X):
+            for key, value in features.items():
+                i = index.get(key)
+                if i is not None and value is not None and not isinstance(value, str) and value == value:
+                    row[i] = value
+            for col, target, lookup in self.encoders:
+                value = features.get(col)
+                if value is not None:
+                    code = lookup.get(str(value))
+                    if code is not None:
+                        row[target] = code
+        return X
+
+    def _result(self, prediction_raw, prediction, bitmask):
+        prediction = int(prediction)
+        return {
+            'predicted_visitors': prediction,
+            'prediction_raw': int(prediction_raw),
+            'confidence_interval': (int(prediction * 0.85), int(prediction * 1.15)),
+            'crowd_level': crowd_level(prediction),
+            'rules_applied': rule_names(bitmask),
+            'model_used': self.model_name,
+        }
+
+    def predict_one(self, features):
+        """
+        Prediction for one feature dict. The rules read yatra_season,
+        road_condition, weather_condition, month and extreme_weather from it.
+        """
+        prediction_raw = float(self._predict(self.features_matrix([features]))[0])
+        prediction, bitmask = apply_rules_one(prediction_raw, features, self.rule_params, exclusive=True)
+        return self._result(prediction_raw, prediction, bitmask)
+
+    def predict_many(self, rows):
+        """predict_one over a list of feature dicts, with one model call and the rules applied as arrays"""
+        rows = list(rows)
+        if not rows:
+            return []
+        raw = np.asarray(self._predict(self.features_matrix(rows)), dtype=np.float64)
+        metadata = {name: [features.get(name) for features in rows] for name in METADATA_DEFAULTS}
+        processed, bitmask = apply_rules(raw, metadata, self.rule_params, exclusive=True)
+        return [self._result(r, p, m) for r, p, m in zip(raw, processed, bitmask)]
+
+
+_default_predictor = None
 
 
 def predict_next_day_visitors_with_rules(input_features_dict):
     """
     Production-ready prediction with post-processing rules
-    
+
     Parameters:
     -----------
     input_features_dict : dict
         Must include: yatra_season, temple_open_status, road_condition,
                      weather_condition, month, extreme_weather
-    
+
     Returns:
     --------
-    dict with: predicted_visitors, confidence_interval, crowd_level, 
+    dict with: predicted_visitors, confidence_interval, crowd_level,
                rules_applied, model_used
+
+    Artifacts come from the current directory and are loaded on the first call.
     """
-    model = joblib.load('model_visitor_prediction_final.pkl')
-    features = joblib.load('feature_columns_final.pkl')
-    
-    # Create feature vector
-    feature_vector = [input_features_dict.get(col, 0) for col in features]
-    X = np.array(feature_vector).reshape(1, -1)
-    
-    # Get raw prediction
-    prediction_raw = model.predict(X)[0]
-    
-    # Extract metadata for rules
-    yatra_season = input_features_dict.get('yatra_season', 1)
-    temple_status = input_features_dict.get('temple_open_status_encoded', 0)
-    road_condition = input_features_dict.get('road_condition', 'Good')
-    weather_condition = input_features_dict.get('weather_condition', 'Sunny')
-    month = input_features_dict.get('month', 6)
-    extreme_weather = input_features_dict.get('extreme_weather', 0)
-    
-    # Apply rules
-    prediction = prediction_raw
-    rules_applied = []
-    
-    if yatra_season == 0:
-        if month in [12, 1, 2]:
-            prediction = min(prediction, 150)
-            rules_applied.append("Temple closed (winter) - capped at 150")
-        else:
-            prediction = min(prediction, 300)
-            rules_applied.append("Temple closed - capped at 300")
-    elif road_condition == 'Closed':
-        prediction = min(prediction, 500)
-        rules_applied.append("Road closed - capped at 500")
-    elif extreme_weather == 1:
-        prediction = prediction * 0.7
-        rules_applied.append("Extreme weather - reduced 30%")
-    elif weather_condition in ['Snowy', 'Heavy Rain']:
-        prediction = prediction * 0.6
-        rules_applied.append("Heavy weather - reduced 40%")
-    elif yatra_season == 1:
-        prediction = max(prediction, 100)
-        rules_applied.append("Temple open - minimum 100")
-    
-    prediction = max(int(prediction), 50)
-    
-    # Confidence interval
-    lower = int(prediction * 0.85)
-    upper = int(prediction * 1.15)
-    
-    # Crowd level
-    if prediction < 2000:
-        crowd_level = "Low"
-    elif prediction < 5000:
-        crowd_level = "Medium"
-    elif prediction < 8000:
-        crowd_level = "High"
-    else:
-        crowd_level = "Very High"
-    
-    return {
-        'predicted_visitors': prediction,
-        'prediction_raw': int(prediction_raw),
-        'confidence_interval': (lower, upper),
-        'crowd_level': crowd_level,
-        'rules_applied': rules_applied,
-        'model_used': best_model_name
-    }
\ No newline at end of file
+    global _default_predictor
+    if _default_predictor is None:
+        _default_predictor = Predictor('.')
+    return _default_predictor.predict_one(input_features_dict)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = commands.add_parser('train', help='train the candidates and write the artifacts')
+    train_parser.add_argument('--data', default=None, help=f"raw CSV (default: first of {', '.join(DATA_PATHS)})")
+    train_parser.add_argument('--out', default='.', help='directory for the pickles and the bundle')
+    train_parser.add_argument('--tune', action='store_true', default=None, help='run the hyperparameter search first')
+    train_parser.add_argument('--prune', action='store_true', default=None, help="prune the best model's features")
+    train_parser.add_argument('--backtest-folds', type=int, default=None)
+    train_parser.add_argument('--budget', type=float, default=None, help='wall-clock seconds for all candidates')
+    train_parser.add_argument('--timeout', type=float, default=None, help='seconds per candidate')
+    args = parser.parse_args(argv)
+
+    if args.command == 'train':
+        train(args.data, args.out, tune=args.tune, prune=args.prune, backtest_folds=args.backtest_folds,
+              budget=args.budget, timeout=args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+FEATURE PRUNING
+Latency-aware feature selection for the chosen model.
+
+Features are ranked by importance - the model's own gain importance, or
+permutation importance on the last fifth of the training rows - and the
+same estimator is refitted on the top-k features for a range of k (in
+parallel, src/backtest.py run_tasks). Selection never looks at the test
+rows: each subset is fitted on the first 80% of the training rows and
+scored on:
+
+- processed MAE / MAPE on the last 20% of the training rows, the
+  validation slice (same rules as model.py)
+- single-row inference latency (training.single_row_latency)
+- feature cost: summed features.feature_cost, the history values read per
+  request to compute the kept features
+
+Subsets no other subset beats on all three are the Pareto front. The
+chosen subset is the smallest one whose validation MAE is within
+`tolerance` of the best. It is then refitted on all training rows and
+scored once on the test rows, for reporting only; model.py saves that
+model with the reduced feature list, so the bundle schema, the pickles
+and the API's feature layout all shrink with it.
+
+Run from services/ai-service:
+    python src/pruning.py --data ./data/kedarnath_temple_mock_dataset.csv --model LightGBM
+"""
+
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from backtest import fold_arrays, run_tasks
+from feature_store import load_csv_features
+from features import feature_cost, training_frame
+from rules import apply_rules
+from schema import RAW_COLUMNS, raw_header
+from training import categorical_indices, default_candidates, is_multithreaded, single_row_latency
+
+SUBSET_FRACTIONS = (1.0, 0.75, 0.5, 0.35, 0.25, 0.15, 0.1)
+MIN_FEATURES = 5
+TOLERANCE = 0.01
+# Share of the training rows held out to choose the subset on
+VALIDATION_FRACTION = 0.2
+
+
+def gain_importance(model, feature_columns):
+    """Total gain per feature (impurity decrease for sklearn ensembles)"""
+    if hasattr(model, 'get_booster'):
+        scores = model.get_booster().get_score(importance_type='total_gain')
+        return pd.Series([scores.get(col, 0.0) for col in feature_columns], index=feature_columns)
+    if hasattr(model, 'booster_'):
+        return pd.Series(model.booster_.feature_importance(importance_type='gain'), index=feature_columns)
+    return pd.Series(model.feature_importances_, index=feature_columns)
+
+
+def rank_features(estimator, X_train, y_train, method='gain', model=None, seed=42):
+    """
+    Feature names, most important first. 'gain' uses `model` (already
+    fitted on X_train) if given; 'permutation' refits on the first 80% of
+    the training rows and permutes the last 20%.
+    """
+    feature_columns = list(X_train.columns)
+    if method == 'gain':
+        if model is None:
+            model = clone(estimator).fit(X_train, y_train)
+        importance = gain_importance(model, feature_columns)
+    elif method == 'permutation':
+        split = int(len(X_train) * 0.8)
+        model = clone(estimator).fit(X_train[:split], y_train[:split])
+        result = permutation_importance(model, X_train[split:], y_train[split:], n_repeats=5,
+                                        random_state=seed, scoring='neg_mean_absolute_error')
+        importance = pd.Series(result.importances_mean, index=feature_columns)
+    else:
+        raise ValueError(f"Unknown importance method {method!r}")
+    return list(importance.sort_values(ascending=False, kind='stable').index)
+
+
+def subset_sizes(n_features, fractions=SUBSET_FRACTIONS, min_features=MIN_FEATURES):
+    sizes = {max(min(min_features, n_features), int(round(n_features * f))) for f in fractions}
+    return sorted(sizes, reverse=True)
+
+
+def estimator_for(estimator, columns, single_thread=True):
+    """Unfitted copy of `estimator` for a column subset (categorical positions remapped)"""
+    subset = clone(estimator)
+    if single_thread and is_multithreaded(subset):
+        # Subsets train side by side, one core each
+        subset.set_params(n_jobs=1)
+    if subset.get_params().get('categorical_feature') is not None:
+        subset.set_params(categorical_feature=categorical_indices(columns))
+    return subset
+
+
+def _fit_subset(k, estimator, columns, split_index):
+    X, y = fold_arrays()
+    estimator.fit(X[columns][:split_index], y[:split_index])
+    return k, estimator
+
+
+def pareto_front(costs):
+    """Boolean mask of rows of `costs` (lower is better in every column) no other row dominates"""
+    costs = np.asarray(costs, dtype=float)
+    front = np.ones(len(costs), dtype=bool)
+    for i in range(len(costs)):
+        others = np.delete(costs, i, axis=0)
+        dominated = np.all(others <= costs[i], axis=1) & np.any(others < costs[i], axis=1)
+        front[i] = not dominated.any()
+    return front
+
+
+def processed_scores(model, X, y, metadata):
+    """Processed predictions and their MAE / MAPE / R2 on (X, y)"""
+    processed, _ = apply_rules(model.predict(X), metadata, exclusive=True)
+    return processed, {
+        'mae_processed': mean_absolute_error(y, processed),
+        'mape_processed': np.mean(np.abs((y - processed) / (y + 1))) * 100,
+        'r2_processed': r2_score(y, processed),
+    }
+
+
+def prune(estimator, X_train, y_train, metadata_train, X_test, y_test, metadata_test, raw_columns,
+          method='gain', model=None, sizes=None, tolerance=TOLERANCE, max_workers=None):
+    """
+    Refit `estimator` on top-k feature subsets. Returns (report, chosen):
+    - report: one row per k with validation MAE/MAPE/R2, latency, feature
+      cost and whether the subset is on the Pareto front, largest k first
+    - chosen: the report row of the smallest subset within `tolerance` of
+      the best validation MAE, with 'columns', 'model' (refitted on all
+      training rows) and its test 'predictions_processed' / MAE / MAPE / R2
+    """
+    ranked = rank_features(estimator, X_train, y_train, method, model)
+    sizes = sizes or subset_sizes(len(ranked))
+
+    split = int(len(X_train) * (1 - VALIDATION_FRACTION))
+    X_val, y_val, metadata_val = X_train[split:], y_train[split:], metadata_train[split:]
+    tasks = [(k, estimator_for(estimator, ranked[:k]), ranked[:k], split) for k in sizes]
+    fitted = dict(run_tasks(_fit_subset, tasks, X_train, y_train, max_workers))
+
+    rows = []
+    for k in sizes:
+        columns = ranked[:k]
+        _, scores = processed_scores(fitted[k], X_val[columns], y_val, metadata_val)
+        rows.append({
+            'features': k,
+            **{key.replace('processed', 'validation'): value for key, value in scores.items()},
+            'latency_us': single_row_latency(fitted[k], X_val[columns][:1]) * 1e6,
+            'feature_cost': sum(feature_cost(col, raw_columns) for col in columns),
+        })
+
+    report = pd.DataFrame(rows)
+    report['pareto'] = pareto_front(report[['mae_validation', 'latency_us', 'feature_cost']])
+    best_mae = report['mae_validation'].min()
+    eligible = report[report['mae_validation'] <= best_mae * (1 + tolerance)]
+    choice = eligible.sort_values('features').iloc[0]
+
+    columns = ranked[:int(choice['features'])]
+    final = estimator_for(estimator, columns, single_thread=False).fit(X_train[columns], y_train)
+    processed, scores = processed_scores(final, X_test[columns], y_test, metadata_test)
+    chosen = dict(choice.to_dict(), columns=columns, model=final, predictions_processed=processed, **scores)
+    return report, chosen
+
+
+def print_report(report, chosen):
+    print(f"{'Features':<10} {'Val MAE':<10} {'Val MAPE %':<11} {'1-row us':<10} {'cost':<8} {'Pareto':<8}")
+    for _, row in report.iterrows():
+        mark = ' <- chosen' if row['features'] == chosen['features'] else ''
+        print(f"{int(row['features']):<10} {row['mae_validation']:<10.2f} {row['mape_validation']:<11.2f} "
+              f"{row['latency_us']:<10.1f} {int(row['feature_cost']):<8} {'yes' if row['pareto'] else '':<8}{mark}")
+    print(f"Chosen {int(chosen['features'])} features, refitted on all training rows: "
+          f"test MAE {chosen['mae_processed']:.2f}, MAPE {chosen['mape_processed']:.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/kedarnath_temple_mock_dataset.csv')
+    parser.add_argument('--model', default='LightGBM', help='candidate to prune for')
+    parser.add_argument('--method', default='gain', choices=['gain', 'permutation'])
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None, help='write the Pareto report to this CSV')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    df, _, _ = load_csv_features(args.data)
+    # The raw columns load_csv_features read, as model.py's load_dataset
+    raw_columns = set(raw_header(args.data)) & set(RAW_COLUMNS)
+    X, y, _, metadata, feature_columns = training_frame(df)
+    split_index = int(len(X) * 0.8)
+
+    estimator = default_candidates(feature_columns=feature_columns)[args.model]
+    report, chosen = prune(estimator, X[:split_index], y[:split_index], metadata[:split_index],
+                           X[split_index:], y[split_index:], metadata[split_index:], raw_columns,
+                           args.method, tolerance=args.tolerance, max_workers=args.workers)
+    print_report(report, chosen)
+    if args.out:
+        report.to_csv(args.out, index=False)
+        print(f"\n✅ Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+INCREMENTAL RETRAINING
+Daily XGBoost updates that continue boosting from the deployed model
+instead of refitting every candidate on all history.
+
+Each run is one of:
+- update: load the deployed XGBRegressor and add `update_rounds` trees
+  fitted on the newest `window` days (fit(..., xgb_model=booster)), so the
+  cost depends on the window, not on the length of the history
+- full: fit a fresh XGBoost with the model.py parameters on all history.
+  Runs on schedule (`full_every_days` of data since the last full fit),
+  when the booster would grow past `max_trees`, when the feature schema
+  changed, when the deployed model is not an XGBoost model, or on request
+
+Both hold out the last `validation_days` rows. The candidate is promoted
+only if its processed validation MAE (same rules as model.py) is no worse
+than the deployed model's on those same rows, within `tolerance`. Once
+the gate passes, the same fit is repeated with the holdout rows included
+(the newest days matter most), and that model is written as the same three
+pickles and bundle model.py writes, each to a temp file renamed into
+place, so the API picks it up unchanged and never sees a partial file; a
+rejected candidate leaves them alone.
+Each run's outcome is appended to retrain_state.json next to the artifacts.
+
+Run from services/ai-service (artifacts in the current directory):
+    python src/retrain.py --data ./data/kedarnath_temple_mock_dataset.csv
+    python src/retrain.py --data ./data/kedarnath_temple_mock_dataset.csv --full
+"""
+
+import argparse
+import json
+import os
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+from xgboost import XGBRegressor
+
+from bundle import BUNDLE_FILE, save_bundle
+from feature_store import load_csv_features
+from features import fill_values, training_frame
+from model import ENCODERS_FILE, FEATURES_FILE, MODEL_FILE
+from rules import apply_rules
+from training import default_candidates
+
+warnings.filterwarnings('ignore')
+
+STATE_FILE = 'retrain_state.json'
+
+UPDATE_ROUNDS = 25
+UPDATE_WINDOW_DAYS = 90
+VALIDATION_DAYS = 30
+FULL_EVERY_DAYS = 7
+MAX_TREES = 600
+# Promote when candidate MAE <= deployed MAE * (1 + TOLERANCE)
+TOLERANCE = 0.0
+# Runs kept in retrain_state.json
+HISTORY = 60
+
+
+def read_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def load_deployed(directory):
+    """(model, feature_columns) from the training pickles, or (None, None)"""
+    try:
+        model = joblib.load(os.path.join(directory, MODEL_FILE))
+        feature_columns = joblib.load(os.path.join(directory, FEATURES_FILE))
+    except FileNotFoundError:
+        return None, None
+    return model, list(feature_columns)
+
+
+def full_retrain_reason(state, deployed, deployed_columns, feature_columns, last_date,
+                        full_every_days=FULL_EVERY_DAYS, max_trees=MAX_TREES,
+                        update_rounds=UPDATE_ROUNDS):
+    """Why this run must be a full fit, or None if a warm update is allowed"""
+    if deployed is None:
+        return 'no deployed model'
+    if not isinstance(deployed, XGBRegressor):
+        return f'deployed model is {type(deployed).__name__}'
+    if deployed_columns != feature_columns:
+        return 'feature schema changed'
+    if 'last_full_date' not in state:
+        return 'no recorded full retrain'
+    if (last_date - pd.Timestamp(state['last_full_date'])).days >= full_every_days:
+        return f'scheduled ({full_every_days} days since the last full retrain)'
+    if deployed.get_booster().num_boosted_rounds() + update_rounds > max_trees:
+        return f'booster would exceed {max_trees} trees'
+    return None
+
+
+def fit_candidate(mode, deployed, X, y, update_rounds=UPDATE_ROUNDS, window=UPDATE_WINDOW_DAYS):
+    """A fresh full fit on (X, y), or `update_rounds` trees on its last `window` rows"""
+    if mode == 'update':
+        candidate = XGBRegressor(**dict(deployed.get_params(), n_estimators=update_rounds))
+        return candidate.fit(X[-window:], y[-window:], xgb_model=deployed.get_booster())
+    return default_candidates()['XGBoost'].fit(X, y)
+
+
+def dump_atomic(obj, path):
+    """joblib.dump through a temp file, so readers never load a half-written pickle"""
+    tmp_path = f"{path}.tmp"
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def processed_mae(model, X, y, metadata):
+    raw = model.predict(X)
+    processed, _ = apply_rules(raw, metadata, exclusive=True)
+    return mean_absolute_error(y, processed)
+
+
+def retrain(X, y, dates, metadata, feature_columns, label_encoders, directory='.',
+            full=False, update_rounds=UPDATE_ROUNDS, window=UPDATE_WINDOW_DAYS,
+            validation_days=VALIDATION_DAYS, full_every_days=FULL_EVERY_DAYS,
+            max_trees=MAX_TREES, tolerance=TOLERANCE):
+    """
+    One retraining run against the artifacts in `directory`. Returns the
+    run record also appended to retrain_state.json.
+    """
+    start = time.perf_counter()
+    state = read_state(directory)
+    deployed, deployed_columns = load_deployed(directory)
+    last_date = pd.Timestamp(dates.iloc[-1])
+
+    reason = 'requested' if full else full_retrain_reason(
+        state, deployed, deployed_columns, feature_columns, last_date,
+        full_every_days, max_trees, update_rounds)
+    mode = 'update' if reason is None else 'full'
+
+    split = len(X) - validation_days
+    X_fit, y_fit = X[:split], y[:split]
+    X_val, y_val, metadata_val = X[split:], y[split:], metadata[split:]
+
+    fit_start = time.perf_counter()
+    candidate = fit_candidate(mode, deployed, X_fit, y_fit, update_rounds, window)
+    fit_seconds = time.perf_counter() - fit_start
+
+    candidate_mae = processed_mae(candidate, X_val, y_val, metadata_val)
+    deployed_mae = None
+    if deployed is not None and deployed_columns == feature_columns:
+        deployed_mae = processed_mae(deployed, X_val, y_val, metadata_val)
+    promoted = deployed_mae is None or candidate_mae <= deployed_mae * (1 + tolerance)
+
+    if promoted:
+        # Validated; fit again with the holdout days included before deploying
+        refit_start = time.perf_counter()
+        candidate = fit_candidate(mode, deployed, X, y, update_rounds, window)
+        fit_seconds += time.perf_counter() - refit_start
+
+    trees = candidate.get_booster().num_boosted_rounds()
+    if promoted:
+        dump_atomic(candidate, os.path.join(directory, MODEL_FILE))
+        dump_atomic(feature_columns, os.path.join(directory, FEATURES_FILE))
+        dump_atomic(label_encoders, os.path.join(directory, ENCODERS_FILE))
+        save_bundle(os.path.join(directory, BUNDLE_FILE), candidate, feature_columns, label_encoders, metadata={
+            'model_name': 'XGBoost',
+            'retrain_mode': mode,
+            'trees': trees,
+            'validation_mae_processed': float(candidate_mae),
+            'validation_rows': int(len(X_val)),
+            'train_rows': int(len(X) if mode == 'full' else min(window, len(X))),
+            'date_range': [str(dates.iloc[0].date()), str(last_date.date())],
+        }, fill_values=fill_values(X))
+
+    run = {
+        'date': str(last_date.date()),
+        'mode': mode,
+        'reason': reason,
+        'trees': trees,
+        'fit_seconds': round(fit_seconds, 3),
+        'seconds': round(time.perf_counter() - start, 3),
+        'candidate_mae': float(candidate_mae),
+        'deployed_mae': None if deployed_mae is None else float(deployed_mae),
+        'promoted': promoted,
+    }
+
+    state = dict(state, last_run=run, history=(state.get('history', []) + [run])[-HISTORY:])
+    if promoted and mode == 'full':
+        state['last_full_date'] = run['date']
+    tmp_path = os.path.join(directory, STATE_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, STATE_FILE))
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/kedarnath_temple_mock_dataset.csv')
+    parser.add_argument('--models-dir', default='.')
+    parser.add_argument('--full', action='store_true', help='force a full retrain')
+    parser.add_argument('--update-rounds', type=int, default=UPDATE_ROUNDS)
+    parser.add_argument('--window', type=int, default=UPDATE_WINDOW_DAYS, help='days boosted on in an update')
+    parser.add_argument('--validation-days', type=int, default=VALIDATION_DAYS)
+    parser.add_argument('--full-every-days', type=int, default=FULL_EVERY_DAYS)
+    parser.add_argument('--max-trees', type=int, default=MAX_TREES)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    df, label_encoders, update = load_csv_features(args.data)
+    X, y, dates, metadata, feature_columns = training_frame(df)
+
+    run = retrain(
+        X, y, dates, metadata, feature_columns, label_encoders, args.models_dir,
+        full=args.full, update_rounds=args.update_rounds, window=args.window,
+        validation_days=args.validation_days, full_every_days=args.full_every_days,
+        max_trees=args.max_trees, tolerance=args.tolerance,
+    )
+
+    deployed = 'n/a' if run['deployed_mae'] is None else f"{run['deployed_mae']:.2f}"
+    print(f"✅ Features: {update['mode']} ({update['rows_added']} new rows)")
+    print(f"🔹 {run['mode']} retrain{'' if run['reason'] is None else ' (' + run['reason'] + ')'}: "
+          f"{run['trees']} trees, fit {run['fit_seconds']:.2f}s, total {run['seconds']:.2f}s")
+    print(f"   Validation MAE (processed): candidate {run['candidate_mae']:.2f}, deployed {deployed}")
+    print(f"{'✅ Promoted' if run['promoted'] else '⚠️  Kept the deployed model'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+POST-PROCESSING RULES ENGINE
+Shared by training evaluation (src/model.py) and serving (api/main.py).
+
+The rules are a declarative table applied with NumPy masks over whole
+prediction arrays, in table order. Two evaluation modes exist because the
+two call sites historically differed:
+
+    cumulative (serving)   every matching rule is applied in turn
+    exclusive  (training)  only the first matching rule applies (if/elif)
+
+Both modes finish with the global floor. Alongside the processed
+predictions, apply_rules returns a per-row bitmask of the rules that fired
+(bit i = RULES[i]); rule_names() turns a mask back into names.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Default rule parameters; a model bundle can carry its own copy
+DEFAULT_RULE_PARAMS = {
+    "winter_months": [12, 1, 2],
+    "winter_closure_cap": 150,
+    "closure_cap": 300,
+    "road_closure_cap": 500,
+    "extreme_weather_multiplier": 0.7,
+    "severe_weather_multiplier": 0.6,
+    "severe_weather_conditions": ["Snowy", "Heavy Rain"],
+    "open_season_floor": 100,
+    "global_floor": 50,
+}
+
+# Metadata values assumed when a field is missing
+METADATA_DEFAULTS = {
+    "yatra_season": 1,
+    "road_condition": "Good",
+    "weather_condition": "Clear",
+    "month": 6,
+    "extreme_weather": 0,
+}
+
+Rule = namedtuple("Rule", ["name", "condition", "action", "param"])
+
+
+class Codes:
+    """String column as integer codes + categories, so tests run per category"""
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = np.asarray(categories, dtype=object)
+
+    def isin(self, targets):
+        return np.isin(self.categories, list(targets))[self.codes]
+
+
+def isin(values, targets):
+    """Membership test for a Codes column, a numeric array or a scalar"""
+    if isinstance(values, Codes):
+        return values.isin(targets)
+    if np.ndim(values) == 0:
+        return values in targets
+    return np.isin(values, targets)
+
+
+def _closed(m, p):
+    return isin(m["yatra_season"], [0])
+
+
+def _winter(m, p):
+    return isin(m["month"], p["winter_months"])
+
+
+RULES = (
+    Rule("Winter closure cap",
+         lambda m, p: np.logical_and(_closed(m, p), _winter(m, p)), "cap", "winter_closure_cap"),
+    Rule("Regular closure cap",
+         lambda m, p: np.logical_and(_closed(m, p), np.logical_not(_winter(m, p))), "cap", "closure_cap"),
+    Rule("Road closure cap",
+         lambda m, p: isin(m["road_condition"], ["Closed"]), "cap", "road_closure_cap"),
+    Rule("Extreme weather reduction",
+         lambda m, p: isin(m["extreme_weather"], [1]), "multiply", "extreme_weather_multiplier"),
+    Rule("Severe weather reduction",
+         lambda m, p: isin(m["weather_condition"], p["severe_weather_conditions"]), "multiply", "severe_weather_multiplier"),
+    Rule("Minimum visitors floor",
+         lambda m, p: isin(m["yatra_season"], [1]), "floor", "open_season_floor"),
+)
+
+RULE_BITS = {rule.name: 1 << i for i, rule in enumerate(RULES)}
+
+
+def _column(metadata, name, n):
+    """Metadata column as N values with missing entries defaulted (Codes for strings)"""
+    default = METADATA_DEFAULTS[name]
+    is_text = isinstance(default, str)
+    values = metadata.get(name)
+
+    if values is None:
+        if is_text:
+            return Codes(np.zeros(n, dtype=np.intp), [default])
+        return np.full(n, default, dtype=np.float64)
+
+    # Imported here so the single-row path (apply_rules_one) never loads pandas
+    import pandas as pd
+
+    if is_text:
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            # Already coded: NaN (-1) maps to an extra default category
+            codes = values.cat.codes.to_numpy().astype(np.intp)
+            categories = list(values.cat.categories) + [default]
+            codes[codes < 0] = len(categories) - 1
+            return Codes(codes, categories)
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object).reshape(-1), use_na_sentinel=True)
+        categories = list(uniques) + [default]
+        codes[codes < 0] = len(categories) - 1
+        return Codes(codes, categories)
+
+    values = pd.to_numeric(pd.Series(np.asarray(values).reshape(-1)), errors="coerce")
+    return values.fillna(default).to_numpy(dtype=np.float64)
+
+
+def apply_rules(predictions, metadata, params=None, exclusive=False):
+    """
+    Apply the rules table to an array of raw predictions.
+
+    Parameters:
+    -----------
+    predictions : array-like of N raw predictions
+    metadata    : DataFrame or dict of column -> N values with any of
+                  yatra_season, month, road_condition, weather_condition,
+                  extreme_weather (missing columns use METADATA_DEFAULTS)
+    params      : rule parameters (defaults to DEFAULT_RULE_PARAMS)
+    exclusive   : first matching rule only (training) instead of all (serving)
+
+    Returns:
+    --------
+    (processed float64 array, uint8 bitmask array of rules applied)
+    """
+    params = params or DEFAULT_RULE_PARAMS
+    processed = np.array(predictions, dtype=np.float64, copy=True).reshape(-1)
+    n = len(processed)
+    meta = {name: _column(metadata, name, n) for name in METADATA_DEFAULTS}
+
+    bitmask = np.zeros(n, dtype=np.uint8)
+    unmatched = np.ones(n, dtype=bool) if exclusive else None
+
+    for bit, rule in enumerate(RULES):
+        mask = np.asarray(rule.condition(meta, params), dtype=bool)
+        if exclusive:
+            mask &= unmatched
+            unmatched &= ~mask
+        if not mask.any():
+            continue
+
+        value = params[rule.param]
+        if rule.action == "cap":
+            np.putmask(processed, mask & (processed > value), value)
+        elif rule.action == "multiply":
+            processed *= np.where(mask, value, 1.0)
+        elif rule.action == "floor":
+            np.putmask(processed, mask & (processed < value), value)
+        bitmask |= mask.view(np.uint8) << bit
+
+    np.maximum(processed, params["global_floor"], out=processed)
+    return processed, bitmask
+
+
+def apply_rules_one(prediction, metadata, params=None, exclusive=False):
+    """
+    Same table and semantics as apply_rules for a single prediction with a
+    dict of scalar metadata, without array overhead (single-row serving path).
+    Returns (processed float, bitmask int).
+    """
+    params = params or DEFAULT_RULE_PARAMS
+    meta = {}
+    for name, default in METADATA_DEFAULTS.items():
+        value = metadata.get(name)
+        meta[name] = default if value is None or value != value else value
+
+    processed = float(prediction)
+    bitmask = 0
+    for bit, rule in enumerate(RULES):
+        if not rule.condition(meta, params):
+            continue
+        value = params[rule.param]
+        if rule.action == "cap":
+            processed = min(processed, value)
+        elif rule.action == "multiply":
+            processed = processed * value
+        elif rule.action == "floor":
+            processed = max(processed, value)
+        bitmask |= 1 << bit
+        if exclusive:
+            break
+
+    return max(processed, params["global_floor"]), bitmask
+
+
+def rule_names(mask):
+    """Names of the rules set in one row's bitmask, in table order"""
+    mask = int(mask)
+    return [rule.name for i, rule in enumerate(RULES) if mask & (1 << i)]
@@ -0,0 +1,207 @@
+"""
+DATA SCHEMA
+Compact dtypes for the raw daily data and the engineered features.
+
+Pandas defaults every CSV column to float64 / int64 / object, and the
+text columns (weather_condition, holiday_name, festival_name, ...) repeat
+the same few strings on every row. RAW_DTYPES pins each raw column to the
+smallest type that holds it:
+
+    measurements, rates, next_day_visitors   float32
+    flags, calendar parts, small scores       int8 / int16
+    visitor and user counts                   int32
+    text columns                              category
+
+An integer column with missing values in a file is kept as float32 (NaN)
+instead: NumPy integers have no NaN, and training fills NaN inputs with
+the column median anyway.
+
+Feature building still computes in float64 (history sums over many
+temple-years need it) and compact() then stores the results as float32 /
+small ints, so the feature store, training frames and the contiguous
+float32 matrices fed to the models are all about half the size or less.
+
+    from schema import read_raw
+    df = read_raw('./data/kedarnath_temple_mock_dataset.csv')
+
+read_raw also reads Parquet files and (hive-partitioned) Parquet
+directories, e.g. the output of create_dataset.py / generate_temples.py,
+reading only the requested columns from disk.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = ['weather_condition', 'holiday_name', 'festival_name', 'yatra_phase',
+                    'temple_open_status', 'road_condition', 'temple_id']
+
+RAW_DTYPES = {
+    'day_of_week': 'int8',
+    'month': 'int8',
+    'is_weekend': 'int8',
+    'week_of_year': 'int8',
+    'temperature_max': 'float32',
+    'temperature_min': 'float32',
+    'temperature_avg': 'float32',
+    'rainfall': 'float32',
+    'humidity': 'float32',
+    'is_holiday': 'int8',
+    'is_festival': 'int8',
+    'is_long_weekend': 'int8',
+    'days_to_next_festival': 'int16',
+    'school_vacation': 'int8',
+    'yatra_season': 'int8',
+    'helicopter_service_available': 'int8',
+    'visitors_yesterday': 'int32',
+    'visitors_last_week': 'int32',
+    'visitors_avg_7days': 'int32',
+    'visitors_avg_30days': 'int32',
+    'active_users_within_500m': 'int32',
+    'average_users_last_hour': 'int32',
+    'peak_hour_users': 'int32',
+    'google_trends_score': 'int16',
+    'bus_bookings': 'int32',
+    'hotel_occupancy_rate': 'float32',
+    'parking_utilization': 'float32',
+    'visitors_today': 'int32',
+    # NaN on the last day of a series
+    'next_day_visitors': 'float32',
+    **{col: 'category' for col in CATEGORY_COLUMNS},
+}
+
+# Slot columns of src/intraday.py (plus the date)
+INTRADAY_DTYPES = {
+    'hour': 'int8',
+    'slot': 'int16',
+    'arrivals': 'int32',
+    'users_within_500m': 'int32',
+}
+
+# Every column of a raw daily dataset, for loaders that should skip anything else
+RAW_COLUMNS = ['date', *RAW_DTYPES]
+
+
+def raw_dtypes(df):
+    """RAW_DTYPES for the columns df has; integer columns with missing values become float32"""
+    return {
+        col: 'float32' if dtype.startswith('int') and df[col].isna().any() else dtype
+        for col, dtype in RAW_DTYPES.items() if col in df.columns
+    }
+
+
+def is_parquet(path):
+    return path.endswith('.parquet') or os.path.isdir(path)
+
+
+def raw_header(path):
+    """Column names of a raw CSV or Parquet dataset, without reading its rows"""
+    if is_parquet(path):
+        import pyarrow.dataset as ds
+
+        return ds.dataset(path, format='parquet', partitioning='hive').schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_raw(path, columns=None):
+    """
+    Raw daily rows with RAW_DTYPES and a parsed date, optionally only
+    `columns`, from a CSV file or a Parquet file / directory
+    """
+    if is_parquet(path):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        header = dataset.schema.names
+        usecols = header if columns is None else [col for col in header if col in set(columns)]
+        df = apply_raw_dtypes(dataset.to_table(columns=usecols).to_pandas())
+        # Row groups each carry their own dictionary; sort the merged categories like read_csv does
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+        return df
+
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = list(header) if columns is None else [col for col in header if col in set(columns)]
+    # Integers are read as float64 first so a missing value does not fail the read
+    dtypes = {col: 'float64' if dtype.startswith('int') else dtype
+              for col, dtype in RAW_DTYPES.items() if col in usecols}
+    df = pd.read_csv(path, usecols=usecols, dtype=dtypes, parse_dates=['date'] if 'date' in usecols else False)
+    return df.astype(raw_dtypes(df))
+
+
+def sort_raw(df):
+    """
+    Raw rows in series order for feature building: by date, or by
+    temple_id then date for multi-temple data (generate_temples.py), so
+    each temple's days are contiguous for build_features(by='temple_id')
+    """
+    keys = ['temple_id', 'date'] if 'temple_id' in df.columns else ['date']
+    return df.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def date_order(df):
+    """Rows by date, temples interleaved within a day, for time-based splits"""
+    if 'temple_id' not in df.columns:
+        return df
+    return df.sort_values(['date', 'temple_id'], kind='stable').reset_index(drop=True)
+
+
+def apply_raw_dtypes(df):
+    """Cast the raw columns of an in-memory frame (e.g. a generated one) to RAW_DTYPES (see raw_dtypes)"""
+    df = df.astype(raw_dtypes(df))
+    if 'date' in df.columns and not pd.api.types.is_datetime64_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def compact(df):
+    """
+    Downcast engineered columns in place: float64 -> float32, wider
+    integers -> int16 where the values fit (flags, calendar parts, label
+    codes, day counters), object -> category. The date and the raw columns
+    keep their RAW_DTYPES, so appended rows never outgrow a type chosen
+    from the first build's values. Returns df.
+    """
+    int16 = np.iinfo(np.int16)
+    for col in df.columns:
+        if col == 'date' or col in RAW_DTYPES:
+            continue
+        values = df[col]
+        if values.dtype == np.float64:
+            df[col] = values.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(values.dtype) and values.dtype.itemsize > 2:
+            if len(values) == 0 or (values.min() >= int16.min and values.max() <= int16.max):
+                df[col] = values.astype(np.int16)
+        elif values.dtype == object:
+            df[col] = values.astype('category')
+    return df
+
+
+def feature_matrix(X):
+    """C-contiguous float32 matrix of a feature frame or array"""
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def arrow_schema(columns):
+    """
+    Arrow schema for raw or intraday `columns`: RAW_DTYPES / INTRADAY_DTYPES,
+    dictionary-encoded text, nanosecond dates and timestamps
+    """
+    import pyarrow as pa
+
+    types = {'category': pa.dictionary(pa.int32(), pa.string())}
+    fields = []
+    for col in columns:
+        if col in ('date', 'timestamp'):
+            fields.append((col, pa.timestamp('ns')))
+        else:
+            dtype = RAW_DTYPES.get(col) or INTRADAY_DTYPES.get(col, 'float64')
+            fields.append((col, types.get(dtype) or pa.from_numpy_dtype(np.dtype(dtype))))
+    return pa.schema(fields)
+
+
+def memory_mb(df):
+    """Deep memory use of a frame in MB"""
+    return df.memory_usage(deep=True).sum() / 1e6
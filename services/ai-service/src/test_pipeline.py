@@ -1,18 +1,31 @@
 """
 COMPLETE TESTING PIPELINE
-Run this after generating data and training the model
+Generates the dataset and trains the model when they are missing, then
+checks the data, a sample prediction and draws the analysis plots.
+
+Run from the directory holding (or to hold) the dataset and artifacts:
+    python src/test_pipeline.py
 
 Steps:
-1. Generate optimal dataset
-2. Train improved model
-3. Test predictions
-4. Visualize results
+1. Generate dataset (src/create_dataset.py)
+2. Validate dataset
+3. Train model (src/model.py train)
+4. Test predictions
+5. Check served history features against training (warm-up included)
+6. Visualize results
+
+For timings and regression checks see benchmarks/bench_suite.py.
 """
 
 import subprocess
 import sys
 import os
 
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SRC_DIR)
+
+DATASET_FILE = 'kedarnath_temple_mock_dataset.csv'
+
 print("="*80)
 print("🧪 MANDIR PRAHARI - COMPLETE TESTING PIPELINE")
 print("="*80)
@@ -22,18 +35,16 @@ print()
 # STEP 1: Generate Optimal Dataset
 # ============================================================================
 
-print("STEP 1: Generating Optimal Dataset...")
+print("STEP 1: Generating Dataset...")
 print("-"*80)
 
 # Check if dataset already exists
-if os.path.exists('kedarnath_temple_mock_dataset.csv'):
+if os.path.exists(DATASET_FILE):
     print("⚠️  Dataset already exists. Skipping generation.")
     print("   Delete the file if you want to regenerate.")
 else:
     print("🔄 Running data generation script...")
-    # You would run: python optimal_data_generator.py
-    print("   Please run the optimal data generator script first!")
-    print("   Command: python optimal_data_generator.py")
+    subprocess.run([sys.executable, os.path.join(SRC_DIR, 'create_dataset.py'), '--out', DATASET_FILE], check=True)
 print()
 
 # ============================================================================
@@ -47,7 +58,7 @@ import pandas as pd
 import numpy as np
 
 try:
-    df = pd.read_csv('kedarnath_temple_mock_dataset.csv')
+    df = pd.read_csv(DATASET_FILE)
     
     print(f"✅ Dataset loaded: {len(df):,} records")
     print(f"   Date range: {df['date'].min()} to {df['date'].max()}")
@@ -87,8 +98,8 @@ try:
     print()
     
 except FileNotFoundError:
-    print("❌ Dataset not found! Please run optimal data generator first.")
-    print("   Command: python optimal_data_generator.py")
+    print("❌ Dataset not found! Please run the data generator first.")
+    print(f"   Command: python src/create_dataset.py --out {DATASET_FILE}")
     sys.exit(1)
 
 # ============================================================================
@@ -97,8 +108,16 @@ except FileNotFoundError:
 
 print("STEP 3: Testing Model Training...")
 print("-"*80)
-print("   This will be done by running the improved model script")
-print("   Command: python improved_visitor_model.py")
+
+from model import BUNDLE_FILE, MODEL_FILE, Predictor
+
+if os.path.exists(BUNDLE_FILE) or os.path.exists(MODEL_FILE):
+    print("⚠️  Trained artifacts already exist. Skipping training.")
+    print(f"   Delete {BUNDLE_FILE} / {MODEL_FILE} to retrain.")
+else:
+    print("🔄 Running training...")
+    subprocess.run([sys.executable, os.path.join(SRC_DIR, 'model.py'), 'train', '--data', DATASET_FILE, '--out', '.'],
+                   check=True)
 print()
 
 # ============================================================================
@@ -109,56 +128,101 @@ print("STEP 4: Testing Prediction Function...")
 print("-"*80)
 
 try:
-    import joblib
-    
-    # Load artifacts
-    model = joblib.load('model_visitor_prediction_best.pkl')
-    features = joblib.load('feature_columns_v2.pkl')
-    
-    print(f"✅ Model loaded successfully")
-    print(f"   Features required: {len(features)}")
+    from features import build_features
+
+    # Bundle written by training (falls back to the pickles)
+    predictor = Predictor('.')
+
+    print(f"✅ Model loaded successfully ({predictor.model_name})")
+    print(f"   Features required: {len(predictor.feature_columns)}")
     print()
-    
+
     # Create a sample prediction input
     print("🧪 Sample Prediction Test:")
     print("-"*40)
-    
-    # Get a sample from the dataset
-    sample_row = df.iloc[-10]  # Use a recent day
-    
-    # Create input dict (only include features, not targets)
-    input_dict = {}
-    for col in features:
-        if col in sample_row.index:
-            input_dict[col] = sample_row[col]
-        else:
-            input_dict[col] = 0
-    
+
+    # Features for a recent day, built the way training builds them
+    features, _ = build_features(df.assign(date=pd.to_datetime(df['date'])).copy(),
+                                 label_encoders=predictor.label_encoders)
+    sample_row = features.iloc[-10]
+
     # Make prediction
-    prediction = model.predict(pd.DataFrame([input_dict]))[0]
-    prediction = max(int(prediction), 0)
-    
+    result = predictor.predict_one(sample_row.to_dict())
+    prediction = result['predicted_visitors']
+
     actual = sample_row['next_day_visitors']
     error = abs(prediction - actual)
     error_pct = (error / actual) * 100
-    
-    print(f"   Date: {sample_row['date']}")
+
+    print(f"   Date: {sample_row['date'].date()}")
     print(f"   Predicted: {prediction:,} visitors")
     print(f"   Actual: {actual:,.0f} visitors")
     print(f"   Error: ±{error:,.0f} ({error_pct:.1f}%)")
+    print(f"   Rules applied: {', '.join(result['rules_applied']) or 'none'}")
     print(f"   Status: {'✅ Good' if error_pct < 20 else '⚠️ Fair' if error_pct < 30 else '❌ Poor'}")
     print()
-    
+
 except FileNotFoundError:
-    print("⚠️  Model not trained yet. Please run improved model script first.")
-    print("   Command: python improved_visitor_model.py")
+    print("⚠️  Model not trained yet. Please run training first.")
+    print(f"   Command: python src/model.py train --data {DATASET_FILE} --out .")
     print()
 
 # ============================================================================
-# STEP 5: Visualizations
+# STEP 5: Served Feature Parity
+# ============================================================================
+
+print("STEP 5: Checking Served Feature Parity...")
+print("-"*80)
+
+import math
+
+from feature_state import TempleFeatureState
+from features import build_features
+
+# The first days cover the warm-up, where windows and lags are still filling
+PARITY_DAYS = 60
+
+parity_df = df.iloc[:PARITY_DAYS].assign(date=pd.to_datetime(df['date'].iloc[:PARITY_DAYS]))
+expected, _ = build_features(parity_df.copy())
+state = TempleFeatureState()
+mismatches = {}
+for i, record in enumerate(parity_df.to_dict('records')):
+    state.observe(record)
+    for name, served in state.history_features(state.today_date).items():
+        trained = float(expected[name].iloc[i])
+        if math.isnan(served) != math.isnan(trained) or (
+                not math.isnan(trained) and abs(served - trained) > 1e-3 * max(1.0, abs(trained))):
+            mismatches.setdefault(name, []).append(i)
+
+if mismatches:
+    print(f"❌ Served history features differ from training over the first {PARITY_DAYS} days:")
+    for name, days in mismatches.items():
+        print(f"   {name}: days {days[:10]}")
+    sys.exit(1)
+print(f"✅ Served history features match training over the first {PARITY_DAYS} days")
+
+# Missing raw inputs: NaN arithmetic and false flags, as in training
+from feature_state import derive_row_features
+
+gaps_df = parity_df.iloc[:7].assign(temperature_avg=np.nan, humidity=np.nan)
+expected, _ = build_features(gaps_df.copy())
+for i, record in enumerate(gaps_df.to_dict('records')):
+    record = {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in record.items()}
+    row = derive_row_features(record)
+    for name in ('extreme_weather', 'temp_humidity_interaction', 'rainfall_temp'):
+        trained = float(expected[name].iloc[i])
+        served = math.nan if row[name] is None else float(row[name])
+        if math.isnan(served) != math.isnan(trained) or (not math.isnan(trained) and served != trained):
+            print(f"❌ {name} differs from training for a row without temperature/humidity: {served} vs {trained}")
+            sys.exit(1)
+print("✅ Served row features treat missing inputs as training does")
+print()
+
+# ============================================================================
+# STEP 6: Visualizations
 # ============================================================================
 
-print("STEP 5: Creating Visualizations...")
+print("STEP 6: Creating Visualizations...")
 print("-"*80)
 
 try:
@@ -223,11 +287,12 @@ print("   1. Dataset validation")
 print("   2. Data quality checks")
 print("   3. Model testing (if trained)")
 print("   4. Sample predictions")
-print("   5. Visualizations")
+print("   5. Served feature parity")
+print("   6. Visualizations")
 print()
 print("📌 Next Steps:")
-print("   1. If model not trained yet:")
-print("      → Run: python improved_visitor_model.py")
+print("   1. To retrain:")
+print(f"      → Run: python src/model.py train --data {DATASET_FILE} --out .")
 print()
 print("   2. For production deployment:")
 print("      → Create REST API wrapper")
@@ -0,0 +1,281 @@
+"""
+TRAINING ORCHESTRATOR
+Fits candidate models concurrently, each in its own worker process.
+
+- Cores are shared out before anything starts: estimators without an
+  n_jobs parameter (GradientBoosting) take one core each, and the rest
+  are split evenly between the multi-threaded ones (XGBoost, RandomForest,
+  LightGBM) through set_params(n_jobs=...), so concurrent fits do not
+  oversubscribe.
+- `budget` is a wall-clock limit for the whole run and `timeout` an
+  optional limit per candidate. A candidate still running when either
+  runs out has its process terminated and is reported as "timeout".
+  Candidates that never got a worker before the budget ran out are
+  reported as "cancelled".
+- Each worker fits on the training rows and predicts the test rows, and
+  sends back (model, raw predictions), which is all model.py needs to apply
+  the rules and pick the best candidate by processed MAE.
+
+Workers start from a forkserver rather than a plain fork of this process.
+XGBoost, LightGBM and sklearn start OpenMP thread pools on first use, and
+a child forked from a process that has them can deadlock on Linux; the
+forkserver is a fresh interpreter that never fits or predicts, so its
+children start without any. The training frames are pickled to each
+worker in exchange, and scripts calling train_candidates need the usual
+`if __name__ == '__main__':` guard. Where forkserver is unavailable
+(Windows), candidates train one after another in this process with no
+time limits.
+"""
+
+import multiprocessing as mp
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+
+import numpy as np
+from lightgbm import LGBMRegressor
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from xgboost import XGBRegressor
+
+from bundle import make_predict_fn
+
+# Not 'fork': see the module docstring
+START_METHOD = 'forkserver'
+
+DEFAULT_PARAMS = {
+    'XGBoost': dict(
+        n_estimators=200, learning_rate=0.05, max_depth=6,
+        min_child_weight=3, subsample=0.8, colsample_bytree=0.8,
+        reg_alpha=0.1, reg_lambda=1, random_state=42, n_jobs=-1
+    ),
+    'GradientBoosting': dict(
+        n_estimators=150, learning_rate=0.05, max_depth=5,
+        min_samples_split=10, min_samples_leaf=5, subsample=0.8, random_state=42
+    ),
+    'RandomForest': dict(
+        n_estimators=150, max_depth=15, min_samples_split=10,
+        min_samples_leaf=5, max_features='sqrt', random_state=42, n_jobs=-1
+    ),
+    # Histogram-binned leaf-wise boosting; the *_encoded columns are split
+    # as native categoricals (see default_candidates)
+    'LightGBM': dict(
+        n_estimators=300, learning_rate=0.05, num_leaves=31, max_bin=255,
+        min_child_samples=10, subsample=0.8, subsample_freq=1, colsample_bytree=0.8,
+        reg_alpha=0.1, reg_lambda=1, random_state=42, n_jobs=-1, verbose=-1
+    ),
+}
+
+ESTIMATORS = {
+    'XGBoost': XGBRegressor,
+    'GradientBoosting': GradientBoostingRegressor,
+    'RandomForest': RandomForestRegressor,
+    'LightGBM': LGBMRegressor,
+}
+
+
+def categorical_indices(feature_columns):
+    """Positions of the label-encoded categorical columns"""
+    return [i for i, col in enumerate(feature_columns) if col.endswith('_encoded')]
+
+
+def default_candidates(params=None, feature_columns=None):
+    """
+    {name: unfitted estimator} for the models model.py compares, with
+    `params` ({name: {param: value}}, e.g. from src/tuning.py) overriding
+    the defaults. With `feature_columns`, LightGBM treats the *_encoded
+    columns as categorical; by position, so it works on arrays as well as
+    frames.
+    """
+    params = params or {}
+    candidates = {
+        name: ESTIMATORS[name](**dict(defaults, **params.get(name, {})))
+        for name, defaults in DEFAULT_PARAMS.items()
+    }
+    if feature_columns is not None:
+        candidates['LightGBM'].set_params(categorical_feature=categorical_indices(feature_columns))
+    return candidates
+
+
+def available_cores():
+    """CPUs this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def is_multithreaded(estimator):
+    return 'n_jobs' in estimator.get_params()
+
+
+def allocate_jobs(estimators, cores=None):
+    """
+    {name: n_jobs} for estimators that will run at the same time. Each
+    single-threaded estimator counts as one core; the remaining cores are
+    divided between the multi-threaded ones (at least one each).
+    """
+    cores = cores or available_cores()
+    parallel = [name for name, est in estimators.items() if is_multithreaded(est)]
+    jobs = {name: 1 for name in estimators}
+    if not parallel:
+        return jobs
+
+    spare = max(cores - (len(estimators) - len(parallel)), len(parallel))
+    share, extra = divmod(spare, len(parallel))
+    for i, name in enumerate(parallel):
+        jobs[name] = share + (1 if i < extra else 0)
+    return jobs
+
+
+def single_row_latency(model, row, repeats=200):
+    """
+    Median seconds to score one float32 row through the same fast paths
+    the API uses (bundle.make_predict_fn)
+    """
+    predict = make_predict_fn(model)
+    row = np.ascontiguousarray(row, dtype=np.float32).reshape(1, -1)
+    predict(row)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def _fit_predict(estimator, X_train, y_train, X_test):
+    start = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    return {
+        'model': estimator,
+        'predictions_raw': estimator.predict(X_test),
+        'fit_seconds': fit_seconds,
+    }
+
+
+def _worker(conn, estimator, X_train, y_train, X_test):
+    try:
+        conn.send(('ok', _fit_predict(estimator, X_train, y_train, X_test)))
+    except BaseException:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def train_candidates(models, X_train, y_train, X_test, budget=None, timeout=None,
+                     max_workers=None, cores=None):
+    """
+    Fit and predict every estimator in `models` ({name: estimator}).
+
+    Returns (results, report):
+    - results: {name: {'model', 'predictions_raw', 'fit_seconds',
+      'latency_seconds', 'n_jobs'}}
+      for the candidates that finished, in the order of `models`
+    - report: {name: {'status': 'ok' | 'timeout' | 'cancelled' | 'error',
+      'seconds', 'n_jobs'[, 'error']}} for every candidate
+    """
+    max_workers = min(max_workers or len(models), len(models))
+    names = list(models)
+    # Candidates run max_workers at a time; share cores within each wave
+    jobs = {}
+    for i in range(0, len(names), max_workers):
+        wave = {name: models[name] for name in names[i:i + max_workers]}
+        jobs.update(allocate_jobs(wave, cores))
+    for name, estimator in models.items():
+        if is_multithreaded(estimator):
+            estimator.set_params(n_jobs=jobs[name])
+
+    if START_METHOD not in mp.get_all_start_methods():
+        finished, report = _train_serial(models, X_train, y_train, X_test)
+    else:
+        finished, report = _train_workers(models, X_train, y_train, X_test,
+                                          budget, timeout, max_workers)
+
+    for name in report:
+        report[name]['n_jobs'] = jobs[name]
+    # Timed here, one model at a time, rather than next to other fits in the workers
+    first_row = np.asarray(X_test)[:1]
+    results = {
+        name: dict(finished[name], n_jobs=jobs[name],
+                   latency_seconds=single_row_latency(finished[name]['model'], first_row))
+        for name in names if name in finished
+    }
+    return results, report
+
+
+def _train_serial(models, X_train, y_train, X_test):
+    finished, report = {}, {}
+    for name, estimator in models.items():
+        finished[name] = _fit_predict(estimator, X_train, y_train, X_test)
+        report[name] = {'status': 'ok', 'seconds': finished[name]['fit_seconds']}
+    return finished, report
+
+
+def _train_workers(models, X_train, y_train, X_test, budget, timeout, max_workers):
+    ctx = mp.get_context(START_METHOD)
+    start = time.perf_counter()
+    deadline = start + budget if budget is not None else None
+
+    pending = list(models)
+    running = {}   # reader connection -> (name, process, started)
+    finished, report = {}, {}
+
+    def stop(conn, status, **extra):
+        name, process, started = running.pop(conn)
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        conn.close()
+        report[name] = dict(extra, status=status, seconds=time.perf_counter() - started)
+
+    try:
+        while pending or running:
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                for conn in list(running):
+                    stop(conn, 'timeout')
+                for name in pending:
+                    report[name] = {'status': 'cancelled', 'seconds': 0.0}
+                break
+
+            while pending and len(running) < max_workers:
+                name = pending.pop(0)
+                reader, writer = ctx.Pipe(duplex=False)
+                process = ctx.Process(
+                    target=_worker, args=(writer, models[name], X_train, y_train, X_test),
+                    name=f'train-{name}', daemon=True,
+                )
+                process.start()
+                writer.close()
+                running[reader] = (name, process, time.perf_counter())
+
+            # Sleep until a result arrives or the next candidate deadline
+            limits = [deadline] if deadline is not None else []
+            if timeout is not None:
+                limits.extend(started + timeout for _, _, started in running.values())
+            wait_for = max(0.0, min(limits) - time.perf_counter()) if limits else None
+
+            for conn in wait(list(running), timeout=wait_for):
+                name = running[conn][0]
+                try:
+                    status, payload = conn.recv()
+                except EOFError:
+                    status, payload = 'error', 'worker exited without a result'
+                if status == 'ok':
+                    finished[name] = payload
+                    stop(conn, 'ok')
+                else:
+                    stop(conn, 'error', error=payload)
+
+            if timeout is not None:
+                now = time.perf_counter()
+                for conn, (_, _, started) in list(running.items()):
+                    if now - started >= timeout:
+                        stop(conn, 'timeout')
+    finally:
+        for conn in list(running):
+            stop(conn, 'cancelled')
+
+    return finished, report
@@ -0,0 +1,290 @@
+"""
+HYPERPARAMETER TUNING
+Successive halving over walk-forward folds for the model.py candidates.
+
+For each model, `n_configs` parameter sets are sampled from SEARCH_SPACES
+(the current defaults are always one of them). Rung 0 scores every
+config on the most recent fold; each later rung keeps the best 1/`eta`
+and scores them on `eta` times as many folds (the most recent ones), up
+to `max_folds`. Scores are processed MAE (same rules as model.py) pooled
+over the rung's folds.
+
+XGBoost configs train with up to XGB_MAX_TREES trees and early stopping on
+the last `early_stopping_days` days of each training window, so a poor
+config stops after a few dozen trees; the tuned n_estimators is the median
+best iteration on the final rung.
+
+Every (model, params, fold) score is cached in tuning_cache/<hash>.json,
+where the hash covers the feature columns and the feature/target values,
+so repeated runs over the same feature set only fit configs and folds
+they have not seen. Fits within a rung run in parallel (src/backtest.py
+run_tasks).
+
+Run from services/ai-service:
+    python src/tuning.py --data ./data/kedarnath_temple_mock_dataset.csv --out tuned_params.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from backtest import fold_arrays, run_tasks, walk_forward_folds
+from feature_store import load_csv_features
+from features import training_frame
+from rules import apply_rules
+from schema import feature_matrix
+from training import DEFAULT_PARAMS, default_candidates, is_multithreaded
+
+SEARCH_SPACES = {
+    'XGBoost': {
+        'learning_rate': [0.03, 0.05, 0.1],
+        'max_depth': [3, 4, 5, 6, 8],
+        'min_child_weight': [1, 3, 5, 10],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.5, 0.7, 0.8, 1.0],
+        'reg_alpha': [0, 0.1, 1],
+        'reg_lambda': [1, 5, 10],
+    },
+    'GradientBoosting': {
+        'n_estimators': [100, 150, 300],
+        'learning_rate': [0.03, 0.05, 0.1],
+        'max_depth': [3, 4, 5],
+        'min_samples_split': [5, 10, 20],
+        'min_samples_leaf': [3, 5, 10],
+        'subsample': [0.7, 0.8, 1.0],
+    },
+    'RandomForest': {
+        'n_estimators': [150, 300],
+        'max_depth': [8, 12, 15, None],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 3, 5, 10],
+        'max_features': ['sqrt', 0.3, 0.5],
+    },
+    'LightGBM': {
+        'n_estimators': [200, 300, 500],
+        'learning_rate': [0.03, 0.05, 0.1],
+        'num_leaves': [15, 31, 63],
+        'max_bin': [63, 127, 255],
+        'min_child_samples': [5, 10, 20],
+        'subsample': [0.7, 0.8, 1.0],
+        'colsample_bytree': [0.5, 0.8, 1.0],
+        'reg_lambda': [0, 1, 5],
+    },
+}
+
+XGB_MAX_TREES = 1000
+EARLY_STOPPING_ROUNDS = 25
+CACHE_DIR = 'tuning_cache'
+
+
+def feature_set_hash(feature_columns, X_values, y_values):
+    """Hash of the feature schema and the values the folds are cut from"""
+    digest = hashlib.sha256(json.dumps(list(feature_columns)).encode())
+    digest.update(np.ascontiguousarray(X_values).tobytes())
+    digest.update(np.ascontiguousarray(y_values).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def sample_configs(name, n_configs, seed=42):
+    """The default params of `name` plus up to n_configs - 1 distinct random draws"""
+    space = SEARCH_SPACES[name]
+    rng = np.random.default_rng(seed)
+    default = {param: DEFAULT_PARAMS[name][param] for param in space if param in DEFAULT_PARAMS[name]}
+    configs = [default]
+    seen = {_config_key(default)}
+    # Bounded: small spaces may hold fewer than n_configs distinct configs
+    for _ in range(n_configs * 20):
+        if len(configs) >= n_configs:
+            break
+        config = {param: values[rng.integers(len(values))] for param, values in space.items()}
+        config = {param: (v.item() if hasattr(v, 'item') else v) for param, v in config.items()}
+        key = _config_key(config)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def _config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+
+class TuningCache:
+    """Per-fold scores for one feature set, persisted as JSON"""
+
+    def __init__(self, root, feature_hash):
+        self.path = os.path.join(root, f"{feature_hash}.json")
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        self.hits = 0
+
+    @staticmethod
+    def key(name, config, fold):
+        return f"{name}|{_config_key(config)}|{fold[0]}:{fold[1]}"
+
+    def get(self, name, config, fold):
+        entry = self.entries.get(self.key(name, config, fold))
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def put(self, name, config, fold, entry):
+        self.entries[self.key(name, config, fold)] = entry
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def _search_estimator(name, config, feature_columns):
+    estimator = default_candidates({name: config}, feature_columns)[name]
+    if is_multithreaded(estimator):
+        estimator.set_params(n_jobs=1)
+    if name == 'XGBoost':
+        estimator.set_params(n_estimators=XGB_MAX_TREES, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    return estimator
+
+
+def _fit_fold(index, estimator, train_end, test_end, early_stopping_days):
+    X, y = fold_arrays()
+    if getattr(estimator, 'early_stopping_rounds', None):
+        fit_end = train_end - early_stopping_days
+        estimator.fit(X[:fit_end], y[:fit_end], eval_set=[(X[fit_end:train_end], y[fit_end:train_end])],
+                      verbose=False)
+        best_iteration = int(estimator.best_iteration)
+    else:
+        estimator.fit(X[:train_end], y[:train_end])
+        best_iteration = None
+    return index, estimator.predict(X[train_end:test_end]), best_iteration
+
+
+def _score(results, folds):
+    """Pooled MAE over `folds` from cached per-fold entries"""
+    entries = [results[fold] for fold in folds]
+    return sum(e['abs_error'] for e in entries) / sum(e['rows'] for e in entries)
+
+
+def successive_halving(name, X_values, y_values, metadata, cache, feature_columns=None, n_configs=27,
+                       eta=3, max_folds=9, early_stopping_days=30, max_workers=None, seed=42):
+    """
+    Tune one model. Returns {'params', 'score', 'rungs': [...], 'fits',
+    'cached'}; params are the winning overrides for default_candidates().
+    """
+    all_folds = walk_forward_folds(len(X_values), max_folds)
+    configs = sample_configs(name, n_configs, seed)
+    # {config index: {fold: {'abs_error', 'rows', 'best_iteration'}}}
+    results = {i: {} for i in range(len(configs))}
+    alive = list(range(len(configs)))
+    n_folds = 1
+    rungs = []
+    fits = 0
+
+    while True:
+        folds = all_folds[-n_folds:]
+        tasks = []
+        for i in alive:
+            for fold in folds:
+                entry = cache.get(name, configs[i], fold)
+                if entry is not None:
+                    results[i][fold] = entry
+                elif fold not in results[i]:
+                    tasks.append((i, fold))
+
+        outputs = run_tasks(
+            _fit_fold,
+            [(i, _search_estimator(name, configs[i], feature_columns), fold[0], fold[1], early_stopping_days) for i, fold in tasks],
+            X_values, y_values, max_workers,
+        ) if tasks else []
+        fits += len(tasks)
+        for (i, fold), (_, predictions, best_iteration) in zip(tasks, outputs):
+            processed, _ = apply_rules(predictions, metadata.iloc[fold[0]:fold[1]], exclusive=True)
+            entry = {
+                'abs_error': float(np.abs(y_values[fold[0]:fold[1]] - processed).sum()),
+                'rows': fold[1] - fold[0],
+                'best_iteration': best_iteration,
+            }
+            results[i][fold] = entry
+            cache.put(name, configs[i], fold, entry)
+
+        scores = {i: _score(results[i], folds) for i in alive}
+        alive.sort(key=lambda i: scores[i])
+        rungs.append({'folds': n_folds, 'configs': len(alive), 'best_score': scores[alive[0]]})
+        if n_folds >= len(all_folds) or len(alive) == 1:
+            break
+        alive = alive[:max(1, len(alive) // eta)]
+        n_folds = min(n_folds * eta, len(all_folds))
+
+    best = alive[0]
+    params = dict(configs[best])
+    if name == 'XGBoost':
+        iterations = [results[best][fold]['best_iteration'] for fold in folds]
+        params['n_estimators'] = int(np.median(iterations)) + 1
+    cache.save()
+    return {'params': params, 'score': scores[best], 'rungs': rungs, 'fits': fits}
+
+
+def tune(X, y, metadata, feature_columns, models=None, cache_dir=CACHE_DIR, **kwargs):
+    """
+    Successive halving for each model in `models` (default: all
+    candidates). Returns {name: result of successive_halving}.
+    """
+    X_values = feature_matrix(X)
+    y_values = np.asarray(y, dtype=np.float64)
+    metadata = metadata.reset_index(drop=True)
+    cache = TuningCache(cache_dir, feature_set_hash(feature_columns, X_values, y_values))
+
+    tuned = {}
+    for name in models or list(SEARCH_SPACES):
+        start = time.perf_counter()
+        hits = cache.hits
+        tuned[name] = successive_halving(name, X_values, y_values, metadata, cache, feature_columns, **kwargs)
+        tuned[name]['cached'] = cache.hits - hits
+        tuned[name]['seconds'] = time.perf_counter() - start
+    return tuned
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='./data/kedarnath_temple_mock_dataset.csv')
+    parser.add_argument('--models', default=None, help='comma-separated subset of the candidates')
+    parser.add_argument('--configs', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--max-folds', type=int, default=9)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--out', default='tuned_params.json', help='write {model: params} here')
+    args = parser.parse_args()
+
+    df, _, _ = load_csv_features(args.data)
+    X, y, _, metadata, feature_columns = training_frame(df)
+    models = args.models.split(',') if args.models else None
+
+    tuned = tune(X, y, metadata, feature_columns, models, args.cache_dir, n_configs=args.configs,
+                 eta=args.eta, max_folds=args.max_folds, max_workers=args.workers)
+
+    print("=" * 80)
+    print("HYPERPARAMETER TUNING (successive halving, processed MAE)")
+    print("=" * 80)
+    for name, result in tuned.items():
+        rungs = ' -> '.join(f"{r['configs']}@{r['folds']}" for r in result['rungs'])
+        print(f"{name:<20} MAE {result['score']:<10.2f} configs@folds {rungs}  "
+              f"{result['fits']} fits, {result['cached']} reused, {result['seconds']:.1f}s")
+        print(f"   {result['params']}")
+
+    with open(args.out, 'w') as f:
+        json.dump({name: result['params'] for name, result in tuned.items()}, f, indent=2)
+    print(f"\n✅ Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()